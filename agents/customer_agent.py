@@ -1,16 +1,112 @@
 # agents/customer_agent.py
+import json
 from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain_classic.agents import AgentExecutor, create_react_agent 
-from langchain_core.prompts import PromptTemplate
-from tools.crm_tool import get_customer_info 
-from config import GOOGLE_API_KEY, GEMINI_MODEL_NAME
+from langchain_core.prompts import ChatPromptTemplate, PromptTemplate
+from langchain_core.runnables import Runnable
+from pydantic import BaseModel, Field
+from typing import Literal, Optional, Union
+from tools.crm_tool import get_customer_info, get_crm_statistics
+from agents.structured_agent import StructuredToolAgent, AGENT_MODE_STRUCTURED
+from config import GOOGLE_API_KEY, GEMINI_MODEL_NAME, CUSTOMER_AGENT_MODE
+from utils.llm_factory import create_chat_llm
+from utils.streaming import FINAL_ANSWER_TAG, REACT_AGENT_TAG
 
-def create_customer_agent() -> AgentExecutor:
+
+class CustomerLookup(BaseModel):
+    """Arguments for the get_customer_info tool, or for get_crm_statistics on book-wide questions."""
+    action: Literal["lookup", "statistics"] = Field(
+        default="lookup",
+        description="'statistics' for aggregate questions about the whole book (policy counts, total premium), else 'lookup'"
+    )
+    identifier: str = Field(
+        default="",
+        description="The customer ID (e.g. 'CUST001'), email, full name, or policy ID (e.g. 'AUTO-001') mentioned in the query. Empty if none is mentioned."
+    )
+    metric: Optional[Literal["premium_by_policy_type", "summary"]] = Field(
+        default=None, description="For statistics: 'premium_by_policy_type' (policies and premium per type) or 'summary' (totals)"
+    )
+    policy_type: Optional[str] = Field(default=None, description="For statistics: only this policy type, e.g. 'Auto Insurance'")
+    status: Optional[str] = Field(default=None, description="For statistics: only this policy status, e.g. 'Active'")
+
+
+def _customer_tool_input(args: CustomerLookup) -> Optional[str]:
+    if args.action == "statistics":
+        return json.dumps(args.model_dump(exclude_none=True, include={"metric", "policy_type", "status"}))
+    return args.identifier.strip() or None
+
+
+def _render_customer_not_found(query: str, customer: dict):
+    """Answers the 'not found' case without an LLM call; found customers go to the formatting step."""
+    if not customer:
+        return "The customer could not be found. Could you please double-check the customer ID, email, name, or policy ID?"
+    return None
+
+
+def create_structured_customer_agent(llm: ChatGoogleGenerativeAI) -> StructuredToolAgent:
     """
-    Creates and returns a customer agent capable of retrieving customer information.
+    Single-shot customer agent: one structured call extracts the identifier (or a statistics request),
+    the CRM lookup (or get_crm_statistics) runs directly, and one formatting call presents the result.
     """
-    llm = ChatGoogleGenerativeAI(model=GEMINI_MODEL_NAME, google_api_key=GOOGLE_API_KEY, temperature=0.0)
-    tools = [get_customer_info]
+    return StructuredToolAgent(
+        llm=llm,
+        tool=get_customer_info,
+        args_schema=CustomerLookup,
+        extraction_prompt="""You extract the customer identifier from a request to an insurance CRM.
+        Return the customer ID, email, full name, or policy ID exactly as written in the request.
+        For example:
+        - "Find customer with email john@example.com" -> "john@example.com"
+        - "Show me info for customer CUST001" -> "CUST001"
+        - "Who owns policy AUTO-001?" -> "AUTO-001"
+        - "Get details for Jane Doe" -> "Jane Doe"
+        If no identifier is mentioned, return an empty string.
+        For questions about the whole customer book rather than one customer, set action "statistics":
+        - "Total premium by policy type" -> action "statistics", metric "premium_by_policy_type"
+        - "How many active auto policies do we have?" -> action "statistics", metric "premium_by_policy_type",
+          policy_type "Auto Insurance", status "Active"
+        - "How many customers and policies are there?" -> action "statistics", metric "summary".""",
+        to_tool_input=_customer_tool_input,
+        format_prompt="""You are a helpful customer service agent for an insurance company.
+        Present the customer record from the tool result in a clear, human-readable format,
+        categorizing details like "Contact Information", "Policies", and "History".
+        If the tool result is statistics (counts and premium sums), present them as a short table instead.
+        Do not output raw JSON directly to the user.""",
+        render=_render_customer_not_found,
+        missing_args_message="Please provide a customer ID, email, name, or policy ID so I can look up the customer.",
+        extra_tools=[get_crm_statistics],
+        select_tool=lambda args: get_crm_statistics.name if args.action == "statistics" else get_customer_info.name,
+    )
+
+
+def create_customer_record_answerer() -> Runnable:
+    """
+    One LLM call that answers a question about a customer whose CRM record is already known
+    (e.g. from the session cache), instead of running the agent and its lookup again.
+    Input: {"input": question, "record": customer record as JSON}.
+    """
+    prompt = ChatPromptTemplate.from_messages([
+        ("system", """You are a helpful customer service agent for an insurance company.
+        Answer the question using only the customer record below. Present it in a clear, human-readable format,
+        categorizing details like "Contact Information", "Policies", and "History" where relevant.
+        Do not output raw JSON directly to the user.
+
+        Customer record:
+        {record}"""),
+        ("human", "{input}"),
+    ])
+    return prompt | create_chat_llm().with_config(tags=[FINAL_ANSWER_TAG])
+
+
+def create_customer_agent(mode: str = CUSTOMER_AGENT_MODE) -> Union[AgentExecutor, StructuredToolAgent]:
+    """
+    Creates and returns a customer agent capable of retrieving customer information and book-wide statistics.
+    mode is "react" (ReAct AgentExecutor) or "structured" (single-shot StructuredToolAgent).
+    """
+    llm = create_chat_llm()
+    if mode == AGENT_MODE_STRUCTURED:
+        return create_structured_customer_agent(llm)
+
+    tools = [get_customer_info, get_crm_statistics]
 
     customer_prompt_template = PromptTemplate.from_template(
         """You are a helpful customer service agent for an insurance company.
@@ -21,7 +117,7 @@ def create_customer_agent() -> AgentExecutor:
         Question: the input question you must answer
         Thought: you should always think about what to do
         Action: the action to take, should be one of [{tool_names}]
-        Action Input: the input to the action (should be a customer ID, email, name, or policy ID)
+        Action Input: the input to the action (a customer ID, email, name, or policy ID for get_customer_info)
         Observation: the result of the action
         ... (this Thought/Action/Action Input/Observation can repeat N times)
         Thought: I now know the final answer
@@ -36,6 +132,13 @@ def create_customer_agent() -> AgentExecutor:
         - "Who owns policy AUTO-001?" -> tool input: "AUTO-001"
         - "Get details for Jane Doe" -> tool input: "Jane Doe"
 
+        For questions about the whole customer book rather than one customer, e.g. "total premium by policy type"
+        or "how many active auto policies do we have", use the 'get_crm_statistics' tool with a JSON string input.
+        It answers from precomputed sums and counts:
+        - "Total premium by policy type" -> tool input: {{"metric": "premium_by_policy_type"}}
+        - "Premium of active auto policies" -> tool input: {{"metric": "premium_by_policy_type", "policy_type": "Auto Insurance", "status": "Active"}}
+        - "How many customers do we have?" -> tool input: {{"metric": "summary"}}
+
         If the tool returns an empty dictionary, it means the customer was not found.
         In that case, respond politely that the customer could not be found and ask for clarification.
 
@@ -50,8 +153,10 @@ def create_customer_agent() -> AgentExecutor:
         """
     )
     
-    agent = create_react_agent(llm, tools, customer_prompt_template)
-    executor = AgentExecutor(agent=agent, tools=tools, verbose=True, handle_parsing_errors=True)
+    # Tagged so token streaming can pick the text after "Final Answer:" out of the agent's output
+    agent = create_react_agent(llm.with_config(tags=[REACT_AGENT_TAG]), tools, customer_prompt_template)
+    executor = AgentExecutor(agent=agent, tools=tools, verbose=True, handle_parsing_errors=True,
+                             return_intermediate_steps=True)
     return executor
 
 if __name__ == "__main__":
@@ -2,19 +2,53 @@
 from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain_classic.agents import AgentExecutor, create_react_agent
 from langchain_core.prompts import PromptTemplate
+from langchain_core.tools import BaseTool
+from pydantic import BaseModel, Field
+from typing import Union
 from tools.kb_tool import create_rag_knowledge_tool 
-from config import GOOGLE_API_KEY, GEMINI_MODEL_NAME
+from agents.structured_agent import StructuredToolAgent, AGENT_MODE_STRUCTURED
+from config import GOOGLE_API_KEY, GEMINI_MODEL_NAME, KNOWLEDGE_AGENT_MODE
+from utils.llm_factory import create_chat_llm
+from utils.streaming import REACT_AGENT_TAG
 from langchain_google_genai import GoogleGenerativeAIEmbeddings
 from langchain_community.vectorstores import Chroma
 
-def create_knowledge_agent(embeddings: GoogleGenerativeAIEmbeddings, vector_store: Chroma) -> AgentExecutor:
+
+class KnowledgeQuery(BaseModel):
+    """Arguments for the query_knowledge_base_rag tool."""
+    topic: str = Field(description="A clear, concise question or topic for the knowledge base, e.g. 'term life insurance'")
+
+
+def create_structured_knowledge_agent(llm: ChatGoogleGenerativeAI, rag_tool: BaseTool) -> StructuredToolAgent:
+    """
+    Single-shot knowledge agent: one structured call formulates the KB query and the RAG tool's
+    answer is returned directly (the tool already generates a concise answer, so no formatting call).
+    """
+    return StructuredToolAgent(
+        llm=llm,
+        tool=rag_tool,
+        args_schema=KnowledgeQuery,
+        extraction_prompt="""You formulate knowledge base queries for an insurance knowledge expert.
+        Turn the user's question into a clear, concise question or topic.
+        For example, "What is term life insurance?" -> "term life insurance",
+        "What does comprehensive auto insurance cover?" -> "comprehensive auto insurance".""",
+        to_tool_input=lambda args: args.topic.strip() or None,
+    )
+
+
+def create_knowledge_agent(embeddings: GoogleGenerativeAIEmbeddings, vector_store: Chroma,
+                           mode: str = KNOWLEDGE_AGENT_MODE) -> Union[AgentExecutor, StructuredToolAgent]:
     """
     Creates and returns a knowledge agent capable of answering questions from an insurance knowledge base using RAG.
     It receives initialized embeddings and vector_store.
+    mode is "react" (ReAct AgentExecutor) or "structured" (single-shot StructuredToolAgent).
     """
-    llm = ChatGoogleGenerativeAI(model=GEMINI_MODEL_NAME, google_api_key=GOOGLE_API_KEY, temperature=0.0)
+    llm = create_chat_llm()
     
     rag_tool_instance = create_rag_knowledge_tool(embeddings, vector_store)
+    if mode == AGENT_MODE_STRUCTURED:
+        return create_structured_knowledge_agent(llm, rag_tool_instance)
+
     tools = [rag_tool_instance]
 
     kb_prompt_template = PromptTemplate.from_template(
@@ -48,8 +82,10 @@ def create_knowledge_agent(embeddings: GoogleGenerativeAIEmbeddings, vector_stor
         """
     )
     
-    agent = create_react_agent(llm, tools, kb_prompt_template)
-    executor = AgentExecutor(agent=agent, tools=tools, verbose=True, handle_parsing_errors=True)
+    # Tagged so token streaming can pick the text after "Final Answer:" out of the agent's output
+    agent = create_react_agent(llm.with_config(tags=[REACT_AGENT_TAG]), tools, kb_prompt_template)
+    executor = AgentExecutor(agent=agent, tools=tools, verbose=True, handle_parsing_errors=True,
+                             return_intermediate_steps=True)
     return executor
 
 # The if __name__ == "__main__": block for testing the agent will now be in langgraph_workflow.py or a dedicated test file
\ No newline at end of file
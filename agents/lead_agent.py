@@ -3,15 +3,102 @@ import json
 from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain_classic.agents import AgentExecutor, create_react_agent
 from langchain_core.prompts import PromptTemplate
-from tools.crm_tool import search_leads 
-from config import GOOGLE_API_KEY, GEMINI_MODEL_NAME
+from pydantic import BaseModel, Field
+from typing import Literal, Optional, Union
+from tools.crm_tool import search_leads, rank_campaign_leads, get_crm_statistics
+from agents.structured_agent import StructuredToolAgent, AGENT_MODE_STRUCTURED
+from config import GOOGLE_API_KEY, GEMINI_MODEL_NAME, LEAD_AGENT_MODE
+from utils.llm_factory import create_chat_llm
+from utils.streaming import REACT_AGENT_TAG
 
-def create_lead_agent() -> AgentExecutor:
+
+class LeadSearchCriteria(BaseModel):
     """
-    Creates and returns a lead agent capable of searching for qualified leads.
+    Criteria for search_leads, for rank_campaign_leads when the request asks for the best / top N leads, or for
+    get_crm_statistics when it asks for numbers of leads. Omit every criterion the query does not mention.
     """
-    llm = ChatGoogleGenerativeAI(model=GEMINI_MODEL_NAME, google_api_key=GOOGLE_API_KEY, temperature=0.0)
-    tools = [search_leads]
+    action: Literal["search", "rank", "statistics"] = Field(
+        default="search",
+        description="'rank' when the request wants the best or top N leads (e.g. for a campaign), 'statistics' when it "
+                    "asks how many leads there are or how scores are distributed, else 'search'"
+    )
+    score_min: Optional[int] = Field(default=None, description="Minimum lead score, e.g. 80 for 'score above 80'")
+    interest: Optional[str] = Field(default=None, description="Interest keyword, e.g. 'auto', 'life', 'home'")
+    area: Optional[str] = Field(default=None, description="Geographic area, e.g. 'Texas', 'California'")
+    status: Optional[str] = Field(default=None, description="Lead status: 'New', 'Contacted', 'Qualified' or 'Lost'")
+    name: Optional[str] = Field(default=None, description="Part of the lead's name")
+    top_k: Optional[int] = Field(default=None, description="Number of leads wanted when ranking, e.g. 10 for 'top 10'")
+    metric: Optional[Literal["lead_counts", "lead_score_histogram"]] = Field(
+        default=None, description="For statistics: 'lead_counts' (leads per area and status) or 'lead_score_histogram'"
+    )
+
+
+# Tool run for each extracted action
+_LEAD_ACTION_TOOLS = {"search": search_leads.name, "rank": rank_campaign_leads.name, "statistics": get_crm_statistics.name}
+
+
+def _lead_tool_input(criteria: LeadSearchCriteria) -> str:
+    if criteria.action == "statistics":
+        request = criteria.model_dump(exclude_none=True, include={"metric", "area", "status"})
+        return json.dumps({"metric": "lead_counts", **request})
+    if criteria.action == "rank":
+        # rank_campaign_leads accepts a single area/status as well; a name is not a ranking criterion
+        return json.dumps(criteria.model_dump(exclude_none=True, exclude={"action", "name", "metric"}))
+    return json.dumps(criteria.model_dump(exclude_none=True, exclude={"action", "top_k", "metric"}))
+
+
+def _render_no_leads(query: str, leads: Union[list, dict]):
+    """Answers the empty result (search or ranking) without an LLM call; other results go to the formatting step."""
+    if not leads or (isinstance(leads, dict) and "leads" in leads and not leads["leads"]):
+        return "No leads matching the criteria were found."
+    return None
+
+
+def create_structured_lead_agent(llm: ChatGoogleGenerativeAI) -> StructuredToolAgent:
+    """
+    Single-shot lead agent: one structured call extracts the criteria and whether to search, rank
+    (rank_campaign_leads) or count (get_crm_statistics), the tool runs directly, and one formatting call presents the result.
+    """
+    return StructuredToolAgent(
+        llm=llm,
+        tool=search_leads,
+        args_schema=LeadSearchCriteria,
+        extraction_prompt="""You extract lead search criteria from a request to an insurance sales CRM.
+        Only fill in the criteria the request explicitly mentions and leave the others empty.
+        For example:
+        - "Show me qualified leads in Texas" -> status "Qualified", area "Texas"
+        - "Find leads with score above 80 interested in auto insurance" -> score_min 80, interest "auto"
+        - "Are there any new leads named John?" -> status "New", name "John"
+        - "Top 20 leads for our life insurance campaign in Texas" -> action "rank", interest "life", area "Texas", top_k 20
+        - "How many qualified leads per state?" -> action "statistics", metric "lead_counts", status "Qualified"
+        - "How are the scores of new leads distributed?" -> action "statistics", metric "lead_score_histogram", status "New"
+        Use action "rank" only when the request asks for the best or top leads, "statistics" only when it asks
+        for numbers of leads; otherwise "search".
+        If no criteria are mentioned, leave every field empty.""",
+        to_tool_input=_lead_tool_input,
+        format_prompt="""You are a lead qualification agent for an insurance company.
+        Present the leads from the tool result clearly with ID, name, score, interest, area, status, and contact info.
+        A ranking result lists the best leads in order with their campaign score and the number of matching leads;
+        keep that order and mention its note, if any. Statistics (counts per area and status, score bins)
+        are presented as a short table.
+        Present results in a human-readable format, not raw JSON.""",
+        render=_render_no_leads,
+        extra_tools=[rank_campaign_leads, get_crm_statistics],
+        select_tool=lambda criteria: _LEAD_ACTION_TOOLS[criteria.action],
+    )
+
+
+def create_lead_agent(mode: str = LEAD_AGENT_MODE) -> Union[AgentExecutor, StructuredToolAgent]:
+    """
+    Creates and returns a lead agent capable of searching for qualified leads, ranking them for campaigns
+    and answering aggregate questions (counts, score distributions) from precomputed statistics.
+    mode is "react" (ReAct AgentExecutor) or "structured" (single-shot StructuredToolAgent).
+    """
+    llm = create_chat_llm()
+    if mode == AGENT_MODE_STRUCTURED:
+        return create_structured_lead_agent(llm)
+
+    tools = [search_leads, rank_campaign_leads, get_crm_statistics]
 
     lead_prompt_template = PromptTemplate.from_template(
         """You are a lead qualification agent for an insurance company.
@@ -55,6 +142,17 @@ def create_lead_agent() -> AgentExecutor:
         
         Extract criteria from the user's query and format as JSON.
         If no criteria mentioned, use empty JSON: {{}}
+
+        Use rank_campaign_leads instead when the user wants the best or top N leads, e.g. for a campaign.
+        It ranks every lead by score, interest match, source quality and status recency.
+        Action Input: {{"interest": "life", "areas": ["Texas", "California"], "top_k": 500}}
+        Its result gives the number of matching leads and the best ones in order; mention its note, if any.
+
+        Use get_crm_statistics for questions about numbers of leads rather than the leads themselves,
+        e.g. "how many qualified leads per state" or "how are lead scores distributed". It answers from
+        precomputed counts, so never search and count the leads yourself.
+        Action Input: {{"metric": "lead_counts", "status": "Qualified"}}
+        Action Input: {{"metric": "lead_score_histogram", "status": "New"}}
         
         When you receive results:
         - If empty list: say no leads were found matching the criteria
@@ -69,13 +167,15 @@ def create_lead_agent() -> AgentExecutor:
         """
     )
     
-    agent = create_react_agent(llm, tools, lead_prompt_template)
+    # Tagged so token streaming can pick the text after "Final Answer:" out of the agent's output
+    agent = create_react_agent(llm.with_config(tags=[REACT_AGENT_TAG]), tools, lead_prompt_template)
     executor = AgentExecutor(
         agent=agent, 
         tools=tools, 
         verbose=True, 
         handle_parsing_errors=True,
-        max_iterations=5
+        max_iterations=5,
+        return_intermediate_steps=True
     )
     return executor
 
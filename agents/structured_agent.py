@@ -0,0 +1,114 @@
+# agents/structured_agent.py
+from typing import Any, Callable, Dict, Optional, Sequence, Type
+
+from langchain_core.agents import AgentAction
+from langchain_core.language_models import BaseChatModel
+from langchain_core.prompts import ChatPromptTemplate
+from langchain_core.tools import BaseTool
+from pydantic import BaseModel
+
+from utils.streaming import FINAL_ANSWER_TAG
+
+# Agent modes selectable per agent (see CUSTOMER_AGENT_MODE / LEAD_AGENT_MODE / KNOWLEDGE_AGENT_MODE in config.py)
+AGENT_MODE_REACT = "react"
+AGENT_MODE_STRUCTURED = "structured"
+
+
+class StructuredToolAgent:
+    """
+    Single-shot alternative to a ReAct AgentExecutor for agents that own one tool, or a few tools chosen by
+    the same extraction call.
+
+    1. One structured-output LLM call extracts the tool arguments from the query (args_schema).
+       With extra tools, select_tool(arguments) names the one to run (default: `tool`).
+    2. The tool runs directly, without another LLM round trip.
+    3. The observation is turned into the answer by `render` (no LLM call) when it returns a string,
+       otherwise by a single formatting LLM call (format_prompt), or returned as-is when neither is given.
+
+    invoke()/ainvoke() return the same shape as AgentExecutor.invoke (plus intermediate_steps), so graph
+    nodes can use either implementation interchangeably.
+    """
+
+    def __init__(
+        self,
+        llm: BaseChatModel,
+        tool: BaseTool,
+        args_schema: Type[BaseModel],
+        extraction_prompt: str,
+        to_tool_input: Callable[[BaseModel], Optional[Any]],
+        format_prompt: Optional[str] = None,
+        render: Optional[Callable[[str, Any], Optional[str]]] = None,
+        missing_args_message: str = "I could not identify what to look up in your request. Could you please clarify?",
+        extra_tools: Sequence[BaseTool] = (),
+        select_tool: Optional[Callable[[BaseModel], str]] = None,
+    ):
+        self.llm = llm
+        self.tool = tool
+        self.tools = {candidate.name: candidate for candidate in (tool, *extra_tools)}
+        self.select_tool = select_tool
+        self.to_tool_input = to_tool_input
+        self.render = render
+        self.missing_args_message = missing_args_message
+
+        extraction = ChatPromptTemplate.from_messages([("system", extraction_prompt), ("human", "{input}")])
+        self.extraction_chain = extraction | llm.with_structured_output(args_schema)
+
+        self.format_chain = None
+        if format_prompt:
+            formatting = ChatPromptTemplate.from_messages([
+                ("system", format_prompt),
+                ("human", "Question: {input}\n\nTool result:\n{observation}"),
+            ])
+            self.format_chain = formatting | llm.with_config(tags=[FINAL_ANSWER_TAG])
+
+    def invoke(self, inputs: Dict[str, Any], config: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        query = inputs["input"]
+        arguments = self.extraction_chain.invoke({"input": query}, config=config)
+        tool_input = self.to_tool_input(arguments) if arguments is not None else None
+        if tool_input is None:
+            return {"input": query, "output": self.missing_args_message, "intermediate_steps": []}
+
+        tool = self._tool_for(arguments)
+        observation = tool.invoke(tool_input, config=config)
+        action = AgentAction(tool=tool.name, tool_input=tool_input, log=f"structured call: {tool_input}")
+        return {
+            "input": query,
+            "output": self._format(query, observation, config),
+            "intermediate_steps": [(action, observation)],
+        }
+
+    async def ainvoke(self, inputs: Dict[str, Any], config: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        query = inputs["input"]
+        arguments = await self.extraction_chain.ainvoke({"input": query}, config=config)
+        tool_input = self.to_tool_input(arguments) if arguments is not None else None
+        if tool_input is None:
+            return {"input": query, "output": self.missing_args_message, "intermediate_steps": []}
+
+        tool = self._tool_for(arguments)
+        observation = await tool.ainvoke(tool_input, config=config)
+        action = AgentAction(tool=tool.name, tool_input=tool_input, log=f"structured call: {tool_input}")
+        rendered = self._render(query, observation)
+        if rendered is None and self.format_chain is not None:
+            response = await self.format_chain.ainvoke({"input": query, "observation": str(observation)}, config=config)
+            rendered = response.content
+        return {
+            "input": query,
+            "output": rendered if rendered is not None else str(observation),
+            "intermediate_steps": [(action, observation)],
+        }
+
+    def _tool_for(self, arguments: BaseModel) -> BaseTool:
+        if self.select_tool is None:
+            return self.tool
+        return self.tools.get(self.select_tool(arguments), self.tool)
+
+    def _render(self, query: str, observation: Any) -> Optional[str]:
+        return self.render(query, observation) if self.render is not None else None
+
+    def _format(self, query: str, observation: Any, config: Optional[Dict[str, Any]]) -> str:
+        rendered = self._render(query, observation)
+        if rendered is not None:
+            return rendered
+        if self.format_chain is not None:
+            return self.format_chain.invoke({"input": query, "observation": str(observation)}, config=config).content
+        return str(observation)
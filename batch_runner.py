@@ -0,0 +1,223 @@
+# batch_runner.py
+"""
+Runs the multi-agent workflow over a JSONL file of queries.
+
+Each input line is a JSON object. The query is read from the first present field of
+"query", "input", "question" or "body" (or --query-field); the record id from "id" or
+"request_id" (or --id-field), falling back to the line number.
+
+Results are appended to the output JSONL as soon as each query completes:
+    {"id", "query", "route", "router_path", "final_response", "degraded_notes", "error", "status", "coalesced", "elapsed_s"}
+Re-running with the same output file resumes: ids already recorded there are skipped
+(failed ones too, unless --retry-errors is given).
+
+With checkpointing enabled (CHECKPOINT_ENABLED), every record runs in its own checkpointed thread
+("batch-<id>"): a transient failure resumes from the last completed node, in this run or a later one,
+instead of repeating the finished LLM calls.
+
+Identical queries (after normalization) that are in flight at the same time share one workflow run
+("coalesced": true on the records that reused another record's run).
+
+Usage:
+    python batch_runner.py requests.jsonl --output batch_results.jsonl --concurrency 8 --rpm 300 --tpm 200000
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import time
+from typing import Any, Dict, Iterator, Optional, Set, Tuple
+
+QUERY_FIELDS = ("query", "input", "question", "body")
+ID_FIELDS = ("id", "request_id")
+
+
+def iter_queries(input_path: str, query_field: Optional[str] = None,
+                 id_field: Optional[str] = None) -> Iterator[Tuple[str, str]]:
+    """Streams (record id, query) pairs from a JSONL file without loading it into memory."""
+    with open(input_path, "r", encoding="utf-8") as f:
+        for line_number, line in enumerate(f, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                print(f"⚠️ Skipping line {line_number}: invalid JSON")
+                continue
+
+            fields = (query_field,) if query_field else QUERY_FIELDS
+            query = next((record[field] for field in fields if record.get(field)), None)
+            if not query:
+                print(f"⚠️ Skipping line {line_number}: no query field")
+                continue
+
+            id_fields = (id_field,) if id_field else ID_FIELDS
+            record_id = next((str(record[field]) for field in id_fields if record.get(field)), f"line-{line_number}")
+            yield record_id, str(query)
+
+
+def load_completed_ids(output_path: str, retry_errors: bool = False) -> Set[str]:
+    """Ids already present in the output file (the resume point). The latest record per id wins."""
+    statuses: Dict[str, str] = {}
+    if not os.path.exists(output_path):
+        return set()
+    with open(output_path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                # A crash mid-write can leave a truncated last line; that query is simply rerun
+                continue
+            statuses[str(record.get("id"))] = record.get("status", "ok")
+    return {record_id for record_id, status in statuses.items() if not (retry_errors and status == "error")}
+
+
+async def _invoke_workflow(app, record_id: str, query: str, deadline_seconds: float) -> Dict[str, Any]:
+    from langgraph_workflow import create_initial_state
+    from utils.checkpointing import ainvoke_with_resume
+
+    initial_state = create_initial_state(query, deadline_seconds=deadline_seconds)
+    if app.checkpointer is not None:
+        # The query is part of the thread id: an interrupted run is only resumed for the same record and query
+        query_hash = hashlib.sha1(query.encode("utf-8")).hexdigest()[:12]
+        return await ainvoke_with_resume(app, initial_state, f"batch-{record_id}-{query_hash}")
+    return await app.ainvoke(initial_state)
+
+
+async def run_one(app, record_id: str, query: str, deadline_seconds: float = 0.0) -> Dict[str, Any]:
+    from config import REQUEST_COALESCING_ENABLED, WORKFLOW_MAX_IN_FLIGHT
+    from utils.session_cache import cache_key
+    from utils.single_flight import get_single_flight
+    from utils.rate_limiter import BATCH, set_priority_class
+
+    # Batch queries yield quota to interactive (UI) requests running in the same process
+    set_priority_class(BATCH)
+    start_time = time.perf_counter()
+    try:
+        shared = False
+        if REQUEST_COALESCING_ENABLED:
+            # Duplicate queries in flight at the same time share one run (and its result)
+            final_state, shared = await get_single_flight("workflow", WORKFLOW_MAX_IN_FLIGHT).ado(
+                cache_key(query), lambda: _invoke_workflow(app, record_id, query, deadline_seconds)
+            )
+        else:
+            final_state = await _invoke_workflow(app, record_id, query, deadline_seconds)
+        error = final_state.get("error_message", "")
+        return {
+            "id": record_id,
+            "query": query,
+            "route": final_state.get("router_decision", ""),
+            "router_path": final_state.get("router_path", ""),
+            "final_response": final_state.get("final_response", ""),
+            "degraded_notes": final_state.get("degraded_notes", []),
+            "error": error,
+            "status": "error" if error else "ok",
+            "coalesced": shared,
+            "elapsed_s": round(time.perf_counter() - start_time, 3),
+        }
+    except Exception as e:
+        return {
+            "id": record_id,
+            "query": query,
+            "route": "",
+            "router_path": "",
+            "final_response": "",
+            "degraded_notes": [],
+            "error": str(e),
+            "status": "error",
+            "coalesced": False,
+            "elapsed_s": round(time.perf_counter() - start_time, 3),
+        }
+
+
+async def run_batch(input_path: str, output_path: str, concurrency: int = 4,
+                    query_field: Optional[str] = None, id_field: Optional[str] = None,
+                    retry_errors: bool = False, checkpoint: bool = True,
+                    deadline_seconds: float = 0.0) -> Dict[str, int]:
+    from langgraph_workflow import create_multi_agent_workflow
+    from utils.checkpointing import open_async_checkpointer
+    from config import CHECKPOINT_ENABLED
+
+    if checkpoint and CHECKPOINT_ENABLED:
+        async with open_async_checkpointer() as checkpointer:
+            app = create_multi_agent_workflow(checkpointer=checkpointer)
+            return await _run_batch(app, input_path, output_path, concurrency, query_field, id_field, retry_errors,
+                                    deadline_seconds)
+    app = create_multi_agent_workflow()
+    return await _run_batch(app, input_path, output_path, concurrency, query_field, id_field, retry_errors,
+                            deadline_seconds)
+
+
+async def _run_batch(app, input_path: str, output_path: str, concurrency: int, query_field: Optional[str],
+                     id_field: Optional[str], retry_errors: bool, deadline_seconds: float) -> Dict[str, int]:
+    completed_ids = load_completed_ids(output_path, retry_errors)
+    if completed_ids:
+        print(f"--- Resuming: {len(completed_ids)} queries already in {output_path} ---")
+
+    counts = {"ok": 0, "error": 0, "skipped": 0}
+    # Bounded queue: the input file is streamed, never held in memory
+    queue: asyncio.Queue = asyncio.Queue(maxsize=concurrency * 2)
+    batch_start = time.perf_counter()
+
+    with open(output_path, "a", encoding="utf-8") as out:
+        async def worker():
+            while True:
+                item = await queue.get()
+                if item is None:
+                    queue.task_done()
+                    return
+                record_id, query = item
+                result = await run_one(app, record_id, query, deadline_seconds)
+                # Single event loop thread: writes from different workers never interleave
+                out.write(json.dumps(result, ensure_ascii=False) + "\n")
+                out.flush()
+                counts[result["status"]] += 1
+                print(f"[{result['status'].upper()}] {record_id} ({result['elapsed_s']:.2f}s) -> {result['route'] or '-'}")
+                queue.task_done()
+
+        workers = [asyncio.create_task(worker()) for _ in range(concurrency)]
+        for record_id, query in iter_queries(input_path, query_field, id_field):
+            if record_id in completed_ids:
+                counts["skipped"] += 1
+                continue
+            await queue.put((record_id, query))
+        for _ in workers:
+            await queue.put(None)
+        await asyncio.gather(*workers)
+
+    elapsed = time.perf_counter() - batch_start
+    print(f"--- Batch complete in {elapsed:.1f}s: {counts['ok']} ok, {counts['error']} errors, {counts['skipped']} skipped ---")
+    from utils.single_flight import single_flight_stats
+    for name, stats in single_flight_stats().items():
+        if stats["coalesced"]:
+            print(f"--- Coalescing [{name}]: {stats['coalesced']} of {stats['executions'] + stats['coalesced']} calls shared an in-flight run ---")
+    return counts
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("input", help="Input JSONL file with one query per line")
+    parser.add_argument("--output", default="batch_results.jsonl", help="Output JSONL file (appended to, used for resume)")
+    parser.add_argument("--concurrency", type=int, default=4, help="Maximum number of queries in flight")
+    parser.add_argument("--rpm", type=float, default=None,
+                        help="Global LLM requests-per-minute limit shared by all queries (default: LLM_REQUESTS_PER_MINUTE)")
+    parser.add_argument("--tpm", type=float, default=None,
+                        help="Global LLM tokens-per-minute limit shared by all queries (default: LLM_TOKENS_PER_MINUTE)")
+    parser.add_argument("--query-field", default=None, help="JSON field holding the query text")
+    parser.add_argument("--id-field", default=None, help="JSON field holding the record id")
+    parser.add_argument("--retry-errors", action="store_true", help="Re-run ids whose previous result was an error")
+    parser.add_argument("--no-checkpoint", action="store_true", help="Run without the durable graph checkpoints")
+    parser.add_argument("--deadline", type=float, default=0.0,
+                        help="Per-query latency deadline in seconds (default: none; slow nodes degrade instead of waiting)")
+    args = parser.parse_args()
+
+    if args.rpm is not None or args.tpm is not None:
+        from utils.rate_limiter import get_llm_rate_limiter
+        limiter = get_llm_rate_limiter()
+        limiter.configure(args.rpm if args.rpm is not None else limiter.requests_per_minute,
+                          args.tpm if args.tpm is not None else limiter.tokens_per_minute)
+
+    asyncio.run(run_batch(args.input, args.output, max(1, args.concurrency),
+                          args.query_field, args.id_field, args.retry_errors, not args.no_checkpoint, args.deadline))
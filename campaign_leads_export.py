@@ -0,0 +1,31 @@
+# campaign_leads_export.py
+"""
+Exports a campaign's ranked leads to CSV (bulk counterpart of the lead agent's rank_campaign_leads tool).
+
+Leads are ranked by utils/lead_ranking.py: a composite of lead score, interest match, source quality and status
+recency, computed over all leads at once with the top-k picked by partition. Columns:
+    rank, id, name, campaign_score, score, interest, area, status, source, email, phone
+
+Usage:
+    python campaign_leads_export.py --interest life --areas Texas California --top-k 500 --output life_campaign.csv
+"""
+import argparse
+import time
+
+from utils.lead_ranking import export_ranked_leads
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--interest", default=None, help="Campaign product keyword, e.g. life, auto (scored, not filtered)")
+    parser.add_argument("--areas", nargs="*", default=None, help="Areas to include (default: all)")
+    parser.add_argument("--statuses", nargs="*", default=None, help="Statuses to include (default: all except Lost)")
+    parser.add_argument("--score-min", type=float, default=None, help="Minimum lead score")
+    parser.add_argument("--top-k", type=int, default=500, help="Number of leads to export")
+    parser.add_argument("--output", default="campaign_leads.csv", help="Output CSV file (overwritten)")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    written = export_ranked_leads(args.output, interest=args.interest, areas=args.areas, statuses=args.statuses,
+                                  score_min=args.score_min, top_k=max(1, args.top_k))
+    print(f"✅ {written} ranked leads written to {args.output} in {time.perf_counter() - start:.2f}s")
@@ -8,3 +8,113 @@ GEMINI_MODEL_NAME =  os.getenv("GEMINI_MODEL_NAME")
 
 if not GOOGLE_API_KEY:
     raise ValueError("Cannot find google model in .env")
+
+# Deterministic pre-router: rules decide locally when their confidence clears this threshold
+ROUTER_RULES_ENABLED = os.getenv("ROUTER_RULES_ENABLED", "true").lower() == "true"
+ROUTER_RULES_CONFIDENCE = float(os.getenv("ROUTER_RULES_CONFIDENCE", "0.8"))
+
+# Local intent classifier (utils/intent_classifier.py): used when the rules are unsure, defers to the LLM below the threshold
+INTENT_CLASSIFIER_ENABLED = os.getenv("INTENT_CLASSIFIER_ENABLED", "true").lower() == "true"
+INTENT_CLASSIFIER_THRESHOLD = float(os.getenv("INTENT_CLASSIFIER_THRESHOLD", "0.75"))
+# Record (query, route) pairs decided by the router so the classifier can be retrained from real traffic
+ROUTER_DECISION_LOG_ENABLED = os.getenv("ROUTER_DECISION_LOG_ENABLED", "true").lower() == "true"
+
+# LRU cache of LLM router decisions keyed by normalised query shape (utils/router_cache.py)
+ROUTER_CACHE_ENABLED = os.getenv("ROUTER_CACHE_ENABLED", "true").lower() == "true"
+ROUTER_CACHE_MAX_SIZE = int(os.getenv("ROUTER_CACHE_MAX_SIZE", "1024"))
+ROUTER_CACHE_TTL_SECONDS = float(os.getenv("ROUTER_CACHE_TTL_SECONDS", "3600"))
+
+# Specialist agent mode: "react" (text-parsed ReAct loop) or "structured" (one structured-output call + direct tool call)
+CUSTOMER_AGENT_MODE = os.getenv("CUSTOMER_AGENT_MODE", "react").lower()
+LEAD_AGENT_MODE = os.getenv("LEAD_AGENT_MODE", "react").lower()
+KNOWLEDGE_AGENT_MODE = os.getenv("KNOWLEDGE_AGENT_MODE", "react").lower()
+
+# Process-wide caps on LLM requests and tokens per minute shared by all chat and embedding models (0 = unlimited).
+# Interactive (UI) calls are served before batch calls when both wait for quota (utils/rate_limiter.py).
+LLM_REQUESTS_PER_MINUTE = float(os.getenv("LLM_REQUESTS_PER_MINUTE", "0"))
+LLM_TOKENS_PER_MINUTE = float(os.getenv("LLM_TOKENS_PER_MINUTE", "0"))
+
+# Transient Gemini failures (429, 5xx, timeouts) are retried with jittered exponential backoff;
+# a retry-after hint from the API is honoured as the minimum delay
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "3"))
+LLM_BACKOFF_BASE_SECONDS = float(os.getenv("LLM_BACKOFF_BASE_SECONDS", "1"))
+LLM_BACKOFF_MAX_SECONDS = float(os.getenv("LLM_BACKOFF_MAX_SECONDS", "30"))
+
+# Conversation memory (utils/conversation_memory.py): recent messages within the window budget are kept verbatim,
+# older ones are folded into a rolling summary capped at CONVERSATION_SUMMARY_MAX_TOKENS
+CONVERSATION_MEMORY_ENABLED = os.getenv("CONVERSATION_MEMORY_ENABLED", "true").lower() == "true"
+CONVERSATION_WINDOW_TOKENS = int(os.getenv("CONVERSATION_WINDOW_TOKENS", "1000"))
+CONVERSATION_SUMMARY_MAX_TOKENS = int(os.getenv("CONVERSATION_SUMMARY_MAX_TOKENS", "250"))
+
+# Per-session cache of resolved customers, lead result sets and KB answers (utils/session_cache.py)
+SESSION_CACHE_ENABLED = os.getenv("SESSION_CACHE_ENABLED", "true").lower() == "true"
+SESSION_CACHE_TTL_SECONDS = float(os.getenv("SESSION_CACHE_TTL_SECONDS", "1800"))
+SESSION_CACHE_MAX_SESSIONS = int(os.getenv("SESSION_CACHE_MAX_SESSIONS", "256"))
+
+# Durable graph checkpoints (utils/checkpointing.py): runs with a thread id resume from the last completed node
+CHECKPOINT_ENABLED = os.getenv("CHECKPOINT_ENABLED", "true").lower() == "true"
+CHECKPOINT_DB_PATH = os.getenv("CHECKPOINT_DB_PATH", "data/checkpoints.sqlite")
+CHECKPOINT_RESUME_ATTEMPTS = int(os.getenv("CHECKPOINT_RESUME_ATTEMPTS", "2"))
+
+# Latency budgets (utils/deadline.py): every request gets a deadline, every node a budget capped by what is left of it.
+# A node that runs out of time degrades instead of blocking (see the *_degraded helpers in langgraph_workflow.py). 0 = no limit.
+REQUEST_DEADLINE_SECONDS = float(os.getenv("REQUEST_DEADLINE_SECONDS", "45"))
+ROUTER_BUDGET_SECONDS = float(os.getenv("ROUTER_BUDGET_SECONDS", "5"))
+CUSTOMER_NODE_BUDGET_SECONDS = float(os.getenv("CUSTOMER_NODE_BUDGET_SECONDS", "20"))
+LEAD_NODE_BUDGET_SECONDS = float(os.getenv("LEAD_NODE_BUDGET_SECONDS", "20"))
+KNOWLEDGE_NODE_BUDGET_SECONDS = float(os.getenv("KNOWLEDGE_NODE_BUDGET_SECONDS", "15"))
+# Threads running budgeted sync node calls. A call that timed out keeps its thread until its model call returns
+# (retries stop at its deadline); when all are busy, new calls run on the caller's thread instead of queueing.
+NODE_CALL_MAX_WORKERS = int(os.getenv("NODE_CALL_MAX_WORKERS", "32"))
+
+# Single-flight coalescing (utils/single_flight.py): concurrent identical requests share one in-flight execution
+# (the workflow entry in main.py and batch_runner.py, and the RAG tool). *_MAX_IN_FLIGHT caps how many distinct
+# requests execute at the same time (0 = unlimited).
+REQUEST_COALESCING_ENABLED = os.getenv("REQUEST_COALESCING_ENABLED", "true").lower() == "true"
+WORKFLOW_MAX_IN_FLIGHT = int(os.getenv("WORKFLOW_MAX_IN_FLIGHT", "0"))
+RAG_MAX_IN_FLIGHT = int(os.getenv("RAG_MAX_IN_FLIGHT", "8"))
+
+# Circuit breaker around the Gemini clients (utils/circuit_breaker.py). It opens when, over the last
+# CIRCUIT_BREAKER_WINDOW calls, the error rate or the share of calls slower than CIRCUIT_BREAKER_SLOW_CALL_SECONDS
+# reaches its threshold. While open, calls fail fast and the graph answers from local data (utils/local_fallbacks.py);
+# after CIRCUIT_BREAKER_OPEN_SECONDS one probe call is let through to test recovery.
+CIRCUIT_BREAKER_ENABLED = os.getenv("CIRCUIT_BREAKER_ENABLED", "true").lower() == "true"
+CIRCUIT_BREAKER_WINDOW = int(os.getenv("CIRCUIT_BREAKER_WINDOW", "20"))
+CIRCUIT_BREAKER_MIN_CALLS = int(os.getenv("CIRCUIT_BREAKER_MIN_CALLS", "5"))
+CIRCUIT_BREAKER_ERROR_RATE = float(os.getenv("CIRCUIT_BREAKER_ERROR_RATE", "0.5"))
+CIRCUIT_BREAKER_SLOW_CALL_SECONDS = float(os.getenv("CIRCUIT_BREAKER_SLOW_CALL_SECONDS", "10"))
+CIRCUIT_BREAKER_SLOW_CALL_RATE = float(os.getenv("CIRCUIT_BREAKER_SLOW_CALL_RATE", "0.8"))
+CIRCUIT_BREAKER_OPEN_SECONDS = float(os.getenv("CIRCUIT_BREAKER_OPEN_SECONDS", "30"))
+
+# Materialized recommendations per customer (utils/recommendation_cache.py), keyed by the customer record's hash and
+# the product catalog version; kept fresh by the CRM change feed. A hit skips the customer and knowledge agents.
+RECOMMENDATION_CACHE_ENABLED = os.getenv("RECOMMENDATION_CACHE_ENABLED", "true").lower() == "true"
+RECOMMENDATION_CACHE_MAX_ENTRIES = int(os.getenv("RECOMMENDATION_CACHE_MAX_ENTRIES", "10000"))
+
+# Most ranked leads the rank_campaign_leads tool hands to the lead agent (larger lists: campaign_leads_export.py)
+LEAD_RANKING_TOOL_MAX_RESULTS = int(os.getenv("LEAD_RANKING_TOOL_MAX_RESULTS", "20"))
+
+# Plain customer/lead lookups ("Find customer CUST002", "Show me qualified leads in Texas") are answered from markdown
+# templates (utils/result_renderer.py) instead of the agents; lead tables beyond LEAD_RENDER_MAX_ROWS keep the top scores
+TEMPLATED_LOOKUPS_ENABLED = os.getenv("TEMPLATED_LOOKUPS_ENABLED", "true").lower() == "true"
+LEAD_RENDER_MAX_ROWS = int(os.getenv("LEAD_RENDER_MAX_ROWS", "25"))
+
+# Speculative retrieval (utils/speculation.py): while the LLM router decides, the knowledge base top-k search and the
+# CRM lookup for the query already run; kept for the knowledge, customer and recommendation routes, dropped for leads.
+# Off by default, because an unused search still costs an embedding call
+SPECULATIVE_RETRIEVAL_ENABLED = os.getenv("SPECULATIVE_RETRIEVAL_ENABLED", "false").lower() == "true"
+SPECULATION_MAX_WORKERS = int(os.getenv("SPECULATION_MAX_WORKERS", "4"))
+SPECULATION_TTL_SECONDS = float(os.getenv("SPECULATION_TTL_SECONDS", "60"))
+
+# RAG context builder (utils/context_builder.py): up to RAG_MAX_CHUNKS chunks are retrieved with their relevance; those
+# scoring below RAG_MIN_RELEVANCE or more than RAG_RELEVANCE_MARGIN below the best are dropped, duplicates removed, and
+# the sentences most relevant to the question packed into RAG_CONTEXT_TOKEN_BUDGET tokens. Disabled: top 5 chunks verbatim
+RAG_CONTEXT_COMPRESSION_ENABLED = os.getenv("RAG_CONTEXT_COMPRESSION_ENABLED", "true").lower() == "true"
+RAG_MAX_CHUNKS = int(os.getenv("RAG_MAX_CHUNKS", "8"))
+RAG_MIN_RELEVANCE = float(os.getenv("RAG_MIN_RELEVANCE", "0.3"))
+RAG_RELEVANCE_MARGIN = float(os.getenv("RAG_RELEVANCE_MARGIN", "0.15"))
+RAG_CONTEXT_TOKEN_BUDGET = int(os.getenv("RAG_CONTEXT_TOKEN_BUDGET", "600"))
+
+# Product line partitions of the knowledge base (utils/product_lines.py): chunks are tagged at ingestion from their
+# "## " section heading, and a query naming product lines only searches those plus the general sections
+KB_PRODUCT_FILTER_ENABLED = os.getenv("KB_PRODUCT_FILTER_ENABLED", "true").lower() == "true"
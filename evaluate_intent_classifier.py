@@ -0,0 +1,137 @@
+# evaluate_intent_classifier.py
+"""
+Evaluates the local intent classifier against the LLM router.
+
+Reference labels come from LLM decisions recorded in the router decision log
+(data/router_decisions.jsonl). With --live, the seed queries are additionally
+classified by the LLM router right now, which also measures its latency.
+
+The reference queries are also training data (the classifier trains on the seed
+queries and the logged decisions), so every metric is measured held out: the
+references are split into k folds, and each fold is predicted by a classifier
+trained on the seed queries and logged decisions minus that fold's queries.
+
+Usage:
+    python evaluate_intent_classifier.py [--threshold 0.75] [--live] [--folds 5] [--llm-latency-ms 800]
+"""
+import argparse
+import random
+import statistics
+import time
+from typing import Dict, List, Tuple
+
+from utils.intent_classifier import (
+    IntentClassifier,
+    load_logged_decisions,
+    load_training_examples,
+)
+from utils.fast_router import normalize_router_label
+
+
+def _live_reference(queries: List[str]) -> List[Dict]:
+    """Classifies queries with the LLM router, recording label and latency."""
+    # Imported lazily: building the workflow module initialises the agents and the vector store.
+    from langgraph_workflow import _classify_with_llm
+
+    records = []
+    for query in queries:
+        start = time.perf_counter()
+        try:
+            reply = _classify_with_llm(query)
+        except Exception as e:
+            print(f"⚠️ LLM router failed for {query!r}: {e}. Skipping.")
+            continue
+        latency_ms = (time.perf_counter() - start) * 1000
+        records.append({"query": query, "route": normalize_router_label(reply), "latency_ms": latency_ms})
+    return records
+
+
+def _query_key(query: str) -> str:
+    return " ".join(query.casefold().split())
+
+
+def held_out_predictions(references: List[Dict], training: Tuple[List[str], List[str]], folds: int,
+                         seed: int = 13) -> List[Tuple[Dict, str, float, float]]:
+    """
+    (reference, label, probability, latency µs) per reference, each predicted by a classifier that never saw
+    its query: the references are split into `folds` folds, and each fold's queries are removed from the training set.
+    """
+    texts, labels = training
+    shuffled = list(references)
+    random.Random(seed).shuffle(shuffled)
+    folds = max(2, min(folds, len(shuffled)))
+    predictions = []
+    for fold in range(folds):
+        held_out = shuffled[fold::folds]
+        held_out_keys = {_query_key(record["query"]) for record in held_out}
+        kept = [(text, label) for text, label in zip(texts, labels) if _query_key(text) not in held_out_keys]
+        if len({label for _, label in kept}) < 2:
+            print(f"⚠️ Fold {fold + 1}/{folds}: too few training examples left, skipped.")
+            continue
+        model = IntentClassifier().fit([text for text, _ in kept], [label for _, label in kept])
+        for record in held_out:
+            start = time.perf_counter()
+            label, probability = model.predict(record["query"])
+            predictions.append((record, label, probability, (time.perf_counter() - start) * 1e6))
+    return predictions
+
+
+def evaluate(references: List[Dict], training: Tuple[List[str], List[str]], threshold: float, folds: int,
+             default_llm_latency_ms: float) -> None:
+    # One reference per query (the latest label wins, as in the training set)
+    references = list({_query_key(record["query"]): record for record in references}.values())
+    if len(references) < 2:
+        print("Not enough LLM-labelled queries to evaluate against. Run the app (or use --live) to collect some.")
+        return
+
+    correct = 0
+    decided = 0
+    decided_correct = 0
+    classifier_latencies_us = []
+    predictions = held_out_predictions(references, training, folds)
+    if not predictions:
+        print("No fold could be trained. Add seed queries or logged decisions.")
+        return
+    for record, label, probability, latency_us in predictions:
+        classifier_latencies_us.append(latency_us)
+
+        is_correct = label == record["route"]
+        correct += is_correct
+        if probability >= threshold:
+            decided += 1
+            decided_correct += is_correct
+
+    llm_latencies = [r["latency_ms"] for r, _, _, _ in predictions if r.get("latency_ms")]
+    llm_latency_ms = statistics.mean(llm_latencies) if llm_latencies else default_llm_latency_ms
+    classifier_latency_us = statistics.mean(classifier_latencies_us)
+    total = len(predictions)
+
+    print(f"Reference queries (LLM labels): {total}, all predicted held out ({max(2, min(folds, len(references)))}-fold)")
+    print(f"Top-1 agreement with LLM router: {correct / total:.1%}")
+    print(f"Decided locally at p >= {threshold:.2f}: {decided}/{total} ({decided / total:.1%})")
+    if decided:
+        print(f"Agreement on locally decided queries: {decided_correct / decided:.1%}")
+    print(f"Mean classifier latency: {classifier_latency_us:.0f}µs")
+    print(f"Mean LLM router latency: {llm_latency_ms:.0f}ms" + ("" if llm_latencies else " (assumed)"))
+    saved_ms = decided * (llm_latency_ms - classifier_latency_us / 1000)
+    print(f"Router latency saved: {saved_ms / 1000:.1f}s total, {saved_ms / total:.0f}ms per request on average")
+
+
+if __name__ == "__main__":
+    from config import INTENT_CLASSIFIER_THRESHOLD
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--folds", type=int, default=5, help="Cross-validation folds over the reference queries")
+    parser.add_argument("--threshold", type=float, default=INTENT_CLASSIFIER_THRESHOLD,
+                        help="Probability below which the router defers to the LLM")
+    parser.add_argument("--live", action="store_true", help="Also classify the seed queries with the LLM router now")
+    parser.add_argument("--llm-latency-ms", type=float, default=800.0,
+                        help="LLM router latency to assume when none was logged")
+    args = parser.parse_args()
+
+    references = load_logged_decisions(paths=["llm"])
+    if args.live:
+        seed_queries, _ = load_training_examples(log_path="")
+        references.extend(_live_reference(seed_queries))
+
+    evaluate(references, load_training_examples(), args.threshold, args.folds, args.llm_latency_ms)
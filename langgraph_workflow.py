@@ -1,22 +1,49 @@
 # langgraph_workflow.py
+import asyncio
 import operator
-import re
 import json
-from typing import TypedDict, Annotated, List, Union, Dict, Any
+import sys
+import time
+from typing import TypedDict, Annotated, List, Union, Dict, Any, Optional, Tuple, Callable
 from langchain_core.agents import AgentAction, AgentFinish
 from langchain_core.messages import BaseMessage, HumanMessage
 from langgraph.graph import StateGraph, END
+from langgraph.config import get_config
 from langchain_google_genai import ChatGoogleGenerativeAI, GoogleGenerativeAIEmbeddings
 from langchain_core.prompts import ChatPromptTemplate
+from langchain_core.runnables import RunnableLambda
 from langchain_community.vectorstores import Chroma
-from config import GOOGLE_API_KEY, GEMINI_MODEL_NAME
+from config import (
+    GOOGLE_API_KEY, GEMINI_MODEL_NAME,
+    ROUTER_RULES_ENABLED, ROUTER_RULES_CONFIDENCE,
+    INTENT_CLASSIFIER_ENABLED, INTENT_CLASSIFIER_THRESHOLD, ROUTER_DECISION_LOG_ENABLED,
+    ROUTER_CACHE_ENABLED,
+    REQUEST_DEADLINE_SECONDS, ROUTER_BUDGET_SECONDS, CUSTOMER_NODE_BUDGET_SECONDS,
+    LEAD_NODE_BUDGET_SECONDS, KNOWLEDGE_NODE_BUDGET_SECONDS,
+    TEMPLATED_LOOKUPS_ENABLED, SPECULATIVE_RETRIEVAL_ENABLED,
+)
 
-from agents.customer_agent import create_customer_agent
+from agents.customer_agent import create_customer_agent, create_customer_record_answerer
 from agents.lead_agent import create_lead_agent
 from agents.knowledge_agent import create_knowledge_agent
-from tools.crm_tool import get_customer_info 
+from tools.crm_tool import get_customer_info, search_leads
 from tools.recommendation_tool import generate_insurance_recommendations
 from utils.rag_pipeline import ingest_and_get_vector_store, get_persisted_vector_store, CHROMA_DB_DIR
+from utils.fast_router import classify_query_rules, normalize_router_label
+from utils.intent_classifier import get_intent_classifier, log_router_decision
+from utils.router_cache import get_router_cache
+from utils.llm_factory import create_chat_llm, create_embeddings
+from utils.conversation_memory import contextualize_query, is_follow_up
+from utils.session_cache import get_session_cache, LEAD_RESULTS, KB_ANSWERS
+from utils.errors import is_transient_error
+from utils.deadline import DeadlineExceeded, request_deadline, node_timeout, call_with_timeout, acall_with_timeout
+from utils.circuit_breaker import CircuitOpenError, llm_circuit_open
+from utils.local_fallbacks import local_customer_answer, local_lead_answer, extractive_kb_answer, kb_product_lines
+from utils.entity_extractor import EntityMatch, find_entities, resolve_customer
+from utils.result_renderer import render_customer, render_leads, plain_customer_lookup, plain_lead_lookup
+from utils.recommendation_cache import get_recommendation_cache
+from utils.speculation import start_speculation, drop_speculation, release_speculation, use_speculation, speculative_entities
+from tools.kb_tool import retrieve_scored
 
 
 # --- RAG INITIALIZATION ---
@@ -28,7 +55,7 @@ def get_global_embeddings() -> GoogleGenerativeAIEmbeddings:
     if _embeddings_instance is None:
         if not GOOGLE_API_KEY:
             raise ValueError("GOOGLE_API_KEY is not set. Cannot initialize GoogleGenerativeAIEmbeddings.")
-        _embeddings_instance = GoogleGenerativeAIEmbeddings(model="models/embedding-001", google_api_key=GOOGLE_API_KEY)
+        _embeddings_instance = create_embeddings()
     return _embeddings_instance
 
 def get_global_vector_store() -> Chroma: 
@@ -51,12 +78,29 @@ except Exception as e:
 
 
 # 1. Define AgentState
+# Reducers for keys that parallel branches (see the recommendation fan-out below) may write in the same step
+def _merge_error_messages(left: str, right: str) -> str:
+    """Keeps every distinct error reported by concurrently running nodes."""
+    if not right or right == left:
+        return left or ""
+    if not left:
+        return right
+    return f"{left}; {right}"
+
+def _keep_latest_non_empty(left: str, right: str) -> str:
+    """Pass-through values (e.g. router_decision) are only replaced by a non-empty update."""
+    return right or left
+
 class AgentState(TypedDict):
     """
     Represents the state of our graph.
     """
     input: str
     chat_history: Annotated[List[BaseMessage], operator.add]
+    # Bounded summary + recent messages of the session (utils/conversation_memory.py), "" for single-shot queries
+    conversation_context: str
+    # Chat session the request belongs to; keys the session entity cache (utils/session_cache.py), "" for none
+    session_id: str
     # agent_outcome is for internal ReAct trace, not part of our custom state passing
     # intermediate_steps is also part of ReAct trace, will be extracted safely
     
@@ -68,124 +112,500 @@ class AgentState(TypedDict):
     available_products_kb: str      
     recommendation_result: str      
     
-    is_recommendation_flow: bool 
+    is_recommendation_flow: Annotated[bool, operator.or_]
 
     final_response: str
-    error_message: str 
+    error_message: Annotated[str, _merge_error_messages]
     
     # Store the router's decision explicitly for conditional edges
-    router_decision: str
+    router_decision: Annotated[str, _keep_latest_non_empty]
+    # Which stage decided the route ("rules", "classifier", "cache", "llm", or "fallback" when the LLM ran out of time)
+    router_path: str
+    # Retrieval and CRM lookup started while the LLM router decided, kept for the routes that use them
+    # (utils/speculation.py), "" for none
+    speculation_id: str
+
+    # Request deadline in epoch seconds (0 = none); every node's budget is capped by it (utils/deadline.py)
+    deadline: float
+    # What was skipped or degraded because a node ran out of time; shown with the final response
+    degraded_notes: Annotated[List[str], operator.add]
 
 # 2. Create Agent Executors
 customer_agent_executor = create_customer_agent()
+customer_record_answerer = create_customer_record_answerer()
 lead_agent_executor = create_lead_agent()
 knowledge_agent_executor = create_knowledge_agent(get_global_embeddings(), get_global_vector_store())
 
 
 # 3. Define Nodes for the Graph
-def run_customer_agent_node(state: AgentState):
-    print("---EXECUTING CUSTOMER AGENT---")
+# Agent nodes come in sync/async pairs (run_x / arun_x) sharing their pre- and post-processing, so that the
+# compiled graph supports both app.invoke/app.stream and app.ainvoke/app.astream (see _dual_node below).
+
+def _needs_customer_profile(state: AgentState, customer_info_output: str) -> bool:
+    """In the recommendation flow, a found customer also needs its raw profile for the recommendation step."""
+    return state.get("is_recommendation_flow", False) and \
+        customer_info_output and "customer not found" not in customer_info_output.lower() \
+        and "could not be found" not in customer_info_output.lower() \
+        and "i cannot find any customer" not in customer_info_output.lower()
+
+def _agent_input(state: AgentState) -> str:
+    """The query as given to the agents: follow-ups carry the bounded conversation context."""
+    return contextualize_query(state["input"], state.get("conversation_context", ""), _input_entities(state))
+
+def _input_entities(state: AgentState) -> List[EntityMatch]:
+    """The CRM entities the query mentions: prefetched while the router decided, else scanned now."""
+    matches = speculative_entities(state.get("speculation_id", ""), state["input"])
+    return find_entities(state["input"]) if matches is None else matches
+
+def _resolve_customer_profile(state: AgentState) -> Dict[str, Any]:
+    """
+    The CRM record of the customer the query is about, from the local entity extractor (no LLM call).
+    Customers named in the current query win over the last one mentioned earlier in the conversation.
+    """
+    matches = _input_entities(state)
+    record = resolve_customer(state["input"], matches=matches)
+    if not record and state.get("conversation_context") and is_follow_up(state["input"], matches):
+        record = resolve_customer(state["conversation_context"], latest=True)
+    return record
+
+def _is_checkpointed_run() -> bool:
+    """True when the graph runs under a thread id, i.e. with a checkpointer that can resume it."""
+    try:
+        return bool(get_config().get("configurable", {}).get("thread_id"))
+    except RuntimeError:
+        return False
+
+def _raise_if_resumable(e: Exception) -> None:
+    """
+    In checkpointed runs a transient failure (rate limit, timeout) aborts the run instead of becoming an
+    error_message, so that it can be resumed from this node with the completed nodes' outputs reused
+    (see utils/checkpointing.invoke_with_resume).
+    """
+    if is_transient_error(e) and _is_checkpointed_run():
+        raise e
+
+def _customer_node_update(state: AgentState, result: Dict[str, Any], customer_profile_data: Dict[str, Any]):
+    return {
+        "customer_info_result": result.get("output", ""), 
+        "intermediate_steps": result.get("intermediate_steps", []), # Access safely
+        "customer_profile": customer_profile_data, 
+        "is_recommendation_flow": state.get("is_recommendation_flow", False),
+        "router_decision": state.get("router_decision") # Pass router decision along
+    }
+
+def _customer_node_error(state: AgentState, e: Exception):
+    if isinstance(e, CircuitOpenError):
+        return _customer_node_local(state)
+    _raise_if_resumable(e)
+    if is_transient_error(e):
+        # Gemini still failing after its retries, and no checkpoint to resume from: answer locally
+        return _customer_node_local(state)
+    error_msg = f"Error in customer agent: {str(e)}"
+    print(f"❌ {error_msg}")
+    return {
+        "customer_info_result": "",
+        "error_message": error_msg,
+        "customer_profile": {},
+        "is_recommendation_flow": state.get("is_recommendation_flow", False),
+        "router_decision": state.get("router_decision")
+    }
+
+def _cached_customer(state: AgentState) -> Optional[Dict[str, Any]]:
+    """The session's cached customer the query refers to ({"record", "answer"}), or None."""
+    session_cache = get_session_cache(state.get("session_id", ""))
+    if session_cache is None:
+        return None
+    entry = session_cache.find_customer(state["input"], state.get("conversation_context", ""), _input_entities(state))
+    if entry is not None:
+        print(f"---SESSION CACHE HIT: customer {entry['record'].get('id')} (no CRM lookup)---")
+    return entry
+
+def _customer_record_from_steps(result: Dict[str, Any]) -> Dict[str, Any]:
+    """The customer record returned by the agent's last successful get_customer_info call, or {}."""
+    for action, observation in reversed(result.get("intermediate_steps", [])):
+        if getattr(action, "tool", "") == get_customer_info.name and isinstance(observation, dict) and observation.get("id"):
+            return observation
+    return {}
+
+def _remember_customer(state: AgentState, result: Dict[str, Any]) -> Dict[str, Any]:
+    record = _customer_record_from_steps(result)
+    session_cache = get_session_cache(state.get("session_id", ""))
+    if record and session_cache is not None:
+        session_cache.put_customer(record, result.get("output", ""))
+    return record
+
+# Shown with every answer built without the LLM while its circuit breaker is open
+_LOCAL_MODE_NOTE = "The AI service is unavailable right now, so this answer was built from local data only."
+
+def _customer_node_local(state: AgentState):
+    """Gemini unavailable (circuit open, or failing after retries): direct CRM lookup with a templated answer instead of the agent."""
+    print("---GEMINI UNAVAILABLE: CUSTOMER LOOKUP FROM LOCAL DATA---")
+    cached = _cached_customer(state)
+    answer, record = local_customer_answer(state["input"], cached["record"] if cached else None)
+    return {
+        "customer_info_result": answer,
+        "customer_profile": record if state.get("is_recommendation_flow", False) else {},
+        "degraded_notes": [_LOCAL_MODE_NOTE],
+        "is_recommendation_flow": state.get("is_recommendation_flow", False),
+        "router_decision": state.get("router_decision")
+    }
+
+def _customer_node_degraded(state: AgentState, e: DeadlineExceeded):
+    note = "The customer lookup did not finish within its time budget and was skipped."
+    print(f"⏱️ {note} ({e})")
+    return {
+        "customer_info_result": "",
+        "customer_profile": {},
+        "degraded_notes": [note],
+        "is_recommendation_flow": state.get("is_recommendation_flow", False),
+        "router_decision": state.get("router_decision")
+    }
+
+def _templated_customer_answer(state: AgentState) -> Optional[Dict[str, Any]]:
+    """
+    Plain lookups ("Find customer CUST002", "Who is Jane Doe?"), and the customer half of a recommendation request,
+    are rendered from the customer template (utils/result_renderer.py): no agent, no LLM call.
+    """
+    if not TEMPLATED_LOOKUPS_ENABLED:
+        return None
+    is_rec_flow = state.get("is_recommendation_flow", False)
+    matches = _input_entities(state)
+    if is_rec_flow:
+        record = resolve_customer(state["input"], matches=matches)
+    else:
+        record = plain_customer_lookup(state["input"], matches=matches)
+    if not record:
+        return None
+    print(f"---TEMPLATED CUSTOMER LOOKUP: {record.get('id')} (agent skipped)---")
+    answer = render_customer(record)
+    session_cache = get_session_cache(state.get("session_id", ""))
+    if session_cache is not None:
+        session_cache.put_customer(record, answer)
+    return _customer_node_update(state, {"output": answer}, record if is_rec_flow else {})
+
+def _run_customer_agent(state: AgentState):
     try:
+        templated = _templated_customer_answer(state)
+        if templated is not None:
+            return templated
+        cached = _cached_customer(state)
+        if cached is not None:
+            if state.get("is_recommendation_flow", False):
+                result = {"output": cached["answer"]}
+            else:
+                record_json = json.dumps(cached["record"])
+                result = {"output": customer_record_answerer.invoke({"input": state["input"], "record": record_json}).content}
+            return _customer_node_update(state, result, cached["record"] if state.get("is_recommendation_flow", False) else {})
+
         # AgentExecutor's invoke returns a dict with 'output' and optionally 'intermediate_steps'
-        result = customer_agent_executor.invoke({"input": state["input"]})
-        
-        customer_info_output = result.get("output", "")
-        agent_intermediate_steps = result.get("intermediate_steps", [])
+        result = customer_agent_executor.invoke({"input": _agent_input(state)})
+        looked_up_record = _remember_customer(state, result)
 
         customer_profile_data = {}
-        if state.get("is_recommendation_flow", False) and \
-            customer_info_output and "customer not found" not in customer_info_output.lower() \
-            and "could not be found" not in customer_info_output.lower() \
-            and "i cannot find any customer" not in customer_info_output.lower():
-            
-            customer_identifier = ""
-            
-            email_match = re.search(r"[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}", state["input"])
-            if email_match:
-                customer_identifier = email_match.group(0)
+        if _needs_customer_profile(state, result.get("output", "")):
+            # The agent's own lookup usually already returned the record; otherwise the entity extractor finds it
+            customer_profile_data = looked_up_record or _resolve_customer_profile(state)
+            if customer_profile_data:
+                print(f"---Extracted customer profile for recommendation: {customer_profile_data.get('name')}---")
+
+        return _customer_node_update(state, result, customer_profile_data)
+    except Exception as e:
+        return _customer_node_error(state, e)
+
+async def _arun_customer_agent(state: AgentState):
+    try:
+        templated = _templated_customer_answer(state)
+        if templated is not None:
+            return templated
+        cached = _cached_customer(state)
+        if cached is not None:
+            if state.get("is_recommendation_flow", False):
+                result = {"output": cached["answer"]}
             else:
-                id_match = re.search(r"(cust\d{3})", state["input"].lower())
-                if id_match:
-                    customer_identifier = id_match.group(0).upper()
-                else: 
-                    name_extractor_llm = ChatGoogleGenerativeAI(model=GEMINI_MODEL_NAME, google_api_key=GOOGLE_API_KEY, temperature=0.0)
-                    name_prompt = ChatPromptTemplate.from_messages([
-                        ("system", "Extract the full name of the customer from the query. If no specific full name is clearly mentioned, respond with 'NONE'. Example: 'Find customer John Doe' -> 'John Doe'. 'Customer with email' -> 'NONE'"),
-                        ("human", "{query}")
-                    ])
-                    name_chain = name_prompt | name_extractor_llm
-                    extracted_name = name_chain.invoke({"query": state["input"]}).content.strip()
-                    if extracted_name.lower() != "none" and len(extracted_name.split()) >= 2:
-                        customer_identifier = extracted_name
-            
-            if customer_identifier:
-                customer_profile_data = get_customer_info.invoke(customer_identifier) 
+                record_json = json.dumps(cached["record"])
+                response = await customer_record_answerer.ainvoke({"input": state["input"], "record": record_json})
+                result = {"output": response.content}
+            return _customer_node_update(state, result, cached["record"] if state.get("is_recommendation_flow", False) else {})
+
+        result = await customer_agent_executor.ainvoke({"input": _agent_input(state)})
+        looked_up_record = _remember_customer(state, result)
+
+        customer_profile_data = {}
+        if _needs_customer_profile(state, result.get("output", "")):
+            customer_profile_data = looked_up_record or _resolve_customer_profile(state)
+            if customer_profile_data:
                 print(f"---Extracted customer profile for recommendation: {customer_profile_data.get('name')}---")
 
-        return {
-            "customer_info_result": customer_info_output, 
-            "intermediate_steps": agent_intermediate_steps, # Access safely
-            "customer_profile": customer_profile_data, 
-            "is_recommendation_flow": state.get("is_recommendation_flow", False),
-            "router_decision": state.get("router_decision") # Pass router decision along
-        }
+        return _customer_node_update(state, result, customer_profile_data)
     except Exception as e:
-        error_msg = f"Error in customer agent: {str(e)}"
-        print(f"❌ {error_msg}")
-        return {
-            "customer_info_result": "",
-            "error_message": error_msg,
-            "customer_profile": {},
-            "is_recommendation_flow": state.get("is_recommendation_flow", False),
-            "router_decision": state.get("router_decision")
-        }
+        return _customer_node_error(state, e)
+
+def run_customer_agent_node(state: AgentState):
+    print("---EXECUTING CUSTOMER AGENT---")
+    if llm_circuit_open():
+        return _customer_node_local(state)
+    try:
+        return call_with_timeout(_run_customer_agent, node_timeout(state, CUSTOMER_NODE_BUDGET_SECONDS), state)
+    except DeadlineExceeded as e:
+        return _customer_node_degraded(state, e)
+
+async def arun_customer_agent_node(state: AgentState):
+    print("---EXECUTING CUSTOMER AGENT (async)---")
+    if llm_circuit_open():
+        return _customer_node_local(state)
+    try:
+        return await acall_with_timeout(lambda: _arun_customer_agent(state), node_timeout(state, CUSTOMER_NODE_BUDGET_SECONDS))
+    except DeadlineExceeded as e:
+        return _customer_node_degraded(state, e)
+
+def _lead_node_update(state: AgentState, result: Dict[str, Any]):
+    return {
+        "lead_info_result": result.get("output", ""), # Access safely
+        "intermediate_steps": result.get("intermediate_steps", []), # Access safely
+        "is_recommendation_flow": state.get("is_recommendation_flow", False),
+        "router_decision": state.get("router_decision")
+    }
+
+def _lead_node_error(state: AgentState, e: Exception):
+    if isinstance(e, CircuitOpenError):
+        return _lead_node_local(state)
+    _raise_if_resumable(e)
+    if is_transient_error(e):
+        # Gemini still failing after its retries, and no checkpoint to resume from: answer locally
+        return _lead_node_local(state)
+    error_msg = f"Error in lead agent: {str(e)}"
+    print(f"❌ {error_msg}")
+    return {
+        "lead_info_result": "",
+        "error_message": error_msg,
+        "is_recommendation_flow": state.get("is_recommendation_flow", False),
+        "router_decision": state.get("router_decision")
+    }
+
+def _session_result_key(state: AgentState) -> str:
+    """Session cache key for a lead/KB answer: the query, or "" without a session or when the answer depends on the conversation."""
+    if get_session_cache(state.get("session_id", "")) is None or _agent_input(state) != state["input"]:
+        return ""
+    return state["input"]
+
+def _cached_result(state: AgentState, kind: str, key: str) -> Optional[str]:
+    if not key:
+        return None
+    output = get_session_cache(state["session_id"]).get_result(kind, key)
+    if output is not None:
+        print(f"---SESSION CACHE HIT: {kind} result for '{key}'---")
+    return output
+
+def _remember_result(state: AgentState, kind: str, key: str, result: Dict[str, Any]) -> None:
+    if key and result.get("output"):
+        get_session_cache(state["session_id"]).put_result(kind, key, result["output"])
+
+def _lead_node_local(state: AgentState):
+    """Gemini unavailable: search criteria parsed with regexes and a direct search_leads call."""
+    print("---GEMINI UNAVAILABLE: LEAD SEARCH FROM LOCAL DATA---")
+    return {
+        "lead_info_result": local_lead_answer(state["input"]),
+        "degraded_notes": [_LOCAL_MODE_NOTE],
+        "is_recommendation_flow": state.get("is_recommendation_flow", False),
+        "router_decision": state.get("router_decision")
+    }
+
+def _lead_node_degraded(state: AgentState, e: DeadlineExceeded):
+    note = "The lead search did not finish within its time budget and was skipped."
+    print(f"⏱️ {note} ({e})")
+    return {
+        "lead_info_result": "",
+        "degraded_notes": [note],
+        "is_recommendation_flow": state.get("is_recommendation_flow", False),
+        "router_decision": state.get("router_decision")
+    }
+
+def _plain_lead_criteria(state: AgentState) -> Optional[Dict[str, Any]]:
+    """search_leads criteria of a plain lead search ("Show me qualified leads in Texas"), answered from the lead template."""
+    if not TEMPLATED_LOOKUPS_ENABLED or _agent_input(state) != state["input"]:
+        return None
+    criteria = plain_lead_lookup(state["input"])
+    if criteria is not None:
+        print(f"---TEMPLATED LEAD SEARCH: {criteria} (agent skipped)---")
+    return criteria
+
+def _run_lead_agent(state: AgentState):
+    try:
+        agent_input = _agent_input(state)
+        key = _session_result_key(state)
+        cached_output = _cached_result(state, LEAD_RESULTS, key)
+        if cached_output is not None:
+            return _lead_node_update(state, {"output": cached_output})
+
+        criteria = _plain_lead_criteria(state)
+        if criteria is not None:
+            result = {"output": render_leads(search_leads.invoke(json.dumps(criteria)), criteria)}
+            _remember_result(state, LEAD_RESULTS, key, result)
+            return _lead_node_update(state, result)
+
+        result = lead_agent_executor.invoke({"input": agent_input})
+        _remember_result(state, LEAD_RESULTS, key, result)
+        return _lead_node_update(state, result)
+    except Exception as e:
+        return _lead_node_error(state, e)
+
+async def _arun_lead_agent(state: AgentState):
+    try:
+        agent_input = _agent_input(state)
+        key = _session_result_key(state)
+        cached_output = _cached_result(state, LEAD_RESULTS, key)
+        if cached_output is not None:
+            return _lead_node_update(state, {"output": cached_output})
+
+        criteria = _plain_lead_criteria(state)
+        if criteria is not None:
+            result = {"output": render_leads(await search_leads.ainvoke(json.dumps(criteria)), criteria)}
+            _remember_result(state, LEAD_RESULTS, key, result)
+            return _lead_node_update(state, result)
+
+        result = await lead_agent_executor.ainvoke({"input": agent_input})
+        _remember_result(state, LEAD_RESULTS, key, result)
+        return _lead_node_update(state, result)
+    except Exception as e:
+        return _lead_node_error(state, e)
 
 def run_lead_agent_node(state: AgentState):
     print("---EXECUTING LEAD AGENT---")
+    if llm_circuit_open():
+        return _lead_node_local(state)
     try:
-        result = lead_agent_executor.invoke({"input": state["input"]})
-        return {
-            "lead_info_result": result.get("output", ""), # Access safely
-            "intermediate_steps": result.get("intermediate_steps", []), # Access safely
-            "is_recommendation_flow": state.get("is_recommendation_flow", False),
-            "router_decision": state.get("router_decision")
-        }
+        return call_with_timeout(_run_lead_agent, node_timeout(state, LEAD_NODE_BUDGET_SECONDS), state)
+    except DeadlineExceeded as e:
+        return _lead_node_degraded(state, e)
+
+async def arun_lead_agent_node(state: AgentState):
+    print("---EXECUTING LEAD AGENT (async)---")
+    if llm_circuit_open():
+        return _lead_node_local(state)
+    try:
+        return await acall_with_timeout(lambda: _arun_lead_agent(state), node_timeout(state, LEAD_NODE_BUDGET_SECONDS))
+    except DeadlineExceeded as e:
+        return _lead_node_degraded(state, e)
+
+_PRODUCT_CATALOG_QUERY = "Tell me about all insurance products"
+# Product lines used for recommendations when the knowledge base lookup runs out of time
+_STANDARD_PRODUCT_LINES = "Auto Insurance, Home Insurance, Life Insurance, Health Insurance"
+
+def _knowledge_input(state: AgentState) -> str:
+    if state.get("is_recommendation_flow", False):
+        return _PRODUCT_CATALOG_QUERY
+    return _agent_input(state)
+
+def _knowledge_cache_key(state: AgentState) -> str:
+    if state.get("is_recommendation_flow", False):
+        # The product catalog fetched for recommendations is the same for every customer in the session
+        return _PRODUCT_CATALOG_QUERY if get_session_cache(state.get("session_id", "")) is not None else ""
+    return _session_result_key(state)
+
+def _knowledge_node_update(state: AgentState, result: Dict[str, Any]):
+    return {
+        "kb_info_result": result.get("output", ""), # Access safely
+        "intermediate_steps": result.get("intermediate_steps", []), # Access safely
+        "available_products_kb": result.get("output", ""), # Access safely
+        "is_recommendation_flow": state.get("is_recommendation_flow", False),
+        "router_decision": state.get("router_decision")
+    }
+
+def _knowledge_node_error(state: AgentState, e: Exception):
+    if isinstance(e, CircuitOpenError):
+        return _knowledge_node_local(state)
+    _raise_if_resumable(e)
+    if is_transient_error(e):
+        # Gemini still failing after its retries, and no checkpoint to resume from: answer locally
+        return _knowledge_node_local(state)
+    error_msg = f"Error in knowledge agent: {str(e)}"
+    print(f"❌ {error_msg}")
+    return {
+        "kb_info_result": "",
+        "error_message": error_msg,
+        "available_products_kb": "",
+        "is_recommendation_flow": state.get("is_recommendation_flow", False),
+        "router_decision": state.get("router_decision")
+    }
+
+def _knowledge_node_local(state: AgentState):
+    """Gemini unavailable: an extractive answer from the markdown knowledge base (no embeddings, no LLM)."""
+    print("---GEMINI UNAVAILABLE: KNOWLEDGE FROM LOCAL DATA---")
+    if state.get("is_recommendation_flow", False):
+        # The rule-based recommendation tool only needs the product lines
+        output = kb_product_lines() or _STANDARD_PRODUCT_LINES
+    else:
+        output = extractive_kb_answer(state["input"], banner=False)
+    return {
+        "kb_info_result": output,
+        "available_products_kb": output,
+        "degraded_notes": [_LOCAL_MODE_NOTE],
+        "is_recommendation_flow": state.get("is_recommendation_flow", False),
+        "router_decision": state.get("router_decision")
+    }
+
+def _knowledge_node_degraded(state: AgentState, e: DeadlineExceeded):
+    if state.get("is_recommendation_flow", False):
+        # Skip the KB enrichment: recommendations are still made from the customer's profile
+        note = "The product knowledge base lookup ran out of time; recommendations are based on our standard product lines."
+        available_products = _STANDARD_PRODUCT_LINES
+    else:
+        note = "The knowledge base did not answer within the time budget. Please try again in a moment."
+        available_products = ""
+    print(f"⏱️ {note} ({e})")
+    return {
+        "kb_info_result": "",
+        "available_products_kb": available_products,
+        "degraded_notes": [note],
+        "is_recommendation_flow": state.get("is_recommendation_flow", False),
+        "router_decision": state.get("router_decision")
+    }
+
+def _run_knowledge_agent(state: AgentState):
+    try:
+        key = _knowledge_cache_key(state)
+        cached_output = _cached_result(state, KB_ANSWERS, key)
+        if cached_output is not None:
+            return _knowledge_node_update(state, {"output": cached_output})
+
+        with use_speculation(state.get("speculation_id", "")):
+            result = knowledge_agent_executor.invoke({"input": _knowledge_input(state)})
+        _remember_result(state, KB_ANSWERS, key, result)
+        return _knowledge_node_update(state, result)
     except Exception as e:
-        error_msg = f"Error in lead agent: {str(e)}"
-        print(f"❌ {error_msg}")
-        return {
-            "lead_info_result": "",
-            "error_message": error_msg,
-            "is_recommendation_flow": state.get("is_recommendation_flow", False),
-            "router_decision": state.get("router_decision")
-        }
+        return _knowledge_node_error(state, e)
+
+async def _arun_knowledge_agent(state: AgentState):
+    try:
+        key = _knowledge_cache_key(state)
+        cached_output = _cached_result(state, KB_ANSWERS, key)
+        if cached_output is not None:
+            return _knowledge_node_update(state, {"output": cached_output})
+
+        with use_speculation(state.get("speculation_id", "")):
+            result = await knowledge_agent_executor.ainvoke({"input": _knowledge_input(state)})
+        _remember_result(state, KB_ANSWERS, key, result)
+        return _knowledge_node_update(state, result)
+    except Exception as e:
+        return _knowledge_node_error(state, e)
 
 def run_knowledge_agent_node(state: AgentState):
     print("---EXECUTING KNOWLEDGE AGENT---")
+    if llm_circuit_open():
+        return _knowledge_node_local(state)
     try:
-        kb_input = state["input"]
-        if state.get("is_recommendation_flow", False):
-            kb_input = "Tell me about all insurance products" 
-        
-        result = knowledge_agent_executor.invoke({"input": kb_input})
+        return call_with_timeout(_run_knowledge_agent, node_timeout(state, KNOWLEDGE_NODE_BUDGET_SECONDS), state)
+    except DeadlineExceeded as e:
+        return _knowledge_node_degraded(state, e)
 
-        return {
-            "kb_info_result": result.get("output", ""), # Access safely
-            "intermediate_steps": result.get("intermediate_steps", []), # Access safely
-            "available_products_kb": result.get("output", ""), # Access safely
-            "is_recommendation_flow": state.get("is_recommendation_flow", False),
-            "router_decision": state.get("router_decision")
-        }
-    except Exception as e:
-        error_msg = f"Error in knowledge agent: {str(e)}"
-        print(f"❌ {error_msg}")
-        return {
-            "kb_info_result": "",
-            "error_message": error_msg,
-            "available_products_kb": "",
-            "is_recommendation_flow": state.get("is_recommendation_flow", False),
-            "router_decision": state.get("router_decision")
-        }
+async def arun_knowledge_agent_node(state: AgentState):
+    print("---EXECUTING KNOWLEDGE AGENT (async)---")
+    if llm_circuit_open():
+        return _knowledge_node_local(state)
+    try:
+        return await acall_with_timeout(lambda: _arun_knowledge_agent(state), node_timeout(state, KNOWLEDGE_NODE_BUDGET_SECONDS))
+    except DeadlineExceeded as e:
+        return _knowledge_node_degraded(state, e)
 
 def run_recommendation_node(state: AgentState):
     print("---GENERATING RECOMMENDATIONS---")
@@ -200,6 +620,10 @@ def run_recommendation_node(state: AgentState):
             "customer_profile_json": customer_profile_json,
             "available_products_kb": state.get("available_products_kb", "")
         })
+        recommendation_cache = get_recommendation_cache()
+        if recommendation_cache is not None and state.get("available_products_kb"):
+            # Materialize it: the next request for this customer is served by recommendation_cache_node
+            recommendation_cache.put(customer_profile_dict, state.get("customer_info_result", ""), recommendation_output)
         return {"recommendation_result": recommendation_output}
     except Exception as e:
         error_msg = f"Error in recommendation generation: {str(e)}"
@@ -209,8 +633,17 @@ def run_recommendation_node(state: AgentState):
             "error_message": error_msg
         }
 
+def _with_degraded_notes(state: AgentState, final_msg: str) -> str:
+    """Appends what was skipped (latency budget) or answered locally (circuit open), so a partial answer is labelled as such."""
+    notes = list(dict.fromkeys(state.get("degraded_notes") or []))
+    if not notes:
+        return final_msg
+    note_lines = "\n".join(f"- {note}" for note in notes)
+    return f"{final_msg}\n\n---\n⏱️ **Partial response:**\n{note_lines}"
+
 def generate_final_response_node(state: AgentState):
     print("---GENERATING FINAL RESPONSE (ORCHESTRATOR'S AGGREGATION)---")
+    release_speculation(state.get("speculation_id", ""))
     response_parts = []
     
     error_msg = state.get("error_message", "").strip()
@@ -257,7 +690,7 @@ def generate_final_response_node(state: AgentState):
                 if filtered_customer_info:
                     response_parts.append(f"## 👤 Customer Profile\n\n{filtered_customer_info}\n")
             
-            return {"final_response": "\n".join(response_parts)}
+            return {"final_response": _with_degraded_notes(state, "\n".join(response_parts))}
     
     # Nếu không phải recommendation flow hoặc recommendation failed
     customer_res = state.get("customer_info_result", "").strip()
@@ -292,54 +725,206 @@ def generate_final_response_node(state: AgentState):
     if not final_msg and error_msg:
         final_msg = f"⚠️ **An internal error occurred:** {error_msg}"
     
-    return {"final_response": final_msg}
+    return {"final_response": _with_degraded_notes(state, final_msg)}
 
-# Helper function to determine the routing target based on LLM's decision
-def _determine_routing_target(state: AgentState) -> str:
-    """Uses LLM to classify intent and returns the target node name string."""
-    llm = ChatGoogleGenerativeAI(model=GEMINI_MODEL_NAME, google_api_key=GOOGLE_API_KEY, temperature=0.0)
-    
-    router_prompt = ChatPromptTemplate.from_messages([
-        ("system", """You are an expert routing assistant (Orchestrator). Your task is to analyze the user's query and determine
-        the primary intent to route it to the most suitable specialized agent or workflow.
-        Reply with ONLY ONE of the following keywords: "customer", "lead", "knowledge", "recommendation_workflow", or "general".
-        
-        - Use "customer" for queries directly about existing customers, their policies, or history (e.g., "Find customer John Doe", "What are CUST001's policies?", "Email of Jane Doe").
-        - Use "lead" for queries about potential leads, sales prospects, lead scores, or lead lists (e.g., "Find qualified leads", "Leads interested in auto insurance", "Show me leads in California").
-        - Use "knowledge" for general questions about insurance products, definitions, policy types, or FAQs (e.g., "What is life insurance?", "Explain comprehensive coverage", "What is a premium?").
-        - Use "recommendation_workflow" if the query explicitly asks to find customer info AND recommend products based on that profile (e.g., "Find customer John Doe and recommend insurance products based on his profile", "Recommend coverage for Sarah Johnson").
-        - Use "general" if the query doesn't fit any of the above categories or is a general conversational question.
-        """),
-        ("human", "{input}")
-    ])
-    
-    router_chain = router_prompt | llm
-    
-    try:
-        response = router_chain.invoke({"input": state["input"]}).content.lower().strip()
-    except Exception as e:
-        print(f"ERROR in LLM router: {e}. Defaulting to knowledge agent.")
-        response = "general"
-        
-    print(f"---ORCHESTRATOR DECISION: {response}---")
-
-    if "recommendation_workflow" in response:
+def _route_label_to_target(label: str) -> str:
+    """Maps a router label (or raw LLM reply) to the name of the node that handles it."""
+    if "recommendation_workflow" in label:
         return "set_recommendation_flag"
-    elif "customer" in response:
+    elif "customer" in label:
         return "customer_agent_node"
-    elif "lead" in response:
+    elif "lead" in label:
         return "lead_agent_node"
-    elif "knowledge" in response:
+    elif "knowledge" in label:
         return "knowledge_agent_node"
     else:
         return "knowledge_agent_node"
 
+_ROUTER_PROMPT = ChatPromptTemplate.from_messages([
+    ("system", """You are an expert routing assistant (Orchestrator). Your task is to analyze the user's query and determine
+    the primary intent to route it to the most suitable specialized agent or workflow.
+    Reply with ONLY ONE of the following keywords: "customer", "lead", "knowledge", "recommendation_workflow", or "general".
+    
+    - Use "customer" for queries directly about existing customers, their policies, or history, including statistics over the customer book (e.g., "Find customer John Doe", "What are CUST001's policies?", "Email of Jane Doe", "Total premium by policy type").
+    - Use "lead" for queries about potential leads, sales prospects, lead scores, lead lists, or lead counts (e.g., "Find qualified leads", "Leads interested in auto insurance", "Show me leads in California", "How many qualified leads per state?").
+    - Use "knowledge" for general questions about insurance products, definitions, policy types, or FAQs (e.g., "What is life insurance?", "Explain comprehensive coverage", "What is a premium?").
+    - Use "recommendation_workflow" if the query explicitly asks to find customer info AND recommend products based on that profile (e.g., "Find customer John Doe and recommend insurance products based on his profile", "Recommend coverage for Sarah Johnson").
+    - Use "general" if the query doesn't fit any of the above categories or is a general conversational question.
+    """),
+    ("human", "{input}")
+])
+
+def _router_chain():
+    llm = create_chat_llm()
+    return _ROUTER_PROMPT | llm
+
+def _classify_with_llm(query: str) -> str:
+    """Uses LLM to classify intent and returns its raw (lower-cased) reply. Errors propagate to the caller."""
+    return _router_chain().invoke({"input": query}).content.lower().strip()
+
+async def _aclassify_with_llm(query: str) -> str:
+    response = await _router_chain().ainvoke({"input": query})
+    return response.content.lower().strip()
+
+def _route_locally(query: str, use_cache: bool = True) -> Optional[Tuple[str, str]]:
+    """
+    Tries the local routing stages in order: rule-based pre-router, trained intent classifier, and the
+    cache of earlier LLM decisions for the same query shape. Returns (target node name, path) or None.
+    """
+    if ROUTER_RULES_ENABLED:
+        label, confidence = classify_query_rules(query, threshold=ROUTER_RULES_CONFIDENCE)
+        if label:
+            print(f"---ORCHESTRATOR DECISION: {label} (path: rules, confidence={confidence:.2f})---")
+            return _route_label_to_target(label), "rules"
+
+    if INTENT_CLASSIFIER_ENABLED:
+        classifier = get_intent_classifier()
+        if classifier is not None:
+            label, probability = classifier.predict(query, threshold=INTENT_CLASSIFIER_THRESHOLD)
+            if label:
+                print(f"---ORCHESTRATOR DECISION: {label} (path: classifier, p={probability:.2f})---")
+                return _route_label_to_target(label), "classifier"
+
+    if ROUTER_CACHE_ENABLED and use_cache:
+        router_cache = get_router_cache()
+        label = router_cache.get(query)
+        if label:
+            print(f"---ORCHESTRATOR DECISION: {label} (path: cache, hit rate={router_cache.stats()['hit_rate']:.1%})---")
+            return _route_label_to_target(label), "cache"
+
+    return None
+
+def _route_best_effort(query: str, reason: str = "LLM router out of time") -> Tuple[str, str]:
+    """Local routing without confidence thresholds, for when the LLM router is out of time or unavailable."""
+    label, _ = classify_query_rules(query, threshold=0.0, min_margin=0.0)
+    if not label and INTENT_CLASSIFIER_ENABLED:
+        classifier = get_intent_classifier()
+        if classifier is not None:
+            label, _ = classifier.predict(query, threshold=0.0)
+    label = label or "general"
+    print(f"---ORCHESTRATOR DECISION: {label} (path: fallback, {reason})---")
+    return _route_label_to_target(label), "fallback"
+
+def _route_from_llm_reply(query: str, response: str, latency_ms: float, record: bool = True) -> Tuple[str, str]:
+    print(f"---ORCHESTRATOR DECISION: {response} (path: llm, {latency_ms:.0f}ms)---")
+    if not record:
+        # Decided with the conversation context: the query alone does not determine this route
+        return _route_label_to_target(response), "llm"
+    if ROUTER_CACHE_ENABLED:
+        get_router_cache().put(query, normalize_router_label(response))
+    if ROUTER_DECISION_LOG_ENABLED:
+        # LLM decisions are the teacher labels for retraining the local classifier
+        log_router_decision(query, response, "llm", latency_ms)
+    return _route_label_to_target(response), "llm"
+
+def _start_speculation(state: AgentState) -> str:
+    """
+    Starts the knowledge base top-k search and the CRM lookup for a query that is about to wait for the LLM router.
+    Returns the speculation id, or "" when disabled or when the query only makes sense with the conversation.
+    """
+    if not SPECULATIVE_RETRIEVAL_ENABLED:
+        return ""
+    if state.get("conversation_context") and is_follow_up(state["input"]):
+        return ""
+    return start_speculation(state["input"],
+                             lambda query: retrieve_scored(get_global_vector_store(), query),
+                             find_entities)
+
+# Routes reading the speculation: the knowledge node its documents, the customer and recommendation nodes its CRM matches
+_SPECULATION_ROUTES = {"knowledge_agent_node", "customer_agent_node", "set_recommendation_flag"}
+
+def _settle_speculation(speculation_id: str, target_node_name: str) -> str:
+    """Keeps the speculation for the routes that use it (its id goes into the state) and drops it for the others."""
+    if speculation_id and target_node_name not in _SPECULATION_ROUTES:
+        drop_speculation(speculation_id)
+        return ""
+    return speculation_id
+
+# Helper function to determine the routing target
+def _determine_routing_target(state: AgentState, before_llm_call: Optional[Callable[[], None]] = None) -> Tuple[str, str]:
+    """
+    Classifies intent and returns (target node name, path that decided it).
+    Obvious queries are decided locally by the rule-based pre-router, then by the trained intent classifier,
+    then by the cache of earlier LLM decisions for the same query shape; only the rest pay for an LLM call.
+    Follow-up queries in a conversation are routed by the LLM with the conversation context and bypass the cache.
+    before_llm_call runs just before that LLM call (the speculative retrieval starts there).
+    """
+    query = state["input"]
+    conversation_context = state.get("conversation_context", "")
+    matches = find_entities(query) if conversation_context else None
+    context_dependent = bool(conversation_context) and is_follow_up(query, matches)
+    local_decision = _route_locally(query, use_cache=not context_dependent)
+    if local_decision:
+        return local_decision
+    if llm_circuit_open():
+        return _route_best_effort(query, "LLM circuit breaker open")
+    if before_llm_call is not None:
+        before_llm_call()
+
+    start_time = time.perf_counter()
+    try:
+        response = call_with_timeout(_classify_with_llm, node_timeout(state, ROUTER_BUDGET_SECONDS),
+                                     contextualize_query(query, conversation_context, matches))
+    except DeadlineExceeded:
+        return _route_best_effort(query)
+    except CircuitOpenError:
+        return _route_best_effort(query, "LLM circuit breaker open")
+    except Exception as e:
+        print(f"ERROR in LLM router: {e}. Defaulting to knowledge agent.")
+        return _route_label_to_target("general"), "llm"
+    return _route_from_llm_reply(query, response, (time.perf_counter() - start_time) * 1000, record=not context_dependent)
+
+async def _adetermine_routing_target(state: AgentState, before_llm_call: Optional[Callable[[], None]] = None) -> Tuple[str, str]:
+    query = state["input"]
+    conversation_context = state.get("conversation_context", "")
+    matches = find_entities(query) if conversation_context else None
+    context_dependent = bool(conversation_context) and is_follow_up(query, matches)
+    local_decision = _route_locally(query, use_cache=not context_dependent)
+    if local_decision:
+        return local_decision
+    if llm_circuit_open():
+        return _route_best_effort(query, "LLM circuit breaker open")
+    if before_llm_call is not None:
+        before_llm_call()
+
+    start_time = time.perf_counter()
+    try:
+        routing_query = contextualize_query(query, conversation_context, matches)
+        response = await acall_with_timeout(lambda: _aclassify_with_llm(routing_query), node_timeout(state, ROUTER_BUDGET_SECONDS))
+    except DeadlineExceeded:
+        return _route_best_effort(query)
+    except CircuitOpenError:
+        return _route_best_effort(query, "LLM circuit breaker open")
+    except Exception as e:
+        print(f"ERROR in LLM router: {e}. Defaulting to knowledge agent.")
+        return _route_label_to_target("general"), "llm"
+    return _route_from_llm_reply(query, response, (time.perf_counter() - start_time) * 1000, record=not context_dependent)
+
 # This is the actual NODE function that will update AgentState
 def run_router_node(state: AgentState):
     print("---ORCHESTRATOR: INTENT CLASSIFICATION & ROUTING NODE---")
+    speculation_id = ""
+
+    def speculate():
+        nonlocal speculation_id
+        speculation_id = _start_speculation(state)
+
     # Call the helper function to get the target node name
-    target_node_name = _determine_routing_target(state)
-    return {"router_decision": target_node_name}
+    target_node_name, router_path = _determine_routing_target(state, before_llm_call=speculate)
+    return {"router_decision": target_node_name, "router_path": router_path,
+            "speculation_id": _settle_speculation(speculation_id, target_node_name)}
+
+async def arun_router_node(state: AgentState):
+    print("---ORCHESTRATOR: INTENT CLASSIFICATION & ROUTING NODE (async)---")
+    speculation_id = ""
+
+    def speculate():
+        nonlocal speculation_id
+        speculation_id = _start_speculation(state)
+
+    target_node_name, router_path = await _adetermine_routing_target(state, before_llm_call=speculate)
+    return {"router_decision": target_node_name, "router_path": router_path,
+            "speculation_id": _settle_speculation(speculation_id, target_node_name)}
 
 
 def set_recommendation_flag_node(state: AgentState):
@@ -347,35 +932,92 @@ def set_recommendation_flag_node(state: AgentState):
     # Preserve original router_decision from previous node
     return {"is_recommendation_flow": True, "router_decision": state.get("router_decision")}
 
+def recommendation_cache_node(state: AgentState):
+    """Serves a materialized recommendation when the query names a customer that has a fresh one (no agents)."""
+    print("---ORCHESTRATOR: RECOMMENDATION CACHE LOOKUP---")
+    recommendation_cache = get_recommendation_cache()
+    if recommendation_cache is None:
+        return {"recommendation_result": ""}
+    cached = _cached_customer(state)
+    record = cached["record"] if cached else resolve_customer(state["input"], matches=_input_entities(state))
+    entry = recommendation_cache.get(record) if record else None
+    if entry is None:
+        return {"recommendation_result": ""}
+    print(f"---RECOMMENDATION CACHE HIT: {record.get('id')} (customer and knowledge agents skipped)---")
+    return {
+        "customer_profile": record,
+        "customer_info_result": entry["customer_answer"],
+        "recommendation_result": entry["recommendation"],
+    }
+
+def _route_after_recommendation_cache(state: AgentState):
+    if state.get("recommendation_result"):
+        return "final_response_node"
+    # Miss: fan out to the customer lookup and the product KB fetch
+    return ["customer_profile_branch", "product_knowledge_branch"]
+
+
+# 4. Initial state for a single request
+def create_initial_state(query: str, chat_history: Optional[List[BaseMessage]] = None,
+                         conversation_context: str = "", session_id: str = "",
+                         deadline_seconds: Optional[float] = None) -> Dict[str, Any]:
+    """
+    Initial state for one request. The request deadline starts now: deadline_seconds, or
+    REQUEST_DEADLINE_SECONDS when not given (0 = no deadline).
+    """
+    return {
+        "input": query, 
+        "chat_history": chat_history or [], 
+        "conversation_context": conversation_context,
+        "session_id": session_id,
+        "customer_info_result": "", 
+        "lead_info_result": "", 
+        "kb_info_result": "", 
+        "customer_profile": {}, 
+        "available_products_kb": "", 
+        "recommendation_result": "",
+        "final_response": "", 
+        "intermediate_steps": [],
+        "is_recommendation_flow": False,
+        "error_message": "",
+        "router_decision": "", # Initialize router_decision
+        "router_path": "",
+        "speculation_id": "",
+        "deadline": request_deadline(REQUEST_DEADLINE_SECONDS if deadline_seconds is None else deadline_seconds),
+        "degraded_notes": [],
+    }
+
 
 # 5. Build the Graph
-def create_multi_agent_workflow():
+def _dual_node(func, afunc) -> RunnableLambda:
+    """Wraps a sync/async node pair: app.invoke/app.stream run func, app.ainvoke/app.astream await afunc."""
+    return RunnableLambda(func, afunc=afunc, name=func.__name__)
+
+def create_multi_agent_workflow(checkpointer=None):
+    """
+    Builds and compiles the workflow. With a checkpointer (utils/checkpointing.py), runs invoked with a
+    thread id are persisted after every step and can be resumed from the last completed node.
+    """
     workflow = StateGraph(AgentState)
 
     # Add ALL nodes (Orchestrator manages these specialized agents)
-    workflow.add_node("customer_agent_node", run_customer_agent_node)
-    workflow.add_node("lead_agent_node", run_lead_agent_node)
-    workflow.add_node("knowledge_agent_node", run_knowledge_agent_node)
+    workflow.add_node("customer_agent_node", _dual_node(run_customer_agent_node, arun_customer_agent_node))
+    workflow.add_node("lead_agent_node", _dual_node(run_lead_agent_node, arun_lead_agent_node))
+    workflow.add_node("knowledge_agent_node", _dual_node(run_knowledge_agent_node, arun_knowledge_agent_node))
     workflow.add_node("run_recommendation_node", run_recommendation_node) 
     workflow.add_node("final_response_node", generate_final_response_node)
     
     # The new router node
-    workflow.add_node("router_node", run_router_node)
+    workflow.add_node("router_node", _dual_node(run_router_node, arun_router_node))
 
 
     # Specific nodes for recommendation flow setup
     workflow.add_node("set_recommendation_flag", set_recommendation_flag_node)
-    
-    def prepare_kb_query_for_recommendation_node(state: AgentState):
-        print("---ORCHESTRATOR: PREPARING KB QUERY FOR RECOMMENDATION---")
-        # Overwrite input with a general KB query for product info
-        # Keep chat_history if needed for context in future steps, but not used here.
-        return {
-            "input": "Tell me about all insurance products", 
-            "chat_history": state["chat_history"],
-            "router_decision": state.get("router_decision") # Pass router decision
-        }
-    workflow.add_node("prepare_kb_query_for_recommendation", prepare_kb_query_for_recommendation_node)
+    workflow.add_node("recommendation_cache_node", recommendation_cache_node)
+    # The recommendation flow fans out: the customer lookup and the product KB fetch are independent,
+    # so they run as parallel branches (same node functions, dedicated node names) and join before recommendation.
+    workflow.add_node("customer_profile_branch", _dual_node(run_customer_agent_node, arun_customer_agent_node))
+    workflow.add_node("product_knowledge_branch", _dual_node(run_knowledge_agent_node, arun_knowledge_agent_node))
 
 
     # Set the general entry point (Orchestrator starts here)
@@ -394,44 +1036,31 @@ def create_multi_agent_workflow():
         },
     )
 
-    # Workflow Coordination: Recommendation Flow
-    workflow.add_edge("set_recommendation_flag", "customer_agent_node") # Execute CustomerAgent for profile
-    
-    # After CustomerAgent: If it's a recommendation flow AND customer profile is found, get KB. Else, generate final response.
+    # Workflow Coordination: Recommendation Flow (fan-out)
+    workflow.add_edge("set_recommendation_flag", "recommendation_cache_node")
+    # A fresh materialized recommendation goes straight to the final response; otherwise the CustomerAgent
+    # fetches the profile while the product info is fetched concurrently
     workflow.add_conditional_edges(
-        "customer_agent_node",
-        lambda state: "prepare_kb_query_for_recommendation" 
-            if state.get("is_recommendation_flow", False) and state.get("customer_profile") and state["customer_profile"] 
-            else "final_response_node",
-        {
-            "prepare_kb_query_for_recommendation": "prepare_kb_query_for_recommendation",
-            "final_response_node": "final_response_node"
-        }
+        "recommendation_cache_node",
+        _route_after_recommendation_cache,
+        ["final_response_node", "customer_profile_branch", "product_knowledge_branch"]
     )
-    
-    workflow.add_edge("prepare_kb_query_for_recommendation", "knowledge_agent_node") # Get general product info
 
-    # After KnowledgeAgent: If it's a recommendation flow AND all data is ready, run recommendation. Else, generate final response.
-    workflow.add_conditional_edges(
-        "knowledge_agent_node",
-        lambda state: "run_recommendation_node" 
-            if state.get("is_recommendation_flow", False) and state.get("available_products_kb") and state["available_products_kb"] and state.get("customer_profile") and state["customer_profile"]
-            else "final_response_node",
-        {
-            "run_recommendation_node": "run_recommendation_node",
-            "final_response_node": "final_response_node" 
-        }
-    )
+    # Join: run_recommendation_node waits for both branches. It reports a missing profile or missing
+    # product info itself, and the final response falls back to the customer details in that case.
+    workflow.add_edge(["customer_profile_branch", "product_knowledge_branch"], "run_recommendation_node")
 
     workflow.add_edge("run_recommendation_node", "final_response_node") # Generate final recommendation
 
     # Workflow Coordination: Single Agent Paths (direct to final response)
+    workflow.add_edge("customer_agent_node", "final_response_node")
     workflow.add_edge("lead_agent_node", "final_response_node")
+    workflow.add_edge("knowledge_agent_node", "final_response_node")
     
     # Response Aggregation and Delivery
     workflow.add_edge("final_response_node", END)
 
-    return workflow.compile()
+    return workflow.compile(checkpointer=checkpointer)
 
 if __name__ == "__main__":
     app = create_multi_agent_workflow()
@@ -457,23 +1086,20 @@ if __name__ == "__main__":
         "Recommend coverage for John Doe",
     ]
 
+    if "--async" in sys.argv:
+        # Run every test query concurrently on one event loop: LLM waits overlap instead of queueing
+        async def run_all():
+            start_time = time.perf_counter()
+            results = await asyncio.gather(*(app.ainvoke(create_initial_state(q)) for q in test_queries))
+            for query, result in zip(test_queries, results):
+                print(f"\n--- USER QUERY: {query} ---\nFinal Response: {result.get('final_response', '')}")
+            print(f"\n{len(test_queries)} queries completed in {time.perf_counter() - start_time:.2f}s")
+        asyncio.run(run_all())
+        sys.exit(0)
+
     for query in test_queries:
         print(f"\n--- USER QUERY: {query} ---")
-        initial_state = {
-            "input": query, 
-            "chat_history": [], 
-            "customer_info_result": "", 
-            "lead_info_result": "", 
-            "kb_info_result": "", 
-            "customer_profile": {}, 
-            "available_products_kb": "", 
-            "recommendation_result": "",
-            "final_response": "", 
-            "intermediate_steps": [],
-            "is_recommendation_flow": False,
-            "error_message": "",
-            "router_decision": "" # Initialize router_decision
-        }
+        initial_state = create_initial_state(query)
         for s in app.stream(initial_state, stream_mode="updates"):
             if "__end__" not in s:
                 for key, value in s.items():
@@ -2,14 +2,23 @@
 import streamlit as st
 from langchain_core.messages import HumanMessage, AIMessage
 import time
+import uuid
 
 # Import create_multi_agent_workflow from langgraph_workflow.py
-from langgraph_workflow import create_multi_agent_workflow
+from langgraph_workflow import create_multi_agent_workflow, create_initial_state
+from utils.streaming import FinalAnswerStream
+from utils.conversation_memory import create_conversation_memory, is_follow_up
+from utils.session_cache import cache_key, clear_session_cache
+from utils.checkpointing import get_checkpointer, thread_config, resume_delay
+from utils.errors import is_transient_error
+from utils.single_flight import get_single_flight, single_flight_stats
+from utils.circuit_breaker import llm_circuit_open
+from config import CONVERSATION_MEMORY_ENABLED, CHECKPOINT_RESUME_ATTEMPTS, REQUEST_COALESCING_ENABLED, WORKFLOW_MAX_IN_FLIGHT
 
 # Use st.cache_resource so the LangGraph app is initialized only once.
 @st.cache_resource
 def get_langgraph_app():
-    return create_multi_agent_workflow()
+    return create_multi_agent_workflow(checkpointer=get_checkpointer())
 
 app = get_langgraph_app()
 
@@ -265,97 +274,175 @@ if "agent_execution_log" not in st.session_state:
     st.session_state.agent_execution_log = []
 if "total_queries" not in st.session_state:
     st.session_state.total_queries = 0
+if "conversation_memory" not in st.session_state:
+    st.session_state.conversation_memory = create_conversation_memory()
+if "session_id" not in st.session_state:
+    st.session_state.session_id = uuid.uuid4().hex
 
-def get_response(user_query: str) -> str:
+
+def reset_session() -> None:
+    """Forgets the conversation and the entities cached for it."""
+    st.session_state.chat_history = []
+    st.session_state.conversation_memory.clear()
+    clear_session_cache(st.session_state.session_id)
+    st.session_state.session_id = uuid.uuid4().hex
+
+def _log(entry: str, status=None) -> None:
+    """Adds an entry to the execution log and, while a query is running, to its live status box."""
+    st.session_state.agent_execution_log.append(entry)
+    if status is not None:
+        status.markdown(entry)
+
+
+def _stream_workflow(inputs: dict, publish) -> dict:
+    """
+    Streams one workflow run, reporting through publish(event): ("answer", answer text so far) for answer tokens
+    and ("log", entry) for node progress. Returns the final state.
+    No Streamlit calls here: a coalesced run is shared by several sessions, and each renders the events itself.
+    """
+    last_state = None
+    answer_stream = FinalAnswerStream()
+    # Each request runs in its own checkpointed thread: after a transient failure (rate limit, timeout)
+    # the run resumes from the last completed node instead of repeating the finished LLM calls
+    config = thread_config(f"{inputs['session_id'] or 'run'}-{uuid.uuid4().hex[:8]}") if app.checkpointer else None
+    stream_input = inputs
+    attempt = 0
+
+    def log(entry: str) -> None:
+        publish(("log", entry))
+
+    while True:
+        try:
+            for mode, payload in app.stream(stream_input, config, stream_mode=["updates", "messages"]):
+                if mode == "messages":
+                    chunk, metadata = payload
+                    answer_so_far = answer_stream.feed(chunk, metadata)
+                    if answer_so_far is not None:
+                        publish(("answer", answer_so_far))
+                    continue
+
+                for key, value in payload.items():
+                    if isinstance(value, dict):
+                        if last_state is None:
+                            last_state = value.copy()
+                        else:
+                            last_state.update(value)
+            
+                    if key == "router_node":
+                        router_decision = value.get("router_decision") 
+                        if router_decision:
+                            router_path = value.get("router_path") or "llm"
+                            log(
+                                f"🔄 **Routing Decision:** `{router_decision}` (decided by {router_path})",
+                            )
+            
+                    elif key == "set_recommendation_flag":
+                        log(
+                            "🚩 **Flag Set:** Recommendation flow activated",
+                        )
+            
+                    elif key.endswith("_agent_node") or key.endswith("_branch") or key == "run_recommendation_node":
+                        agent_name = key.replace("_agent_node", "").replace("_branch", "").replace("run_", "").replace("_", " ").title()
+
+                        if value.get("intermediate_steps"):
+                            for action, observation in value["intermediate_steps"]:
+                                log(
+                                    f"🔧 **{agent_name}:** `{action.tool}({action.tool_input})`",
+                                )
+                                display_observation = str(observation)
+                                if len(display_observation) > 100:
+                                    display_observation = display_observation[:97] + "..."
+                                log(
+                                    f"✅ **Result:** {display_observation}",
+                                )
+                
+                        if value.get("customer_info_result"):
+                            log(
+                                f"👤 **Customer Info:** Found customer data",
+                            )
+                        elif value.get("lead_info_result"):
+                            log(
+                                f"📊 **Leads Info:** Retrieved lead information",
+                            )
+                        elif value.get("kb_info_result"):
+                            log(
+                                f"📚 **Knowledge Base:** Retrieved relevant information",
+                            )
+                        elif value.get("recommendation_result"):
+                            log(
+                                "🎯 **Recommendations:** Generated personalized recommendations",
+                            )
+
+                    elif key == "final_response_node":
+                        if value.get("final_response"):
+                            log(
+                                "✨ **Response:** Finalized and ready",
+                            )
+            
+                    if value.get("error_message"): 
+                        log(
+                            f"❌ **Error:** {value['error_message']}",
+                        )
+                    for note in value.get("degraded_notes") or []:
+                        log(f"⏱️ **Degraded:** {note}")
+    
+            break
+        except Exception as e:
+            attempt += 1
+            if config is None or not is_transient_error(e) or attempt > CHECKPOINT_RESUME_ATTEMPTS:
+                raise
+            log(f"♻️ **Resuming:** transient error ({e}), continuing from the last completed step")
+            time.sleep(resume_delay(attempt))
+            stream_input = None
+
+    return last_state
+
+
+def get_response(user_query: str, answer_placeholder=None, status=None) -> str:
     """
     Execute the multi-agent workflow and stream results.
+    Answer tokens are rendered progressively into answer_placeholder and node progress into status
+    (an st.status container) as they arrive; the formatted final response is returned at the end.
     """
     st.session_state.agent_execution_log = []
     st.session_state.total_queries += 1
     
-    inputs = {
-        "input": user_query,
-        "chat_history": [],
-        "customer_info_result": "",
-        "lead_info_result": "",
-        "kb_info_result": "",
-        "customer_profile": {}, 
-        "available_products_kb": "", 
-        "recommendation_result": "", 
-        "final_response": "",
-        "intermediate_steps": [],
-        "is_recommendation_flow": False,
-        "error_message": "",
-        "router_decision": ""
-    }
+    # Bounded context of the earlier turns, computed once at the end of the previous turn
+    memory = st.session_state.conversation_memory
+    if CONVERSATION_MEMORY_ENABLED:
+        inputs = create_initial_state(user_query, memory.window(), memory.context(), st.session_state.session_id)
+    else:
+        inputs = create_initial_state(user_query, session_id=st.session_state.session_id)
     
     full_response = ""
-    last_state = None
     start_time = time.time()
+    first_token_time = None
+
+    def render(event) -> None:
+        nonlocal first_token_time
+        kind, value = event
+        if kind == "answer":
+            if first_token_time is None:
+                first_token_time = time.time()
+            if answer_placeholder is not None:
+                answer_placeholder.markdown(value + " ▌")
+        else:
+            _log(value, status)
     
     try:
-        for s in app.stream(inputs, stream_mode="updates"):
-            for key, value in s.items():
-                if isinstance(value, dict):
-                    if last_state is None:
-                        last_state = value.copy()
-                    else:
-                        last_state.update(value)
-                
-                if key == "router_node":
-                    router_decision = value.get("router_decision") 
-                    if router_decision:
-                        st.session_state.agent_execution_log.append(
-                            f"🔄 **Routing Decision:** `{router_decision}`"
-                        )
-                
-                elif key == "set_recommendation_flag":
-                    st.session_state.agent_execution_log.append(
-                        "🚩 **Flag Set:** Recommendation flow activated"
-                    )
-                
-                elif key.endswith("_agent_node") or key == "run_recommendation_node" or key == "prepare_kb_query_for_recommendation":
-                    agent_name = key.replace("_agent_node", "").replace("run_", "").replace("_", " ").title()
-
-                    if value.get("intermediate_steps"):
-                        for action, observation in value["intermediate_steps"]:
-                            st.session_state.agent_execution_log.append(
-                                f"🔧 **{agent_name}:** `{action.tool}({action.tool_input})`"
-                            )
-                            display_observation = str(observation)
-                            if len(display_observation) > 100:
-                                display_observation = display_observation[:97] + "..."
-                            st.session_state.agent_execution_log.append(
-                                f"✅ **Result:** {display_observation}"
-                            )
-                    
-                    if value.get("customer_info_result"):
-                        st.session_state.agent_execution_log.append(
-                            f"👤 **Customer Info:** Found customer data"
-                        )
-                    elif value.get("lead_info_result"):
-                        st.session_state.agent_execution_log.append(
-                            f"📊 **Leads Info:** Retrieved lead information"
-                        )
-                    elif value.get("kb_info_result"):
-                        st.session_state.agent_execution_log.append(
-                            f"📚 **Knowledge Base:** Retrieved relevant information"
-                        )
-                    elif value.get("recommendation_result"):
-                        st.session_state.agent_execution_log.append(
-                            "🎯 **Recommendations:** Generated personalized recommendations"
-                        )
-
-                elif key == "final_response_node":
-                    if value.get("final_response"):
-                        st.session_state.agent_execution_log.append(
-                            "✨ **Response:** Finalized and ready"
-                        )
-                
-                if value.get("error_message"): 
-                    st.session_state.agent_execution_log.append(
-                        f"❌ **Error:** {value['error_message']}"
-                    )
+        # Identical self-contained queries arriving together (e.g. the same sidebar example clicked by many users)
+        # share one graph run. Follow-ups depend on this session's conversation, so they always run on their own.
+        if REQUEST_COALESCING_ENABLED and not (inputs["conversation_context"] and is_follow_up(user_query)):
+            # The shared run publishes its progress; every waiting session replays it into its own UI
+            last_state, shared = get_single_flight("workflow", WORKFLOW_MAX_IN_FLIGHT).stream(
+                cache_key(user_query),
+                lambda publish: _stream_workflow(inputs, publish),
+                render,
+            )
+            if shared:
+                _log("🔗 **Coalesced:** joined an identical request already in flight", status)
+        else:
+            last_state = _stream_workflow(inputs, render)
         
         if last_state:
             full_response = last_state.get('final_response', "No final response generated.")
@@ -368,13 +455,13 @@ def get_response(user_query: str) -> str:
             
     except Exception as e:
         full_response = f"An unexpected error occurred: {e}"
-        st.session_state.agent_execution_log.append(f"❌ **Critical Error:** {e}")
+        _log(f"❌ **Critical Error:** {e}", status)
     
     end_time = time.time()
     response_time = end_time - start_time
-    st.session_state.agent_execution_log.append(
-        f"⏱️ **Completed in:** {response_time:.2f} seconds"
-    )
+    if first_token_time is not None:
+        _log(f"⚡ **First token after:** {first_token_time - start_time:.2f} seconds", status)
+    _log(f"⏱️ **Completed in:** {response_time:.2f} seconds", status)
 
     return full_response
 
@@ -414,17 +501,31 @@ with col1:
     
     st.markdown('</div>', unsafe_allow_html=True)
 
+def run_query(query: str) -> None:
+    """Runs a query, streaming the answer and node progress into the conversation column, then re-renders."""
+    st.session_state.chat_history.append(HumanMessage(content=query))
+    
+    with col1:
+        with st.chat_message("user", avatar="👤"):
+            st.markdown(query)
+        with st.chat_message("assistant", avatar="🤖"):
+            status = st.status("🔄 Processing your request...", expanded=False)
+            answer_placeholder = st.empty()
+            ai_response = get_response(query, answer_placeholder, status)
+            status.update(label="✅ Done", state="complete")
+            answer_placeholder.markdown(ai_response)
+    
+    st.session_state.chat_history.append(AIMessage(content=ai_response))
+    if CONVERSATION_MEMORY_ENABLED:
+        st.session_state.conversation_memory.update(st.session_state.chat_history)
+    st.rerun()
+
+
 # User input (outside columns for full width)
 user_query = st.chat_input("💭 Type your message here...")
 
 if user_query:
-    st.session_state.chat_history.append(HumanMessage(content=user_query))
-    
-    with st.spinner("🔄 Processing your request..."):
-        ai_response = get_response(user_query)
-    
-    st.session_state.chat_history.append(AIMessage(content=ai_response))
-    st.rerun()
+    run_query(user_query)
 
 
 with col2:
@@ -436,6 +537,17 @@ with col2:
     </div>
     """, unsafe_allow_html=True)
     
+    # Calls saved by coalescing identical in-flight requests (process-wide, across all sessions)
+    coalescing_stats = single_flight_stats()
+    saved_calls = sum(group["coalesced"] for group in coalescing_stats.values())
+    if saved_calls:
+        details = ", ".join(f"{name}: {group['coalesced']}/{group['executions'] + group['coalesced']}"
+                            for name, group in coalescing_stats.items())
+        st.caption(f"🔗 {saved_calls} duplicate calls saved by request coalescing ({details})")
+    
+    if llm_circuit_open():
+        st.warning("⚡ Gemini is unavailable: answers are built from local data until it recovers.")
+    
     # Execution log
     # st.markdown('<div class="log-container">', unsafe_allow_html=True)
     st.markdown('<div class="log-header">🔍 Execution Log</div>', unsafe_allow_html=True)
@@ -463,7 +575,7 @@ with col2:
             st.rerun()
     with col_btn2:
         if st.button("🔄 Reset All", use_container_width=True, type="primary"):
-            st.session_state.chat_history = []
+            reset_session()
             st.session_state.agent_execution_log = []
             st.session_state.total_queries = 0
             st.rerun()
@@ -503,13 +615,7 @@ with st.sidebar:
         with st.expander(category, expanded=False):
             for query in queries:
                 if st.button(query, key=f"sidebar_{query}", use_container_width=True):
-                    st.session_state.chat_history.append(HumanMessage(content=query))
-                    
-                    with st.spinner("Processing..."):
-                        ai_response = get_response(query)
-                    
-                    st.session_state.chat_history.append(AIMessage(content=ai_response))
-                    st.rerun()
+                    run_query(query)
     
     st.markdown("<br>", unsafe_allow_html=True)
     
@@ -540,6 +646,6 @@ with st.sidebar:
     st.markdown("<br>", unsafe_allow_html=True)
     
     if st.button("🗑️ Clear Chat History", use_container_width=True, type="primary"):
-        st.session_state.chat_history = []
+        reset_session()
         st.session_state.agent_execution_log = []
         st.rerun()
\ No newline at end of file
@@ -0,0 +1,50 @@
+# tests/conftest.py
+import os
+import sys
+import threading
+import time
+
+import pytest
+
+# The modules under test read config.py lazily; it refuses to load without these
+os.environ.setdefault("GOOGLE_API_KEY", "test-key")
+os.environ.setdefault("GEMINI_MODEL_NAME", "test-model")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class FakeClock:
+    """Stands in for the `time` module of the code under test: monotonic() only moves when advance() is called."""
+
+    def __init__(self, start: float = 1000.0):
+        self.now = start
+        self._lock = threading.Lock()
+
+    def monotonic(self) -> float:
+        with self._lock:
+            return self.now
+
+    def time(self) -> float:
+        return self.monotonic()
+
+    def advance(self, seconds: float) -> None:
+        with self._lock:
+            self.now += seconds
+
+    def sleep(self, seconds: float) -> None:
+        # Polling loops yield to other threads without the fake time passing
+        time.sleep(0.001)
+
+
+@pytest.fixture
+def fake_clock() -> FakeClock:
+    return FakeClock()
+
+
+def wait_until(condition, timeout: float = 5.0) -> None:
+    """Waits (in real time) for another thread to reach a state; fails the test if it never does."""
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise AssertionError("condition not reached in time")
+        time.sleep(0.001)
@@ -0,0 +1,96 @@
+# tests/test_circuit_breaker.py
+import pytest
+
+from utils import circuit_breaker
+from utils.circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitOpenError
+
+
+@pytest.fixture
+def breaker(monkeypatch, fake_clock):
+    monkeypatch.setattr(circuit_breaker, "time", fake_clock)
+    return CircuitBreaker("test", window_size=4, min_calls=2, error_rate_threshold=0.5,
+                          slow_call_seconds=5.0, slow_call_rate_threshold=1.0, open_seconds=10.0)
+
+
+def _call(breaker, latency=0.1, failed=False):
+    breaker.before_call()
+    breaker.record(latency, failed=failed)
+
+
+def test_waits_for_min_calls_before_opening(breaker):
+    _call(breaker, failed=True)
+    # A single failure is below min_calls
+    assert breaker.state == CLOSED
+    _call(breaker)
+    assert breaker.state == OPEN
+
+
+def test_stays_closed_below_the_error_rate(breaker):
+    _call(breaker)
+    _call(breaker)
+    _call(breaker, failed=True)
+    _call(breaker)
+    # 1 failure in 4 calls: 25% < 50%
+    assert breaker.state == CLOSED
+
+
+def test_opens_then_half_opens_then_closes(breaker, fake_clock):
+    _call(breaker, failed=True)
+    _call(breaker, failed=True)
+    assert breaker.state == OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+    assert breaker.stats()["rejected"] == 1
+
+    fake_clock.advance(9.9)
+    assert breaker.state == OPEN
+    fake_clock.advance(0.1)
+    assert breaker.state == HALF_OPEN
+
+    breaker.before_call()
+    # One probe at a time: regular traffic keeps failing fast meanwhile
+    assert breaker.is_open()
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+    breaker.record(0.2, failed=False)
+    assert breaker.state == CLOSED
+    assert breaker.stats()["recorded_calls"] == 0
+
+
+def test_failed_or_slow_probe_reopens(breaker, fake_clock):
+    _call(breaker, failed=True)
+    _call(breaker, failed=True)
+    fake_clock.advance(10)
+    _call(breaker, failed=True)
+    assert breaker.state == OPEN
+
+    fake_clock.advance(10)
+    _call(breaker, latency=6.0)
+    assert breaker.state == OPEN
+    assert breaker.stats()["times_opened"] == 3
+
+
+def test_slow_calls_open_the_breaker(breaker):
+    _call(breaker, latency=5.0)
+    _call(breaker, latency=7.0)
+    assert breaker.state == OPEN
+
+
+def test_cancelled_probe_frees_its_slot_without_a_verdict(breaker, fake_clock):
+    _call(breaker, failed=True)
+    _call(breaker, failed=True)
+    fake_clock.advance(10)
+    breaker.before_call()
+    breaker.record_cancelled(1.0)
+    assert breaker.state == HALF_OPEN
+    assert not breaker.is_open()
+    breaker.before_call()
+
+
+def test_outcome_of_a_call_admitted_before_opening_is_ignored(breaker):
+    breaker.before_call()
+    _call(breaker, failed=True)
+    _call(breaker, failed=True)
+    assert breaker.state == OPEN
+    breaker.record(0.1, failed=False)
+    assert breaker.state == OPEN
@@ -0,0 +1,98 @@
+# tests/test_deadline.py
+import asyncio
+import threading
+import time
+
+import pytest
+
+import config
+from conftest import wait_until
+from utils import deadline, llm_factory
+from utils.deadline import DeadlineExceeded, acall_with_timeout, call_time_left, call_with_timeout
+
+
+@pytest.fixture
+def one_worker(monkeypatch):
+    monkeypatch.setattr(config, "NODE_CALL_MAX_WORKERS", 1)
+    wait_until(lambda: deadline._busy_workers == 0)
+    yield
+    wait_until(lambda: deadline._busy_workers == 0)
+
+
+def test_returns_the_result_within_the_budget():
+    assert call_with_timeout(lambda x: x * 2, 1.0, 21) == 42
+    assert call_with_timeout(lambda: "unbounded", None) == "unbounded"
+
+
+def test_raises_when_the_budget_is_spent():
+    with pytest.raises(DeadlineExceeded):
+        call_with_timeout(lambda: "never", 0)
+    release = threading.Event()
+    with pytest.raises(DeadlineExceeded):
+        call_with_timeout(release.wait, 0.05, 5)
+    release.set()
+
+
+def test_errors_of_the_call_propagate():
+    def fail():
+        raise ValueError("bad request")
+
+    with pytest.raises(ValueError):
+        call_with_timeout(fail, 1.0)
+
+
+def test_saturated_pool_runs_new_calls_inline(one_worker):
+    release = threading.Event()
+    with pytest.raises(DeadlineExceeded):
+        call_with_timeout(release.wait, 0.05, 5)
+    # The abandoned call still holds the only worker
+    assert deadline._busy_workers == 1
+
+    caller = threading.current_thread()
+    ran_on = []
+    start = time.monotonic()
+    result = call_with_timeout(lambda: ran_on.append(threading.current_thread()) or "fresh", 1.0)
+    assert result == "fresh"
+    assert ran_on == [caller]
+    # No waiting behind the abandoned call
+    assert time.monotonic() - start < 0.5
+    release.set()
+
+
+def test_call_sees_its_own_deadline():
+    assert call_time_left() is None
+    left = call_with_timeout(call_time_left, 2.0)
+    assert 0 < left <= 2.0
+
+    async def scenario():
+        return await acall_with_timeout(lambda: asyncio.sleep(0, result=call_time_left()), 2.0)
+
+    assert 0 < asyncio.run(scenario()) <= 2.0
+    assert call_time_left() is None
+
+
+def test_call_queued_past_its_budget_does_not_start():
+    ran = []
+    with pytest.raises(DeadlineExceeded):
+        deadline._run_within(time.monotonic() - 1, lambda: ran.append(1))
+    assert ran == []
+
+
+def test_retries_stop_once_the_call_deadline_has_passed(monkeypatch):
+    monkeypatch.setattr(llm_factory, "LLM_MAX_RETRIES", 5)
+    monkeypatch.setattr(llm_factory, "LLM_BACKOFF_BASE_SECONDS", 0.01)
+    monkeypatch.setattr(llm_factory, "LLM_BACKOFF_MAX_SECONDS", 0.01)
+    monkeypatch.setattr(llm_factory, "CIRCUIT_BREAKER_ENABLED", False)
+    attempts = []
+
+    def unavailable():
+        attempts.append(time.monotonic())
+        time.sleep(0.05)
+        raise ConnectionError("connection reset")
+
+    with pytest.raises((ConnectionError, DeadlineExceeded)):
+        call_with_timeout(lambda: llm_factory._governed_call(unavailable, 10), 0.12)
+    time.sleep(0.3)
+    # Without the deadline all 6 attempts would run; with it none starts after the 0.12s budget
+    assert 1 <= len(attempts) < 6
+    assert attempts[-1] - attempts[0] < 0.12
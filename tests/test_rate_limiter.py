@@ -0,0 +1,101 @@
+# tests/test_rate_limiter.py
+import threading
+
+import pytest
+
+from conftest import wait_until
+from utils import rate_limiter
+from utils.rate_limiter import BATCH, INTERACTIVE, LLMRateLimiter, backoff_delay
+
+
+@pytest.fixture
+def limiter(monkeypatch, fake_clock):
+    monkeypatch.setattr(rate_limiter, "time", fake_clock)
+    # 60 RPM: one request per second, bucket of one
+    return LLMRateLimiter(requests_per_minute=60, tokens_per_minute=600, check_every_n_seconds=0.001)
+
+
+def test_request_bucket_refills_with_time(limiter, fake_clock):
+    assert limiter.acquire(blocking=False)
+    assert not limiter.acquire(blocking=False)
+    fake_clock.advance(0.5)
+    assert not limiter.acquire(blocking=False)
+    fake_clock.advance(0.5)
+    assert limiter.acquire(blocking=False)
+
+
+def test_token_bucket_limits_large_prompts(limiter, fake_clock):
+    # 600 TPM: 10 tokens per second, bucket of ten seconds' worth (100 tokens)
+    assert limiter.acquire(blocking=False, tokens=100)
+    fake_clock.advance(5)
+    assert not limiter.acquire(blocking=False, tokens=100)
+    fake_clock.advance(5)
+    assert limiter.acquire(blocking=False, tokens=100)
+
+
+def test_oversized_request_waits_for_a_full_bucket_only(limiter, fake_clock):
+    assert limiter.acquire(blocking=False, tokens=5000)
+    fake_clock.advance(10)
+    assert limiter.acquire(blocking=False, tokens=5000)
+
+
+def test_record_usage_charges_the_difference(limiter, fake_clock):
+    assert limiter.acquire(blocking=False, tokens=50)
+    limiter.record_usage(estimated_tokens=50, actual_tokens=100)
+    fake_clock.advance(1)
+    # 100 - 50 - 50 + 10 refilled = 10 tokens left
+    assert not limiter.acquire(blocking=False, tokens=20)
+    assert limiter.acquire(blocking=False, tokens=10)
+
+
+def test_pause_holds_every_caller_back(limiter, fake_clock):
+    limiter.pause(5)
+    fake_clock.advance(4.9)
+    assert not limiter.acquire(blocking=False)
+    fake_clock.advance(0.1)
+    assert limiter.acquire(blocking=False)
+
+
+def test_batch_request_yields_to_waiting_interactive_request(limiter):
+    limiter._wait_started(INTERACTIVE)
+    try:
+        assert not limiter.acquire(blocking=False, priority=BATCH)
+    finally:
+        limiter._wait_finished(INTERACTIVE)
+    assert limiter.acquire(blocking=False, priority=BATCH)
+
+
+def test_waiting_requests_are_served_by_priority(limiter, fake_clock):
+    assert limiter.acquire(blocking=False)
+    served = []
+
+    def wait_for_quota(name, priority):
+        limiter.acquire(priority=priority)
+        served.append(name)
+
+    batch = threading.Thread(target=wait_for_quota, args=("batch", BATCH))
+    batch.start()
+    wait_until(lambda: limiter.stats()["waiting"].get("batch") == 1)
+    interactive = threading.Thread(target=wait_for_quota, args=("interactive", INTERACTIVE))
+    interactive.start()
+    wait_until(lambda: limiter.stats()["waiting"].get("interactive") == 1)
+
+    fake_clock.advance(1)
+    wait_until(lambda: served)
+    assert served == ["interactive"]
+    fake_clock.advance(1)
+    batch.join(timeout=5)
+    interactive.join(timeout=5)
+    assert served == ["interactive", "batch"]
+    assert limiter.stats()["throttled"] == {"interactive": 1, "batch": 1}
+
+
+def test_unlimited_limiter_never_waits(monkeypatch, fake_clock):
+    monkeypatch.setattr(rate_limiter, "time", fake_clock)
+    unlimited = LLMRateLimiter()
+    assert all(unlimited.acquire(blocking=False, tokens=10_000) for _ in range(100))
+
+
+def test_backoff_delay_is_capped_and_honours_retry_after():
+    assert all(0 <= backoff_delay(attempt, 1.0, 8.0) <= min(8.0, 2 ** (attempt - 1)) for attempt in range(1, 10))
+    assert backoff_delay(1, 1.0, 8.0, retry_after=30.0) == 30.0
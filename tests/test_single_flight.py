@@ -0,0 +1,165 @@
+# tests/test_single_flight.py
+import asyncio
+import threading
+
+import pytest
+
+from conftest import wait_until
+from utils.single_flight import SingleFlight
+
+
+class Rerun(BaseException):
+    """Like Streamlit's RerunException: not an Exception, raised in one caller's thread."""
+
+
+def _start_follower(group, key, func, outcomes):
+    def follow():
+        try:
+            outcomes.append(group.do(key, func))
+        except BaseException as e:
+            outcomes.append(e)
+
+    thread = threading.Thread(target=follow)
+    thread.start()
+    return thread
+
+
+def test_followers_share_the_leaders_result():
+    group = SingleFlight("test")
+    release = threading.Event()
+    calls = []
+
+    def work():
+        calls.append(1)
+        release.wait(5)
+        return "answer"
+
+    outcomes = []
+    leader = _start_follower(group, "k", work, outcomes)
+    wait_until(lambda: group.stats()["in_flight"] == 1)
+    followers = [_start_follower(group, "k", work, outcomes) for _ in range(3)]
+    wait_until(lambda: group.stats()["coalesced"] == 3)
+    release.set()
+    for thread in [leader] + followers:
+        thread.join(5)
+
+    assert len(calls) == 1
+    assert sorted(outcomes, key=lambda o: o[1]) == [("answer", False)] + [("answer", True)] * 3
+    assert group.stats()["in_flight"] == 0
+
+
+def test_leader_exception_propagates_to_every_follower():
+    group = SingleFlight("test")
+    release = threading.Event()
+
+    def work():
+        release.wait(5)
+        raise ValueError("boom")
+
+    outcomes = []
+    threads = [_start_follower(group, "k", work, outcomes)]
+    wait_until(lambda: group.stats()["in_flight"] == 1)
+    threads += [_start_follower(group, "k", work, outcomes) for _ in range(2)]
+    wait_until(lambda: group.stats()["coalesced"] == 2)
+    release.set()
+    for thread in threads:
+        thread.join(5)
+
+    assert len(outcomes) == 3
+    assert all(isinstance(outcome, ValueError) and str(outcome) == "boom" for outcome in outcomes)
+
+
+def test_follower_retries_when_the_leader_dies_of_a_base_exception():
+    group = SingleFlight("test")
+    release = threading.Event()
+    calls = []
+
+    def work():
+        calls.append(1)
+        if len(calls) == 1:
+            release.wait(5)
+            raise Rerun()
+        return "answer"
+
+    outcomes = []
+    leader = _start_follower(group, "k", work, outcomes)
+    wait_until(lambda: group.stats()["in_flight"] == 1)
+    follower = _start_follower(group, "k", work, outcomes)
+    wait_until(lambda: group.stats()["coalesced"] == 1)
+    release.set()
+    leader.join(5)
+    follower.join(5)
+
+    assert len(calls) == 2
+    assert any(isinstance(outcome, Rerun) for outcome in outcomes)
+    assert ("answer", False) in outcomes
+
+
+def test_stream_replays_events_and_survives_a_failing_renderer():
+    group = SingleFlight("test")
+    release = threading.Event()
+
+    def work(publish):
+        publish("routed")
+        release.wait(5)
+        publish("answered")
+        return "state"
+
+    def leader_render(event):
+        # The leader's session reruns on the first event it renders
+        raise Rerun()
+
+    outcomes, follower_events = [], []
+
+    def lead():
+        try:
+            group.stream("k", work, leader_render)
+        except Rerun as e:
+            outcomes.append(e)
+
+    def follow():
+        outcomes.append(group.stream("k", work, follower_events.append))
+
+    leader = threading.Thread(target=lead)
+    leader.start()
+    wait_until(lambda: outcomes)
+    follower = threading.Thread(target=follow)
+    follower.start()
+    wait_until(lambda: group.stats()["coalesced"] == 1)
+    release.set()
+    leader.join(5)
+    follower.join(5)
+
+    assert isinstance(outcomes[0], Rerun)
+    assert outcomes[1] == ("state", True)
+    # The follower joined late and still got every event, in order
+    assert follower_events == ["routed", "answered"]
+
+
+def test_async_followers_share_errors_and_retry_after_cancellation():
+    async def scenario():
+        group = SingleFlight("test")
+        calls = []
+
+        async def fail():
+            await asyncio.sleep(0.05)
+            raise ValueError("boom")
+
+        results = await asyncio.gather(group.ado("e", fail), group.ado("e", fail), return_exceptions=True)
+        assert all(isinstance(result, ValueError) for result in results)
+
+        async def work():
+            calls.append(1)
+            await asyncio.sleep(0.05)
+            return len(calls)
+
+        leader = asyncio.ensure_future(group.ado("k", work))
+        await asyncio.sleep(0.01)
+        follower = asyncio.ensure_future(group.ado("k", work))
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        assert await follower == (2, False)
+
+    asyncio.run(scenario())
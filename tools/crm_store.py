@@ -0,0 +1,197 @@
+# tools/crm_store.py
+import copy
+import hashlib
+import json
+import os
+import threading
+from typing import Any, Callable, Dict, List, Optional, Set
+
+CUSTOMER_DB_PATH = "data/customers.json"
+LEAD_DB_PATH = "data/leads.json"
+
+
+def _abs_data_path(file_path: str) -> str:
+    current_dir = os.path.dirname(os.path.abspath(__file__))
+    project_root = os.path.abspath(os.path.join(current_dir, ".."))
+    return os.path.join(project_root, file_path)
+
+
+def _load_json_data(file_path: str) -> List[Dict[str, Any]]:
+    """Loads JSON data from a file."""
+    try:
+        abs_data_path = _abs_data_path(file_path)
+
+        if not os.path.exists(abs_data_path):
+            print(f"❌ {file_path} not found at {abs_data_path}. Returning empty list.")
+            return []
+        with open(abs_data_path, 'r', encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        print(f"⚠️ Warning: {file_path} not found. Returning empty list.")
+        return []
+    except json.JSONDecodeError:
+        print(f"⚠️ Warning: Error decoding JSON from {file_path}. Returning empty list.")
+        return []
+    except Exception as e:
+        print(f"⚠️ An unexpected error occurred while loading {file_path}: {e}. Returning empty list.")
+        return []
+
+
+def record_hash(record: Dict[str, Any]) -> str:
+    """Stable content hash of a CRM record, used to detect changes to cached copies."""
+    return hashlib.sha1(json.dumps(record, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+class CRMStore:
+    """
+    In-memory, thread-safe view of the customer and lead JSON files.
+
+    Files are parsed once and re-parsed only when their modification time changes, so edits to the
+    CRM files are still picked up on the next call. Customers are indexed by id, email, name and
+    policy id. Readers get copies, so concurrent requests (threads or asyncio.to_thread workers)
+    never observe a half-built index or mutate shared records.
+
+    Change feed: after a re-read of the customer (or lead) file, listeners registered with add_change_listener
+    are called with the ids of the customers (or leads) whose records were added, changed or removed.
+    """
+
+    def __init__(self, customer_path: str = CUSTOMER_DB_PATH, lead_path: str = LEAD_DB_PATH):
+        self.customer_path = customer_path
+        self.lead_path = lead_path
+        self._lock = threading.RLock()
+        self._mtimes: Dict[str, Optional[float]] = {}
+        self._customers: List[Dict[str, Any]] = []
+        self._leads: List[Dict[str, Any]] = []
+        self._customer_index: Dict[str, Dict[str, Any]] = {}
+        self._lead_index: Dict[str, Dict[str, Any]] = {}
+        self._customer_hashes: Dict[str, str] = {}
+        self._lead_hashes: Dict[str, str] = {}
+        self._listeners: Dict[str, List[Callable[[Set[str]], None]]] = {"customers": [], "leads": []}
+        self._derived: Dict[str, Any] = {}
+        self.version = 0
+
+    # --- Loading ---
+    def _mtime(self, file_path: str) -> Optional[float]:
+        try:
+            return os.path.getmtime(_abs_data_path(file_path))
+        except OSError:
+            return None
+
+    def _is_stale(self, file_path: str) -> bool:
+        return file_path not in self._mtimes or self._mtimes[file_path] != self._mtime(file_path)
+
+    @staticmethod
+    def _changed_ids(records: List[Dict[str, Any]], old_hashes: Dict[str, str]):
+        """(new id -> hash map, ids whose record was added, changed or removed since old_hashes)."""
+        hashes = {r.get("id", ""): record_hash(r) for r in records if r.get("id")}
+        changed_ids = {record_id for record_id in set(hashes) | set(old_hashes)
+                       if hashes.get(record_id) != old_hashes.get(record_id)}
+        return hashes, changed_ids
+
+    def refresh(self) -> None:
+        """Re-reads whichever CRM file changed since the last load."""
+        changes: Dict[str, Set[str]] = {}
+        with self._lock:
+            changed = False
+            if self._is_stale(self.customer_path):
+                self._mtimes[self.customer_path] = self._mtime(self.customer_path)
+                self._customers = _load_json_data(self.customer_path)
+                self._customer_index = self._build_customer_index(self._customers)
+                self._customer_hashes, changes["customers"] = self._changed_ids(self._customers, self._customer_hashes)
+                changed = True
+            if self._is_stale(self.lead_path):
+                self._mtimes[self.lead_path] = self._mtime(self.lead_path)
+                self._leads = _load_json_data(self.lead_path)
+                # First lead with a given id wins, as in the customer index
+                self._lead_index = {lead["id"]: lead for lead in reversed(self._leads) if lead.get("id")}
+                self._lead_hashes, changes["leads"] = self._changed_ids(self._leads, self._lead_hashes)
+                changed = True
+            if changed:
+                self.version += 1
+            notifications = [(list(self._listeners[kind]), ids) for kind, ids in changes.items() if ids]
+        # Outside the lock: listeners may read the store again
+        for listeners, ids in notifications:
+            for listener in listeners:
+                try:
+                    listener(ids)
+                except Exception as e:
+                    print(f"⚠️ CRM change listener failed: {e}")
+
+    def add_change_listener(self, listener: Callable[[Set[str]], None], kind: str = "customers") -> None:
+        """
+        Registers listener(changed_ids), called after the customer file (kind="customers") or the lead file
+        (kind="leads") is re-read with changes.
+        """
+        if kind not in self._listeners:
+            raise ValueError(f"Unknown change feed '{kind}', expected one of: {', '.join(self._listeners)}")
+        with self._lock:
+            self._listeners[kind].append(listener)
+
+    @staticmethod
+    def _build_customer_index(customers: List[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+        index: Dict[str, Dict[str, Any]] = {}
+        # Reverse order so that, as with a linear scan, the first customer wins on duplicate keys
+        for customer in reversed(customers):
+            keys = [customer.get("id", ""), customer.get("email", ""), customer.get("name", "")]
+            keys.extend(policy.get("policy_id", "") for policy in customer.get("policies", []))
+            for key in keys:
+                if key:
+                    index[key.strip().lower()] = customer
+        return index
+
+    # --- Queries ---
+    def current_version(self) -> int:
+        """Version counter of the loaded data; increases whenever a CRM file is re-read."""
+        self.refresh()
+        with self._lock:
+            return self.version
+
+    def find_customer(self, query: str) -> Dict[str, Any]:
+        """Exact (case-insensitive) lookup by customer id, email, name or policy id. Returns {} if not found."""
+        self.refresh()
+        with self._lock:
+            customer = self._customer_index.get(query.strip().lower())
+            return copy.deepcopy(customer) if customer else {}
+
+    def find_lead(self, lead_id: str) -> Dict[str, Any]:
+        """Lookup by exact lead id. Returns {} if not found."""
+        self.refresh()
+        with self._lock:
+            lead = self._lead_index.get(lead_id)
+            return copy.deepcopy(lead) if lead else {}
+
+    def derived(self, name: str, build: Callable[[List[Dict[str, Any]], List[Dict[str, Any]]], Any]) -> Any:
+        """
+        A structure computed by build(customers, leads) from the loaded records (not copies: build must not
+        mutate them), kept until the CRM files change. Lets bulk readers (e.g. the lead ranking's column
+        arrays) avoid copying every record on every call.
+        """
+        self.refresh()
+        with self._lock:
+            cached = self._derived.get(name)
+            if cached is None or cached[0] != self.version:
+                cached = (self.version, build(self._customers, self._leads))
+                self._derived[name] = cached
+            return cached[1]
+
+    def customers(self) -> List[Dict[str, Any]]:
+        self.refresh()
+        with self._lock:
+            return copy.deepcopy(self._customers)
+
+    def leads(self) -> List[Dict[str, Any]]:
+        self.refresh()
+        with self._lock:
+            return copy.deepcopy(self._leads)
+
+
+_crm_store_instance = None
+_crm_store_lock = threading.Lock()
+
+def get_crm_store() -> CRMStore:
+    global _crm_store_instance
+    if _crm_store_instance is None:
+        with _crm_store_lock:
+            if _crm_store_instance is None:
+                _crm_store_instance = CRMStore()
+    return _crm_store_instance
@@ -1,64 +1,39 @@
 # tools/crm_tool.py
+import asyncio
 import json
-import os
+import sys
 from typing import Dict, Any, List, Optional, Union
 from langchain.tools import tool
 from langchain_core.tools import StructuredTool
 from pydantic import BaseModel, Field
 
-CUSTOMER_DB_PATH = "data/customers.json"
-LEAD_DB_PATH = "data/leads.json"
-
-def _load_json_data(file_path: str) -> List[Dict[str, Any]]:
-    """Loads JSON data from a file."""
-    try:
-        current_dir = os.path.dirname(os.path.abspath(__file__))
-        project_root = os.path.abspath(os.path.join(current_dir, ".."))
-        abs_data_path = os.path.join(project_root, file_path)
-
-        if not os.path.exists(abs_data_path):
-            print(f"❌ {file_path} not found at {abs_data_path}. Returning empty list.")
-            return []
-        with open(abs_data_path, 'r', encoding="utf-8") as f:
-            return json.load(f)
-    except FileNotFoundError:
-        print(f"⚠️ Warning: {file_path} not found. Returning empty list.")
-        return []
-    except json.JSONDecodeError:
-        print(f"⚠️ Warning: Error decoding JSON from {file_path}. Returning empty list.")
-        return []
-    except Exception as e:
-        print(f"⚠️ An unexpected error occurred while loading {file_path}: {e}. Returning empty list.")
-        return []
+from tools.crm_store import CUSTOMER_DB_PATH, LEAD_DB_PATH, _load_json_data, get_crm_store
 
 
-@tool
-def get_customer_info(query: str) -> Dict[str, Any]:
+def _get_customer_info(query: str) -> Dict[str, Any]:
     """
     Retrieves customer information from the CRM database based on ID, email, name, or policy ID.
     The query should contain a customer ID (e.g., 'CUST001'), email (e.g., 'john@example.com'),
     name (e.g., 'John Smith'), or policy ID (e.g., 'AUTO-001').
     Returns a dictionary of customer details if found, otherwise an empty dictionary.
     """
-    customers = _load_json_data(CUSTOMER_DB_PATH)
-    query_lower = query.strip().lower()
-
-    for customer in customers:
-        if customer.get("id", "").lower() == query_lower:
-            return customer
-        if customer.get("email", "").lower() == query_lower:
-            return customer
-        if customer.get("name", "").lower() == query_lower:
-            return customer
-        for policy in customer.get("policies", []):
-            if policy.get("policy_id", "").lower() == query_lower:
-                return customer
-    return {}
+    return get_crm_store().find_customer(query)
+
+
+async def _aget_customer_info(query: str) -> Dict[str, Any]:
+    # The CRM store is thread-safe; run it off the event loop so file reloads never block other requests
+    return await asyncio.to_thread(_get_customer_info, query)
+
+
+get_customer_info = StructuredTool.from_function(
+    func=_get_customer_info,
+    coroutine=_aget_customer_info,
+    name="get_customer_info",
+)
 
 
 # ✅ NEW APPROACH: Single string parameter that we parse ourselves
-@tool
-def search_leads(criteria: str) -> List[Dict[str, Any]]:
+def _search_leads(criteria: str) -> List[Dict[str, Any]]:
     """
     Searches for leads in the lead database based on various criteria.
     
@@ -93,7 +68,7 @@ def search_leads(criteria: str) -> List[Dict[str, Any]]:
         return []
     
     # Perform the actual search
-    leads = _load_json_data(LEAD_DB_PATH)
+    leads = get_crm_store().leads()
     matching_leads = []
 
     for lead in leads:
@@ -131,6 +106,133 @@ def search_leads(criteria: str) -> List[Dict[str, Any]]:
     return matching_leads
 
 
+async def _asearch_leads(criteria: str) -> List[Dict[str, Any]]:
+    return await asyncio.to_thread(_search_leads, criteria)
+
+
+search_leads = StructuredTool.from_function(
+    func=_search_leads,
+    coroutine=_asearch_leads,
+    name="search_leads",
+)
+
+
+# Fields of a ranked lead shown to the agent (contact details stay in the bulk export)
+_RANKED_LEAD_FIELDS = ("id", "name", "campaign_score", "score", "interest", "area", "status", "source")
+
+
+def _rank_campaign_leads(criteria: str) -> Dict[str, Any]:
+    """
+    Ranks leads for a sales campaign by a composite of lead score, interest match, source quality and status recency.
+
+    Input should be a JSON string. Supported keys:
+    - interest: the campaign's product keyword (string, e.g. "life", "auto"); raises matching leads, does not filter
+    - areas: geographic areas (list of strings, e.g. ["Texas", "California"])
+    - statuses: lead statuses to include (list, default: all except "Lost")
+    - score_min: minimum lead score (integer)
+    - top_k: how many of the best leads are wanted (integer or "all", default 10)
+
+    Example input: '{"interest": "life", "areas": ["Texas", "California"], "top_k": 500}'
+
+    Returns the number of matching leads and the best ones in ranked order.
+    """
+    from config import LEAD_RANKING_TOOL_MAX_RESULTS
+    from utils.lead_ranking import rank_leads
+    try:
+        criteria_dict = json.loads(criteria) if isinstance(criteria, str) else dict(criteria or {})
+    except (json.JSONDecodeError, TypeError, ValueError) as e:
+        print(f"⚠️ Failed to parse ranking criteria: {e}")
+        return {"error": "Criteria must be a JSON object, e.g. {\"interest\": \"life\", \"areas\": [\"Texas\"]}"}
+    try:
+        top_k = criteria_dict.get("top_k")
+        # "all": every matching lead (the listing is capped below, the rest goes to the CSV export)
+        requested = sys.maxsize if str(top_k).strip().lower() == "all" else int(top_k or 10)
+        score_min = criteria_dict.get("score_min")
+        score_min = float(score_min) if score_min not in (None, "") else None
+    except (TypeError, ValueError) as e:
+        print(f"⚠️ Invalid ranking criteria: {e}")
+        return {"error": "top_k must be an integer (or \"all\") and score_min a number, e.g. {\"top_k\": 50, \"score_min\": 70}"}
+
+    areas = criteria_dict.get("areas") or ([criteria_dict["area"]] if criteria_dict.get("area") else None)
+    statuses = criteria_dict.get("statuses") or ([criteria_dict["status"]] if criteria_dict.get("status") else None)
+    shown = max(1, min(requested, LEAD_RANKING_TOOL_MAX_RESULTS))
+    ranked, total = rank_leads(
+        interest=criteria_dict.get("interest"),
+        areas=areas,
+        statuses=statuses,
+        score_min=score_min,
+        top_k=shown,
+    )
+    print(f"✅ Ranked {total} matching leads, returning the top {len(ranked)}")
+    result = {
+        "matching_leads": total,
+        "returned": len(ranked),
+        "leads": [{field: lead.get(field) for field in _RANKED_LEAD_FIELDS} for lead in ranked],
+    }
+    if requested > shown and total > shown:
+        result["note"] = (f"Only the top {shown} of the {min(requested, total)} requested leads are listed here. "
+                          f"The full ranked list is available as a CSV export (campaign_leads_export.py).")
+    return result
+
+
+async def _arank_campaign_leads(criteria: str) -> Dict[str, Any]:
+    return await asyncio.to_thread(_rank_campaign_leads, criteria)
+
+
+rank_campaign_leads = StructuredTool.from_function(
+    func=_rank_campaign_leads,
+    coroutine=_arank_campaign_leads,
+    name="rank_campaign_leads",
+)
+
+
+def _get_crm_statistics(request: str) -> Dict[str, Any]:
+    """
+    Answers aggregate questions about the CRM from precomputed counts and sums (no record lists).
+
+    Input should be a JSON string. Supported keys:
+    - metric (required): one of
+        "lead_counts"            - number of leads per area and status ("how many qualified leads per state")
+        "lead_score_histogram"   - number of leads per 10-point score bin
+        "premium_by_policy_type" - policy count and total premium per policy type and policy status
+        "summary"                - total leads, customers, policies and premium
+    - area: only this area (lead_counts)
+    - status: only this lead status (lead_counts, lead_score_histogram) or policy status (premium_by_policy_type)
+    - policy_type: only this policy type, e.g. "Auto Insurance" (premium_by_policy_type)
+
+    Example input: '{"metric": "lead_counts", "status": "Qualified"}'
+    """
+    from utils.crm_aggregates import METRICS, get_crm_aggregates
+    try:
+        request_dict = json.loads(request) if isinstance(request, str) else dict(request or {})
+    except (json.JSONDecodeError, TypeError, ValueError) as e:
+        print(f"⚠️ Failed to parse statistics request: {e}")
+        return {"error": "Request must be a JSON object, e.g. {\"metric\": \"lead_counts\", \"status\": \"Qualified\"}"}
+
+    metric = request_dict.get("metric") or "summary"
+    if metric not in METRICS:
+        return {"error": f"Unknown metric '{metric}'. Use one of: {', '.join(METRICS)}"}
+    result = get_crm_aggregates().query(
+        metric,
+        area=request_dict.get("area"),
+        status=request_dict.get("status"),
+        policy_type=request_dict.get("policy_type"),
+    )
+    print(f"✅ CRM statistics '{metric}' answered from the precomputed aggregates")
+    return {"metric": metric, **result}
+
+
+async def _aget_crm_statistics(request: str) -> Dict[str, Any]:
+    return await asyncio.to_thread(_get_crm_statistics, request)
+
+
+get_crm_statistics = StructuredTool.from_function(
+    func=_get_crm_statistics,
+    coroutine=_aget_crm_statistics,
+    name="get_crm_statistics",
+)
+
+
 if __name__ == "__main__":
     print("--- Testing get_customer_info tool directly ---")
     
@@ -156,6 +258,16 @@ if __name__ == "__main__":
     result = search_leads.invoke('{"score_min": 50}')
     print(f"Result: {json.dumps(result, indent=2, ensure_ascii=False)}")
     
-    print("\nTest 5: Test with dict input (edge case)")
+    print("\nTest 5: Rank leads for a Life Insurance campaign in Texas and California")
+    result = rank_campaign_leads.invoke('{"interest": "life", "areas": ["Texas", "California"], "top_k": 500}')
+    print(f"Result: {json.dumps(result, indent=2, ensure_ascii=False)}")
+    
+    print("\nTest 6: Qualified leads per state and premium by policy type")
+    result = get_crm_statistics.invoke('{"metric": "lead_counts", "status": "Qualified"}')
+    print(f"Result: {json.dumps(result, indent=2, ensure_ascii=False)}")
+    result = get_crm_statistics.invoke('{"metric": "premium_by_policy_type"}')
+    print(f"Result: {json.dumps(result, indent=2, ensure_ascii=False)}")
+    
+    print("\nTest 7: Test with dict input (edge case)")
     result = search_leads.invoke({"status": "New", "area": "California"})
-    print(f"Result: {json.dumps(result, indent=2, ensure_ascii=False)}")
\ No newline at end of file
+    print(f"Result: {json.dumps(result, indent=2, ensure_ascii=False)}")
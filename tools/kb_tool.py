@@ -1,59 +1,162 @@
 # tools/kb_tools.py
 import re
 import os
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Tuple
 from langchain.tools import tool
+from langchain_core.tools import StructuredTool
 from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain_core.prompts import ChatPromptTemplate
-from config import GOOGLE_API_KEY, GEMINI_MODEL_NAME
+from config import GOOGLE_API_KEY, GEMINI_MODEL_NAME, REQUEST_COALESCING_ENABLED, RAG_MAX_IN_FLIGHT
+from config import RAG_CONTEXT_COMPRESSION_ENABLED, RAG_MAX_CHUNKS, KB_PRODUCT_FILTER_ENABLED
+from utils.llm_factory import create_chat_llm
+from utils.session_cache import cache_key
+from utils.single_flight import get_single_flight
+from utils.errors import is_transient_error
+from utils.circuit_breaker import CircuitOpenError
+from utils.local_fallbacks import extractive_kb_answer
+from utils.speculation import take_active_documents, atake_active_documents
+from utils.streaming import FINAL_ANSWER_TAG
+from utils.context_builder import build_context
+from utils.product_lines import product_line_filter
 from langchain_google_genai import GoogleGenerativeAIEmbeddings
 from langchain_community.vectorstores import Chroma
+from langchain_core.documents import Document
+
+# Chunks put into the prompt verbatim when RAG_CONTEXT_COMPRESSION_ENABLED is off
+RAG_TOP_K = 5
+
+_RAG_PROMPT = ChatPromptTemplate.from_messages([
+    ("system", """You are an insurance expert. Answer the user's question ONLY based on the provided context.
+    If the answer cannot be found in the context, state that you don't know or cannot provide the information.
+    Provide a concise and helpful answer.
+    
+    Context:
+    {context}"""),
+    ("human", "{question}")
+])
+
+
+def _handle_rag_error(query: str, e: Exception) -> str:
+    error_msg = str(e)
+    print(f"❌ Error during RAG query: {error_msg}")
+
+    # Gemini circuit open (embeddings or LLM): answer extractively from the local knowledge base
+    if isinstance(e, CircuitOpenError):
+        return extractive_kb_answer(query)
+    
+    # Quota errors, overload and timeouts that survived the model's retries: answer from the built-in topics
+    if is_transient_error(e):
+        return _fallback_knowledge_response(query)
+    
+    return f"An error occurred while processing the knowledge base query: {error_msg}. Please try again later."
+
+
+def _partition_filter(query: str) -> Optional[Dict[str, Any]]:
+    search_filter = product_line_filter(query) if KB_PRODUCT_FILTER_ENABLED else None
+    if search_filter:
+        print(f"---KB SEARCH PARTITION: {', '.join(search_filter['product_line']['$in'])}---")
+    return search_filter
+
+
+def _unpartitioned(query: str) -> None:
+    print(f"⚠️ No knowledge base chunks in the product line partitions of '{query}' "
+          f"(ingested before product line tagging?), searching all of them")
+
+
+def retrieve_scored(vector_store: Chroma, query: str) -> List[Tuple[Document, float]]:
+    """
+    (chunk, relevance) pairs for the query (also run by the speculative retrieval, utils/speculation.py),
+    searched only in the product lines the query names (utils/product_lines.py).
+    """
+    k = RAG_MAX_CHUNKS if RAG_CONTEXT_COMPRESSION_ENABLED else RAG_TOP_K
+    search_filter = _partition_filter(query)
+    if search_filter:
+        scored = vector_store.similarity_search_with_relevance_scores(query, k=k, filter=search_filter)
+        if scored:
+            return scored
+        _unpartitioned(query)
+    return vector_store.similarity_search_with_relevance_scores(query, k=k)
+
+
+async def aretrieve_scored(vector_store: Chroma, query: str) -> List[Tuple[Document, float]]:
+    k = RAG_MAX_CHUNKS if RAG_CONTEXT_COMPRESSION_ENABLED else RAG_TOP_K
+    search_filter = _partition_filter(query)
+    if search_filter:
+        scored = await vector_store.asimilarity_search_with_relevance_scores(query, k=k, filter=search_filter)
+        if scored:
+            return scored
+        _unpartitioned(query)
+    return await vector_store.asimilarity_search_with_relevance_scores(query, k=k)
+
+
+def _rag_context(query: str, scored_docs: List[Tuple[Document, float]]) -> str:
+    if RAG_CONTEXT_COMPRESSION_ENABLED:
+        return build_context(query, scored_docs)
+    return "\n\n".join([doc.page_content for doc, _ in scored_docs])
+
 
 def create_rag_knowledge_tool(embeddings: GoogleGenerativeAIEmbeddings, vector_store: Chroma):
-    @tool
-    def query_knowledge_base_rag(query: str) -> str:
-        """
-        Retrieves relevant documents from the insurance knowledge base using RAG,
-        then generates a concise answer using an LLM.
-        Provide a specific question or topic, e.g., "What is auto insurance?",
-        "Explain comprehensive coverage", "What is a premium?".
-        """
+    llm = create_chat_llm()
+    # The RAG answer is streamed to the UI token by token
+    chain = _RAG_PROMPT | llm.with_config(tags=[FINAL_ANSWER_TAG])
+
+    def _answer(query: str) -> str:
         try:
-            # Try RAG first
-            relevant_docs = vector_store.similarity_search(query, k=5)
+            # Try RAG first; a lookup for the request's own query may find its documents already prefetched
+            relevant_docs = take_active_documents(query)
+            if relevant_docs is None:
+                relevant_docs = retrieve_scored(vector_store, query)
             
             if not relevant_docs:
                 return f"No relevant information found in the knowledge base for '{query}'."
 
-            context = "\n\n".join([doc.page_content for doc in relevant_docs])
+            context = _rag_context(query, relevant_docs)
+            return chain.invoke({"context": context, "question": query}).content
 
-            llm = ChatGoogleGenerativeAI(model=GEMINI_MODEL_NAME, google_api_key=GOOGLE_API_KEY, temperature=0.0)
+        except Exception as e:
+            return _handle_rag_error(query, e)
+
+    async def _aanswer(query: str) -> str:
+        # Same as _answer, but the vector search and the LLM call don't block the event loop
+        try:
+            relevant_docs = await atake_active_documents(query)
+            if relevant_docs is None:
+                relevant_docs = await aretrieve_scored(vector_store, query)
             
-            rag_prompt = ChatPromptTemplate.from_messages([
-                ("system", """You are an insurance expert. Answer the user's question ONLY based on the provided context.
-                If the answer cannot be found in the context, state that you don't know or cannot provide the information.
-                Provide a concise and helpful answer.
-                
-                Context:
-                {context}"""),
-                ("human", "{question}")
-            ])
-
-            chain = rag_prompt | llm
-            response = chain.invoke({"context": context, "question": query}).content
-            return response
+            if not relevant_docs:
+                return f"No relevant information found in the knowledge base for '{query}'."
+
+            context = _rag_context(query, relevant_docs)
+            response = await chain.ainvoke({"context": context, "question": query})
+            return response.content
 
         except Exception as e:
-            error_msg = str(e)
-            print(f"❌ Error during RAG query: {error_msg}")
-            
-            # Check if it's a quota error
-            if "429" in error_msg or "quota" in error_msg.lower():
-                return _fallback_knowledge_response(query)
-            
-            return f"An error occurred while processing the knowledge base query: {error_msg}. Please try again later."
+            return _handle_rag_error(query, e)
+
+    def query_knowledge_base_rag(query: str) -> str:
+        """
+        Retrieves relevant documents from the insurance knowledge base using RAG,
+        then generates a concise answer using an LLM.
+        Provide a specific question or topic, e.g., "What is auto insurance?",
+        "Explain comprehensive coverage", "What is a premium?".
+        """
+        if not REQUEST_COALESCING_ENABLED:
+            return _answer(query)
+        # Identical questions asked at the same moment share one retrieval + LLM call
+        answer, _ = get_single_flight("rag", RAG_MAX_IN_FLIGHT).do(cache_key(query), lambda: _answer(query))
+        return answer
+
+    async def aquery_knowledge_base_rag(query: str) -> str:
+        if not REQUEST_COALESCING_ENABLED:
+            return await _aanswer(query)
+        answer, _ = await get_single_flight("rag", RAG_MAX_IN_FLIGHT).ado(cache_key(query), lambda: _aanswer(query))
+        return answer
     
-    return query_knowledge_base_rag
+    return StructuredTool.from_function(
+        func=query_knowledge_base_rag,
+        coroutine=aquery_knowledge_base_rag,
+        name="query_knowledge_base_rag",
+    )
 
 
 def _fallback_knowledge_response(query: str) -> str:
@@ -3,6 +3,8 @@ from typing import Dict, Any, List
 from langchain.tools import tool
 import json
 
+from utils.product_rules import get_product_catalog
+
 @tool
 def generate_insurance_recommendations(customer_profile_json: str, available_products_kb: str) -> str:
     """
@@ -20,36 +22,24 @@ def generate_insurance_recommendations(customer_profile_json: str, available_pro
     if not available_products_kb:
         return "No product knowledge base information provided for recommendations."
 
-    recommendations = []
+    catalog = get_product_catalog()
+    facts = catalog.facts(customer_profile)
     customer_name = customer_profile.get("name", "customer")
-    customer_policies_raw = customer_profile.get("policies", [])
-    customer_policy_types = [p["type"] for p in customer_policies_raw]
-    
-    recommendations.append(f"Based on {customer_name}'s profile:")
+    recommendations = [f"Based on {customer_name}'s profile:"]
     
-    if customer_policy_types:
-        recommendations.append(f"- Currently holds: {', '.join(customer_policy_types)}")
+    if facts.held_types:
+        recommendations.append(f"- Currently holds: {', '.join(facts.held_types)}")
     else:
         recommendations.append("- Does not currently hold any active policies with us.")
 
     recommendations.append("\nPotential recommendations:")
     
-    if "Auto Insurance" not in customer_policy_types:
-        if "auto insurance" in available_products_kb.lower():
-            recommendations.append("- Auto Insurance: To protect against financial loss in case of accidents.")
-    if "Home Insurance" not in customer_policy_types and customer_profile.get("address"):
-        if "home insurance" in available_products_kb.lower():
-            recommendations.append("- Home Insurance: Essential for property owners to protect their residence and belongings.")
-    if "Life Insurance" not in customer_policy_types:
-        if "life insurance" in available_products_kb.lower():
-            recommendations.append("- Life Insurance: To provide financial security for loved ones in the future.")
-    if "Health Insurance" not in customer_policy_types:
-        if "health insurance" in available_products_kb.lower():
-            recommendations.append("- Health Insurance: For covering medical expenses and ensuring access to quality healthcare.")
+    # Rules from data/product_rules.json, compiled once; the KB text is scanned once per distinct text
+    for rule in catalog.recommend(facts, available_products_kb):
+        recommendations.append(f"- {rule.name}: {rule.reason}")
             
     if len(recommendations) <= 3:
-        recommendations.append("- You might be interested in exploring our general range of insurance products such as Health, Life, or Travel insurance.")
-        recommendations.append("  For more detailed information, please specify your interests.")
+        recommendations.extend(catalog.fallback)
         
     return "\n".join(recommendations)
 
@@ -90,17 +80,17 @@ if __name__ == "__main__":
     """
     
     print("\n--- John Smith (has Auto Insurance) ---")
-    recommendations_john = generate_insurance_recommendations(json.dumps(mock_customer_john_smith), mock_kb_content)
+    recommendations_john = generate_insurance_recommendations.invoke({"customer_profile_json": json.dumps(mock_customer_john_smith), "available_products_kb": mock_kb_content})
     print(recommendations_john)
     
     print("\n--- Emily Brown (no policies) ---")
-    recommendations_emily = generate_insurance_recommendations(json.dumps(mock_customer_emily_brown), mock_kb_content)
+    recommendations_emily = generate_insurance_recommendations.invoke({"customer_profile_json": json.dumps(mock_customer_emily_brown), "available_products_kb": mock_kb_content})
     print(recommendations_emily)
 
     print("\n--- John Smith, NO KB ---")
-    recommendations_no_kb = generate_insurance_recommendations(json.dumps(mock_customer_john_smith), "")
+    recommendations_no_kb = generate_insurance_recommendations.invoke({"customer_profile_json": json.dumps(mock_customer_john_smith), "available_products_kb": ""})
     print(recommendations_no_kb)
 
     print("\n--- No Customer Profile ---")
-    recommendations_no_customer = generate_insurance_recommendations("{}", mock_kb_content)
+    recommendations_no_customer = generate_insurance_recommendations.invoke({"customer_profile_json": "{}", "available_products_kb": mock_kb_content})
     print(recommendations_no_customer)
\ No newline at end of file
@@ -0,0 +1,136 @@
+# utils/checkpointing.py
+import asyncio
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+
+from utils.errors import is_transient_error
+
+
+def _abs_checkpoint_path(db_path: str) -> str:
+    current_dir = os.path.dirname(os.path.abspath(__file__))
+    project_root = os.path.abspath(os.path.join(current_dir, ".."))
+    return os.path.join(project_root, db_path)
+
+
+def thread_config(thread_id: str) -> Dict[str, Any]:
+    """Run config for one request: its checkpoints are stored (and resumed) under thread_id."""
+    return {"configurable": {"thread_id": thread_id}}
+
+
+_checkpointer_instance = None
+_checkpointer_lock = threading.Lock()
+
+def get_checkpointer():
+    """Process-wide SQLite checkpointer for app.invoke/app.stream (sync). Returns None when disabled."""
+    global _checkpointer_instance
+    from config import CHECKPOINT_ENABLED, CHECKPOINT_DB_PATH
+    if not CHECKPOINT_ENABLED:
+        return None
+    if _checkpointer_instance is None:
+        with _checkpointer_lock:
+            if _checkpointer_instance is None:
+                from langgraph.checkpoint.sqlite import SqliteSaver
+                db_path = _abs_checkpoint_path(CHECKPOINT_DB_PATH)
+                os.makedirs(os.path.dirname(db_path), exist_ok=True)
+                # Shared by Streamlit's script threads; SqliteSaver serialises access itself
+                connection = sqlite3.connect(db_path, check_same_thread=False)
+                _checkpointer_instance = SqliteSaver(connection)
+    return _checkpointer_instance
+
+def open_async_checkpointer():
+    """
+    Async context manager yielding an AsyncSqliteSaver for app.ainvoke/app.astream (the sync saver has no async API):
+        async with open_async_checkpointer() as checkpointer: ...
+    """
+    from config import CHECKPOINT_DB_PATH
+    from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+    db_path = _abs_checkpoint_path(CHECKPOINT_DB_PATH)
+    os.makedirs(os.path.dirname(db_path), exist_ok=True)
+    return AsyncSqliteSaver.from_conn_string(db_path)
+
+
+def resume_delay(attempt: int) -> float:
+    """Backoff before resume attempt n (1-based): 1s, 2s, 4s, ..."""
+    return float(2 ** (attempt - 1))
+
+
+def _resume_action(snapshot) -> str:
+    """
+    What to do with a request's existing thread: "resume" a run interrupted before its end, from its last
+    completed node. Anything else starts over: a finished thread is never answered from, since the same
+    thread id can come back with a new run (a nightly batch over the same record ids).
+    """
+    if snapshot.next:
+        return "resume"
+    return "restart" if snapshot.values else "start"
+
+def _start_point(app, thread_id: str, inputs: Dict[str, Any]) -> Tuple[Dict[str, Any], Optional[Dict[str, Any]]]:
+    """Returns (config, input): input None resumes the interrupted run."""
+    config = thread_config(thread_id)
+    snapshot = app.get_state(config)
+    action = _resume_action(snapshot)
+    if action == "resume":
+        print(f"---CHECKPOINT: resuming thread {thread_id} at {list(snapshot.next)}---")
+        return config, None
+    if action == "restart":
+        # The finished run's checkpoints would otherwise merge into the new run's state
+        app.checkpointer.delete_thread(thread_id)
+    return config, inputs
+
+async def _astart_point(app, thread_id: str, inputs: Dict[str, Any]) -> Tuple[Dict[str, Any], Optional[Dict[str, Any]]]:
+    config = thread_config(thread_id)
+    snapshot = await app.aget_state(config)
+    action = _resume_action(snapshot)
+    if action == "resume":
+        print(f"---CHECKPOINT: resuming thread {thread_id} at {list(snapshot.next)}---")
+        return config, None
+    if action == "restart":
+        await app.checkpointer.adelete_thread(thread_id)
+    return config, inputs
+
+
+def invoke_with_resume(app, inputs: Dict[str, Any], thread_id: str, max_attempts: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Runs the workflow under a checkpointed thread. Nodes raise transient errors (rate limits, timeouts) in
+    checkpointed runs instead of swallowing them; the run is then resumed from the last completed node, so
+    finished LLM calls are not repeated. Only an interrupted thread is resumed; a finished one is cleared and
+    the inputs run from the start, so callers should put what identifies the request (e.g. a hash of the
+    query) in the thread id.
+    """
+    from config import CHECKPOINT_RESUME_ATTEMPTS
+    max_attempts = CHECKPOINT_RESUME_ATTEMPTS if max_attempts is None else max_attempts
+    config, start_input = _start_point(app, thread_id, inputs)
+
+    attempt = 0
+    while True:
+        try:
+            return app.invoke(start_input, config)
+        except Exception as e:
+            attempt += 1
+            if not is_transient_error(e) or attempt > max_attempts:
+                raise
+            delay = resume_delay(attempt)
+            print(f"⚠️ Transient error ({e}). Resuming thread {config['configurable']['thread_id']} from its last checkpoint in {delay:.0f}s...")
+            time.sleep(delay)
+            start_input = None
+
+async def ainvoke_with_resume(app, inputs: Dict[str, Any], thread_id: str, max_attempts: Optional[int] = None) -> Dict[str, Any]:
+    from config import CHECKPOINT_RESUME_ATTEMPTS
+    max_attempts = CHECKPOINT_RESUME_ATTEMPTS if max_attempts is None else max_attempts
+    config, start_input = await _astart_point(app, thread_id, inputs)
+
+    attempt = 0
+    while True:
+        try:
+            return await app.ainvoke(start_input, config)
+        except Exception as e:
+            attempt += 1
+            if not is_transient_error(e) or attempt > max_attempts:
+                raise
+            delay = resume_delay(attempt)
+            print(f"⚠️ Transient error ({e}). Resuming thread {config['configurable']['thread_id']} from its last checkpoint in {delay:.0f}s...")
+            await asyncio.sleep(delay)
+            start_input = None
@@ -0,0 +1,160 @@
+# utils/circuit_breaker.py
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Tuple
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling the model while its circuit breaker is open (fail fast, no retry)."""
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker around a remote model. Closed: calls pass and their outcomes are recorded over a sliding
+    window of the last window_size calls. Once at least min_calls are recorded and either the error rate or the
+    rate of calls slower than slow_call_seconds reaches its threshold, the breaker opens: calls fail fast with
+    CircuitOpenError for open_seconds. It then half-opens and lets half_open_max_calls probe calls through; a
+    successful probe closes it, a failed (or slow) one opens it again.
+    """
+
+    def __init__(self, name: str, window_size: int = 20, min_calls: int = 5, error_rate_threshold: float = 0.5,
+                 slow_call_seconds: float = 10.0, slow_call_rate_threshold: float = 0.8, open_seconds: float = 30.0,
+                 half_open_max_calls: int = 1):
+        self.name = name
+        self.min_calls = min_calls
+        self.error_rate_threshold = error_rate_threshold
+        self.slow_call_seconds = slow_call_seconds
+        self.slow_call_rate_threshold = slow_call_rate_threshold
+        self.open_seconds = open_seconds
+        self.half_open_max_calls = half_open_max_calls
+        self._lock = threading.Lock()
+        # (failed, slow) per recorded call
+        self._outcomes: Deque[Tuple[bool, bool]] = deque(maxlen=window_size)
+        self._state = CLOSED
+        self._opened_at = 0.0
+        self._probes_in_flight = 0
+        self.rejected = 0
+        self.times_opened = 0
+
+    def _update_state(self, now: float) -> None:
+        if self._state == OPEN and now - self._opened_at >= self.open_seconds:
+            self._state = HALF_OPEN
+            self._probes_in_flight = 0
+            print(f"---CIRCUIT BREAKER [{self.name}]: HALF-OPEN, probing recovery---")
+
+    def _open(self, now: float, reason: str) -> None:
+        self._state = OPEN
+        self._opened_at = now
+        self._probes_in_flight = 0
+        self._outcomes.clear()
+        self.times_opened += 1
+        print(f"❌ CIRCUIT BREAKER [{self.name}]: OPEN for {self.open_seconds:.0f}s ({reason})")
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            self._update_state(time.monotonic())
+            return self._state
+
+    def is_open(self) -> bool:
+        """True while regular traffic should take the local paths (open, or half-open with its probes busy)."""
+        with self._lock:
+            self._update_state(time.monotonic())
+            if self._state == OPEN:
+                return True
+            return self._state == HALF_OPEN and self._probes_in_flight >= self.half_open_max_calls
+
+    def before_call(self) -> None:
+        """Admits a call or raises CircuitOpenError. Every admitted call must be followed by record()."""
+        with self._lock:
+            now = time.monotonic()
+            self._update_state(now)
+            if self._state == CLOSED:
+                return
+            if self._state == HALF_OPEN and self._probes_in_flight < self.half_open_max_calls:
+                self._probes_in_flight += 1
+                return
+            self.rejected += 1
+            retry_in = max(0.0, self.open_seconds - (now - self._opened_at)) if self._state == OPEN else 0.0
+            raise CircuitOpenError(f"{self.name} circuit breaker is open (failing fast, next probe in {retry_in:.0f}s)")
+
+    def record(self, latency_seconds: float, failed: bool) -> None:
+        slow = latency_seconds >= self.slow_call_seconds
+        with self._lock:
+            now = time.monotonic()
+            if self._state == HALF_OPEN:
+                self._probes_in_flight = max(0, self._probes_in_flight - 1)
+                if failed or slow:
+                    self._open(now, "probe failed" if failed else f"probe took {latency_seconds:.1f}s")
+                else:
+                    self._state = CLOSED
+                    self._outcomes.clear()
+                    print(f"✅ CIRCUIT BREAKER [{self.name}]: CLOSED, probe succeeded")
+                return
+            if self._state == OPEN:
+                # A call admitted before the breaker opened: its outcome no longer matters
+                return
+            self._outcomes.append((failed, slow))
+            if len(self._outcomes) < self.min_calls:
+                return
+            error_rate = sum(1 for f, _ in self._outcomes if f) / len(self._outcomes)
+            slow_rate = sum(1 for _, s in self._outcomes if s) / len(self._outcomes)
+            if error_rate >= self.error_rate_threshold:
+                self._open(now, f"error rate {error_rate:.0%} over the last {len(self._outcomes)} calls")
+            elif slow_rate >= self.slow_call_rate_threshold:
+                self._open(now, f"{slow_rate:.0%} of the last {len(self._outcomes)} calls slower than {self.slow_call_seconds:.0f}s")
+
+    def record_cancelled(self, latency_seconds: float) -> None:
+        """A call abandoned by its caller: frees its probe slot without a verdict; otherwise only counts if already slow."""
+        with self._lock:
+            if self._state == HALF_OPEN:
+                self._probes_in_flight = max(0, self._probes_in_flight - 1)
+                return
+        if latency_seconds >= self.slow_call_seconds:
+            self.record(latency_seconds, failed=False)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            self._update_state(time.monotonic())
+            return {
+                "state": self._state,
+                "recorded_calls": len(self._outcomes),
+                "error_rate": (sum(1 for f, _ in self._outcomes if f) / len(self._outcomes)) if self._outcomes else 0.0,
+                "rejected": self.rejected,
+                "times_opened": self.times_opened,
+            }
+
+
+_llm_circuit_breaker_instance = None
+_llm_circuit_breaker_lock = threading.Lock()
+
+def get_llm_circuit_breaker() -> CircuitBreaker:
+    """The breaker shared by every Gemini chat and embedding call (utils/llm_factory.py)."""
+    global _llm_circuit_breaker_instance
+    if _llm_circuit_breaker_instance is None:
+        with _llm_circuit_breaker_lock:
+            if _llm_circuit_breaker_instance is None:
+                from config import (
+                    CIRCUIT_BREAKER_WINDOW, CIRCUIT_BREAKER_MIN_CALLS, CIRCUIT_BREAKER_ERROR_RATE,
+                    CIRCUIT_BREAKER_SLOW_CALL_SECONDS, CIRCUIT_BREAKER_SLOW_CALL_RATE, CIRCUIT_BREAKER_OPEN_SECONDS,
+                )
+                _llm_circuit_breaker_instance = CircuitBreaker(
+                    "gemini",
+                    window_size=CIRCUIT_BREAKER_WINDOW,
+                    min_calls=CIRCUIT_BREAKER_MIN_CALLS,
+                    error_rate_threshold=CIRCUIT_BREAKER_ERROR_RATE,
+                    slow_call_seconds=CIRCUIT_BREAKER_SLOW_CALL_SECONDS,
+                    slow_call_rate_threshold=CIRCUIT_BREAKER_SLOW_CALL_RATE,
+                    open_seconds=CIRCUIT_BREAKER_OPEN_SECONDS,
+                )
+    return _llm_circuit_breaker_instance
+
+def llm_circuit_open() -> bool:
+    """True when Gemini calls are currently being short-circuited and the graph should use its local paths."""
+    from config import CIRCUIT_BREAKER_ENABLED
+    return CIRCUIT_BREAKER_ENABLED and get_llm_circuit_breaker().is_open()
@@ -0,0 +1,145 @@
+# utils/context_builder.py
+"""
+Compact context for the RAG prompt, built from the scored chunks of one knowledge base search.
+
+    1. depth    keep the chunks scoring at least RAG_MIN_RELEVANCE and within RAG_RELEVANCE_MARGIN of the best one
+                (the best chunk is always kept), out of the RAG_MAX_CHUNKS retrieved
+    2. dedup    drop chunks that are near-duplicates of a better one, then sentences seen before, including the
+                text the splitter repeats between neighbouring chunks (chunk_overlap) and its partial sentences
+    3. ranking  score each sentence by the query terms it contains (IDF-weighted over the candidate sentences)
+                plus the relevance of its chunk
+    4. packing  take sentences best first until RAG_CONTEXT_TOKEN_BUDGET is spent, then restore document order
+                so the model reads coherent passages
+"""
+import math
+import re
+from collections import Counter
+from typing import Any, Dict, List, Optional, Tuple
+
+from utils.conversation_memory import estimate_tokens
+
+# Chunks sharing this share of their 3-word shingles are the same passage
+NEAR_DUPLICATE_JACCARD = 0.8
+# Weight of the chunk's retrieval relevance next to the sentence's own query-term overlap (0..1)
+CHUNK_RELEVANCE_WEIGHT = 0.5
+
+_WORD_PATTERN = re.compile(r"\w+")
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+# Words too common to tell sentences apart
+_STOPWORDS = {
+    "a", "an", "the", "is", "are", "what", "which", "how", "do", "does", "i", "my", "me", "you", "your", "of", "to",
+    "in", "on", "for", "and", "or", "it", "can", "about", "tell", "explain", "need", "there", "any", "be", "with",
+}
+
+
+def _words(text: str) -> List[str]:
+    return _WORD_PATTERN.findall(text.casefold())
+
+
+def _normalize(text: str) -> str:
+    return " ".join(_words(text))
+
+
+def _shingles(text: str) -> set:
+    words = _words(text)
+    return {tuple(words[i:i + 3]) for i in range(max(1, len(words) - 2))}
+
+
+def _sentences(text: str) -> List[str]:
+    """Markdown lines (headings, bullets, Q/A lines) split further at sentence ends."""
+    sentences = []
+    for line in text.splitlines():
+        sentences.extend(part.strip() for part in _SENTENCE_END.split(line.strip()) if part.strip())
+    return sentences
+
+
+def select_chunks(scored_docs: List[Tuple[Any, float]], min_relevance: float, margin: float) -> List[Tuple[Any, float]]:
+    """The retrieval depth: chunks passing the absolute and relative cutoffs, without near-duplicates, best first."""
+    ranked = sorted(scored_docs, key=lambda pair: pair[1], reverse=True)
+    if not ranked:
+        return []
+    best = ranked[0][1]
+    kept, kept_shingles = [], []
+    for position, (doc, score) in enumerate(ranked):
+        if position and (score < min_relevance or score < best - margin):
+            break
+        shingles = _shingles(doc.page_content)
+        if any(len(shingles & other) / (len(shingles | other) or 1) >= NEAR_DUPLICATE_JACCARD for other in kept_shingles):
+            continue
+        kept.append((doc, score))
+        kept_shingles.append(shingles)
+    return kept
+
+
+def build_context(query: str, scored_docs: List[Tuple[Any, float]], token_budget: Optional[int] = None,
+                  min_relevance: Optional[float] = None, margin: Optional[float] = None) -> str:
+    """The prompt context for `query` from (document, relevance score) pairs; settings default to config.py."""
+    from config import RAG_CONTEXT_TOKEN_BUDGET, RAG_MIN_RELEVANCE, RAG_RELEVANCE_MARGIN
+    token_budget = RAG_CONTEXT_TOKEN_BUDGET if token_budget is None else token_budget
+    min_relevance = RAG_MIN_RELEVANCE if min_relevance is None else min_relevance
+    margin = RAG_RELEVANCE_MARGIN if margin is None else margin
+
+    chunks = select_chunks(scored_docs, min_relevance, margin)
+    # Unique sentences, first (best chunk) occurrence wins; order key = (position in the document, in the chunk)
+    candidates: Dict[str, Dict[str, Any]] = {}
+    for rank, (doc, score) in enumerate(chunks):
+        start = doc.metadata.get("start_index", rank) if isinstance(doc.metadata, dict) else rank
+        sentences = _sentences(doc.page_content)
+        for index, sentence in enumerate(sentences):
+            key = _normalize(sentence)
+            if key and key not in candidates:
+                candidates[key] = {"text": sentence, "order": (start, index), "relevance": score,
+                                   "edge": index in (0, len(sentences) - 1)}
+    # A chunk boundary can cut a sentence the neighbouring chunk holds whole: drop such fragments
+    keys = sorted(candidates, key=len, reverse=True)
+    for i, key in enumerate(keys):
+        if candidates[key]["edge"] and any(f" {key} " in f" {longer} " for longer in keys[:i] if longer in candidates):
+            del candidates[key]
+    if not candidates:
+        return ""
+
+    # IDF over the candidate sentences, so that terms every sentence shares count for little
+    sentence_terms = {key: set(key.split()) - _STOPWORDS for key in candidates}
+    document_frequency = Counter(term for terms in sentence_terms.values() for term in terms)
+    idf = {term: math.log(1 + len(candidates) / count) for term, count in document_frequency.items()}
+    query_terms = set(_words(query)) - _STOPWORDS
+    query_weight = sum(idf.get(term, 0.0) for term in query_terms) or 1.0
+    best_relevance = max(candidate["relevance"] for candidate in candidates.values())
+    for key, candidate in candidates.items():
+        overlap = sum(idf[term] for term in sentence_terms[key] & query_terms) / query_weight
+        prior = candidate["relevance"] / best_relevance if best_relevance > 0 else 1.0
+        candidate["score"] = overlap + CHUNK_RELEVANCE_WEIGHT * prior
+
+    # Best first into the budget (the best sentence always fits), then back to document order
+    packed, used = [], 0
+    for candidate in sorted(candidates.values(), key=lambda c: (-c["score"], c["order"])):
+        tokens = estimate_tokens(candidate["text"])
+        if packed and used + tokens > token_budget:
+            continue
+        packed.append(candidate)
+        used += tokens
+    packed.sort(key=lambda c: c["order"])
+
+    paragraphs: List[List[str]] = []
+    previous_chunk = None
+    for candidate in packed:
+        if candidate["order"][0] != previous_chunk:
+            paragraphs.append([])
+            previous_chunk = candidate["order"][0]
+        paragraphs[-1].append(candidate["text"])
+    context = "\n\n".join("\n".join(lines) for lines in paragraphs)
+
+    retrieved_tokens = sum(estimate_tokens(doc.page_content) for doc, _ in scored_docs)
+    print(f"---RAG CONTEXT: {len(chunks)}/{len(scored_docs)} chunks, {len(packed)} sentences, "
+          f"~{estimate_tokens(context)} tokens (retrieved ~{retrieved_tokens})---")
+    return context
+
+
+if __name__ == "__main__":
+    from langchain_core.documents import Document
+    first = ("A deductible is the amount you pay out-of-pocket before your insurer pays. For example, with a $500 "
+             "deductible and $2000 in damages, you pay $500. A premium is what you pay to keep the policy active.")
+    second = "For example, with a $500 deductible and $2000 in damages, you pay $500. Term life covers a fixed period."
+    scored = [(Document(page_content=first), 0.82), (Document(page_content=second), 0.74),
+              (Document(page_content=first), 0.70), (Document(page_content="Unrelated travel cover notes."), 0.41)]
+    print(build_context("What is a deductible?", scored, token_budget=40))
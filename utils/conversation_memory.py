@@ -0,0 +1,175 @@
+# utils/conversation_memory.py
+import re
+from typing import Any, Callable, List, Optional
+
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage
+from langchain_core.prompts import ChatPromptTemplate
+
+# Queries referring back to an earlier turn's customer, lead or policy: personal pronouns ("recommend something
+# for her", "what about his policies?") or a demonstrative before such a noun ("that customer", "the same policy").
+# "it", "this", "more" or "also" alone do not count: "What does it cover?" is usually self-contained.
+_FOLLOW_UP_PATTERN = re.compile(
+    r"\b(?:she|her|hers|herself|he|him|his|himself|they|them|their|theirs|themselves)\b"
+    r"|\b(?:that|this|these|those|same|previous|earlier|last|other)\s+"
+    r"(?:customers?|clients?|persons?|people|policyholders?|policy|policies|leads?|accounts?|ones?)\b",
+    re.IGNORECASE,
+)
+
+_SUMMARY_PROMPT = ChatPromptTemplate.from_messages([
+    ("system", """You maintain a running summary of a conversation between an insurance agent and an AI assistant.
+    Update the summary with the new messages. Keep the customers, leads, policy ids, emails and products that were
+    discussed and what was asked about them; drop pleasantries. Reply with the updated summary only, at most {max_words} words."""),
+    ("human", "Current summary:\n{summary}\n\nNew messages:\n{messages}")
+])
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate (~4 characters per token), good enough for budgeting prompt context."""
+    return len(text) // 4 + 1
+
+
+def is_follow_up(query: str, matches: Optional[List[Any]] = None) -> bool:
+    """
+    True when the query refers back to the conversation ("her", "that customer") without naming a CRM entity
+    itself. matches: find_entities(query) when already computed.
+    """
+    if not _FOLLOW_UP_PATTERN.search(query):
+        return False
+    from utils.entity_extractor import find_entities
+    return not (find_entities(query) if matches is None else matches)
+
+
+def _format_messages(messages: List[BaseMessage], max_chars_per_message: int = 600) -> str:
+    lines = []
+    for message in messages:
+        role = "User" if isinstance(message, HumanMessage) else "Assistant"
+        content = str(message.content)
+        if len(content) > max_chars_per_message:
+            content = content[:max_chars_per_message - 3] + "..."
+        lines.append(f"{role}: {content}")
+    return "\n".join(lines)
+
+
+class ConversationMemory:
+    """
+    Bounded memory for one chat session: a sliding window of the most recent messages that fits
+    window_tokens, plus a rolling summary of everything older.
+
+    update() is called once per turn. Messages that fall out of the window are folded into the summary
+    incrementally (one LLM call over the previous summary and the newly evicted messages only), so the
+    context handed to the graph stays bounded no matter how long the conversation gets. context() returns
+    the cached result.
+    """
+
+    def __init__(self, window_tokens: int = 1000, summary_max_tokens: int = 250,
+                 summarizer: Optional[Callable[[str, List[BaseMessage]], str]] = None):
+        self.window_tokens = window_tokens
+        self.summary_max_tokens = summary_max_tokens
+        self.summarizer = summarizer or self._summarize_with_llm
+        self.summary = ""
+        self._summarized_count = 0
+        self._window: List[BaseMessage] = []
+        self._context = ""
+
+    def _summarize_with_llm(self, summary: str, messages: List[BaseMessage]) -> str:
+        from utils.llm_factory import create_chat_llm
+        chain = _SUMMARY_PROMPT | create_chat_llm()
+        response = chain.invoke({
+            "summary": summary or "(empty)",
+            "messages": _format_messages(messages),
+            "max_words": int(self.summary_max_tokens * 0.75),
+        })
+        return str(response.content).strip()
+
+    def _fallback_summary(self, summary: str, messages: List[BaseMessage]) -> str:
+        # Without the LLM, keep what the user asked: that is what follow-ups refer back to
+        asked = [f"User asked: {str(m.content)[:150]}" for m in messages if isinstance(m, HumanMessage)]
+        return "\n".join(filter(None, [summary, *asked]))
+
+    def _trim_summary(self, summary: str) -> str:
+        max_chars = self.summary_max_tokens * 4
+        # Keep the most recent part of an over-long summary
+        return summary if len(summary) <= max_chars else "..." + summary[-(max_chars - 3):]
+
+    def update(self, history: List[BaseMessage]) -> str:
+        """Recomputes the window and folds evicted messages into the summary. Returns the new context."""
+        # Newest messages first until the token budget is used up
+        window_start = len(history)
+        used_tokens = 0
+        for index in range(len(history) - 1, -1, -1):
+            message_tokens = estimate_tokens(str(history[index].content))
+            if used_tokens + message_tokens > self.window_tokens and window_start < len(history):
+                break
+            used_tokens += message_tokens
+            window_start = index
+
+        evicted = history[self._summarized_count:window_start]
+        if evicted:
+            print(f"---CONVERSATION MEMORY: SUMMARIZING {len(evicted)} OLDER MESSAGES---")
+            try:
+                new_summary = self.summarizer(self.summary, evicted)
+            except Exception as e:
+                print(f"⚠️ Conversation summary failed: {e}. Keeping an extractive summary instead.")
+                new_summary = self._fallback_summary(self.summary, evicted)
+            self.summary = self._trim_summary(new_summary)
+            self._summarized_count = window_start
+
+        self._window = list(history[max(window_start, self._summarized_count):])
+        parts = []
+        if self.summary:
+            parts.append(f"Summary of the earlier conversation:\n{self.summary}")
+        if self._window:
+            parts.append(f"Recent messages:\n{_format_messages(self._window)}")
+        self._context = "\n\n".join(parts)
+        return self._context
+
+    def context(self) -> str:
+        return self._context
+
+    def window(self) -> List[BaseMessage]:
+        return list(self._window)
+
+    def clear(self) -> None:
+        self.summary = ""
+        self._summarized_count = 0
+        self._window = []
+        self._context = ""
+
+
+def create_conversation_memory() -> ConversationMemory:
+    from config import CONVERSATION_WINDOW_TOKENS, CONVERSATION_SUMMARY_MAX_TOKENS
+    return ConversationMemory(window_tokens=CONVERSATION_WINDOW_TOKENS, summary_max_tokens=CONVERSATION_SUMMARY_MAX_TOKENS)
+
+
+def contextualize_query(query: str, conversation_context: str, matches: Optional[List[Any]] = None) -> str:
+    """
+    Prefixes a follow-up query with the conversation context so agents can resolve references
+    ("her", "that policy"). Self-contained queries are returned unchanged and cost no extra tokens.
+    """
+    if not conversation_context or not is_follow_up(query, matches):
+        return query
+    return f"Conversation so far (for resolving references only):\n{conversation_context}\n\nCurrent request: {query}"
+
+
+if __name__ == "__main__":
+    def fake_summarizer(summary: str, messages: List[BaseMessage]) -> str:
+        return (summary + " | " if summary else "") + "; ".join(str(m.content)[:30] for m in messages)
+
+    memory = ConversationMemory(window_tokens=40, summary_max_tokens=60, summarizer=fake_summarizer)
+    history: List[BaseMessage] = []
+    turns = [
+        ("Find customer Emily Brown", "Emily Brown (CUST004) has an auto policy AUTO004, premium $950."),
+        ("What is comprehensive coverage?", "Comprehensive covers theft, fire and weather damage."),
+        ("Show me qualified leads in Texas", "Two qualified leads in Texas: LEAD002 and LEAD007."),
+        ("Recommend something for her", "..."),
+    ]
+    for user_text, ai_text in turns:
+        history += [HumanMessage(content=user_text), AIMessage(content=ai_text)]
+        context = memory.update(history)
+        print(f"{len(history)} messages -> context of ~{estimate_tokens(context)} tokens")
+
+    for query in ["Recommend something for her", "What does that policy cover?",
+                  "What is term life insurance and what does it cover?", "Tell me more about home insurance",
+                  "Compare John Smith with his wife's policy"]:
+        print(f"{query!r}: follow-up={is_follow_up(query)}")
+    print(contextualize_query("Recommend something for her", memory.context()))
@@ -0,0 +1,218 @@
+# utils/crm_aggregates.py
+"""
+Dashboard aggregates over the CRM, kept materialized next to the CRMStore indexes.
+
+    leads:     counts by (area, status), and a histogram of lead scores (10-point bins) per status
+    customers: policy counts and premium sums by (policy type, policy status)
+
+The aggregates are built once from the store and then maintained incrementally from its change feed: each
+lead and customer remembers what it contributed, so a changed record only takes its old contribution out and
+puts the new one in. Answering "how many qualified leads per state" is then a dictionary read, not a search.
+Keys are matched case-insensitively and reported with the spelling first seen in the data.
+"""
+import threading
+from collections import Counter, defaultdict
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from tools.crm_store import get_crm_store
+
+SCORE_BIN_WIDTH = 10
+METRICS = ("summary", "lead_counts", "lead_score_histogram", "premium_by_policy_type")
+
+
+def _score_bin(score: Any) -> int:
+    """Lower bound of the score's bin (100 falls in the 90 bin)."""
+    try:
+        value = float(score or 0)
+    except (TypeError, ValueError):
+        value = 0.0
+    return int(min(max(value, 0.0), 99.0) // SCORE_BIN_WIDTH * SCORE_BIN_WIDTH)
+
+
+def _premium(policy: Dict[str, Any]) -> float:
+    try:
+        return float(policy.get("premium") or 0)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+class CRMAggregates:
+    """Counts and sums over the leads and customers, updated per changed record."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._labels: Dict[str, str] = {}
+        # Leads
+        self.lead_counts: Counter = Counter()        # (area, status) -> leads
+        self.score_histogram: Counter = Counter()    # (status, bin) -> leads
+        self._lead_contrib: Dict[str, Tuple[str, str, int]] = {}
+        # Customers
+        self.policy_counts: Counter = Counter()      # (policy type, policy status) -> policies
+        self.premium_sums: Dict[Tuple[str, str], float] = defaultdict(float)
+        self._customer_contrib: Dict[str, List[Tuple[str, str, float]]] = {}
+        self.updates = 0
+
+    def _key(self, value: Any) -> str:
+        text = str(value or "").strip()
+        key = text.casefold()
+        self._labels.setdefault(key, text or "(none)")
+        return key
+
+    def label(self, key: str) -> str:
+        return self._labels.get(key, key)
+
+    # --- Incremental maintenance (callers hold self._lock) ---
+    def _set_lead(self, lead_id: str, lead: Dict[str, Any]) -> None:
+        old = self._lead_contrib.pop(lead_id, None)
+        if old:
+            area, status, score_bin = old
+            self.lead_counts[(area, status)] -= 1
+            self.score_histogram[(status, score_bin)] -= 1
+            if not self.lead_counts[(area, status)]:
+                del self.lead_counts[(area, status)]
+            if not self.score_histogram[(status, score_bin)]:
+                del self.score_histogram[(status, score_bin)]
+        if lead:
+            area, status, score_bin = self._key(lead.get("area")), self._key(lead.get("status")), _score_bin(lead.get("score"))
+            self.lead_counts[(area, status)] += 1
+            self.score_histogram[(status, score_bin)] += 1
+            self._lead_contrib[lead_id] = (area, status, score_bin)
+
+    def _set_customer(self, customer_id: str, customer: Dict[str, Any]) -> None:
+        for policy_type, status, premium in self._customer_contrib.pop(customer_id, []):
+            self.policy_counts[(policy_type, status)] -= 1
+            self.premium_sums[(policy_type, status)] -= premium
+            if not self.policy_counts[(policy_type, status)]:
+                del self.policy_counts[(policy_type, status)]
+                del self.premium_sums[(policy_type, status)]
+        if customer:
+            contrib = [(self._key(p.get("type")), self._key(p.get("status")), _premium(p)) for p in customer.get("policies", [])]
+            for policy_type, status, premium in contrib:
+                self.policy_counts[(policy_type, status)] += 1
+                self.premium_sums[(policy_type, status)] += premium
+            self._customer_contrib[customer_id] = contrib
+
+    def build(self, customers: List[Dict[str, Any]], leads: List[Dict[str, Any]]) -> None:
+        """Full build from the store's records (reads them, keeps no reference)."""
+        with self._lock:
+            # First record wins on duplicate ids, as in the store's indexes
+            for lead in reversed(leads):
+                if lead.get("id"):
+                    self._set_lead(lead["id"], lead)
+            for customer in reversed(customers):
+                if customer.get("id"):
+                    self._set_customer(customer["id"], customer)
+
+    def on_leads_changed(self, lead_ids: Set[str]) -> None:
+        """CRM change feed listener for the lead file."""
+        store = get_crm_store()
+        records = {lead_id: store.find_lead(lead_id) for lead_id in lead_ids}
+        with self._lock:
+            for lead_id, lead in records.items():
+                self._set_lead(lead_id, lead)
+            self.updates += len(records)
+
+    def on_customers_changed(self, customer_ids: Set[str]) -> None:
+        """CRM change feed listener for the customer file."""
+        store = get_crm_store()
+        records = {customer_id: store.find_customer(customer_id) for customer_id in customer_ids}
+        with self._lock:
+            for customer_id, customer in records.items():
+                # find_customer also matches emails/names: only the record with this id counts
+                self._set_customer(customer_id, customer if customer.get("id") == customer_id else {})
+            self.updates += len(records)
+
+    # --- Queries ---
+    def _matches(self, key: str, wanted: Optional[str]) -> bool:
+        return not wanted or key == wanted.strip().casefold()
+
+    def summary(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "leads": sum(self.lead_counts.values()),
+                "customers": len(self._customer_contrib),
+                "policies": sum(self.policy_counts.values()),
+                "total_premium": round(sum(self.premium_sums.values()), 2),
+            }
+
+    def lead_counts_by_area(self, area: Optional[str] = None, status: Optional[str] = None) -> Dict[str, Any]:
+        """{"total": n, "by_area": {area: {status: n}}} for the leads matching the filters."""
+        by_area: Dict[str, Dict[str, int]] = {}
+        with self._lock:
+            for (area_key, status_key), count in sorted(self.lead_counts.items()):
+                if self._matches(area_key, area) and self._matches(status_key, status):
+                    by_area.setdefault(self.label(area_key), {})[self.label(status_key)] = count
+        return {"total": sum(sum(counts.values()) for counts in by_area.values()), "by_area": by_area}
+
+    def lead_score_histogram(self, status: Optional[str] = None) -> Dict[str, Any]:
+        """{"total": n, "bins": {"80-89": n, ...}} of the lead scores (optionally of one status)."""
+        bins = {score_bin: 0 for score_bin in range(0, 100, SCORE_BIN_WIDTH)}
+        with self._lock:
+            for (status_key, score_bin), count in self.score_histogram.items():
+                if self._matches(status_key, status):
+                    bins[score_bin] += count
+        last = 100 - SCORE_BIN_WIDTH
+        return {
+            "total": sum(bins.values()),
+            "bins": {f"{b}-{b + SCORE_BIN_WIDTH - 1 if b < last else 100}": count for b, count in bins.items()},
+        }
+
+    def premium_by_policy_type(self, policy_type: Optional[str] = None, status: Optional[str] = None) -> Dict[str, Any]:
+        """{"total_premium", "policies", "by_policy_type": {type: {status: {"policies", "total_premium"}}}}."""
+        by_type: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        with self._lock:
+            for (type_key, status_key), count in sorted(self.policy_counts.items()):
+                if self._matches(type_key, policy_type) and self._matches(status_key, status):
+                    by_type.setdefault(self.label(type_key), {})[self.label(status_key)] = {
+                        "policies": count,
+                        "total_premium": round(self.premium_sums[(type_key, status_key)], 2),
+                    }
+        cells = [cell for statuses in by_type.values() for cell in statuses.values()]
+        return {
+            "total_premium": round(sum(cell["total_premium"] for cell in cells), 2),
+            "policies": sum(cell["policies"] for cell in cells),
+            "by_policy_type": by_type,
+        }
+
+    def query(self, metric: str, area: Optional[str] = None, status: Optional[str] = None,
+              policy_type: Optional[str] = None) -> Dict[str, Any]:
+        if metric == "lead_counts":
+            return self.lead_counts_by_area(area, status)
+        if metric == "lead_score_histogram":
+            return self.lead_score_histogram(status)
+        if metric == "premium_by_policy_type":
+            return self.premium_by_policy_type(policy_type, status)
+        if metric == "summary":
+            return self.summary()
+        raise ValueError(f"Unknown metric '{metric}', expected one of: {', '.join(METRICS)}")
+
+
+_crm_aggregates_instance = None
+_crm_aggregates_lock = threading.Lock()
+
+def get_crm_aggregates() -> CRMAggregates:
+    """The process-wide aggregates; the store is refreshed first so pending file edits reach them via the feed."""
+    global _crm_aggregates_instance
+    store = get_crm_store()
+    if _crm_aggregates_instance is None:
+        with _crm_aggregates_lock:
+            if _crm_aggregates_instance is None:
+                aggregates = CRMAggregates()
+                # Load first (the initial load reports every record as changed), then subscribe before the build:
+                # a change in between is replayed per id, which is idempotent
+                store.refresh()
+                store.add_change_listener(aggregates.on_customers_changed, kind="customers")
+                store.add_change_listener(aggregates.on_leads_changed, kind="leads")
+                # derived runs the build on the loaded records (no copies) under the store's lock
+                store.derived("crm_aggregates_build", aggregates.build)
+                _crm_aggregates_instance = aggregates
+                print(f"✅ CRM aggregates built: {aggregates.summary()}")
+    store.refresh()
+    return _crm_aggregates_instance
+
+
+if __name__ == "__main__":
+    aggregates = get_crm_aggregates()
+    print(aggregates.query("lead_counts", status="Qualified"))
+    print(aggregates.query("lead_score_histogram"))
+    print(aggregates.query("premium_by_policy_type"))
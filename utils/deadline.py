@@ -0,0 +1,145 @@
+# utils/deadline.py
+import asyncio
+import concurrent.futures
+import contextvars
+import threading
+import time
+from typing import Any, Awaitable, Callable, Mapping, Optional
+
+from langchain_core.runnables.config import ContextThreadPoolExecutor
+
+
+class DeadlineExceeded(TimeoutError):
+    """A node ran out of its time budget (or the request out of its deadline)."""
+
+
+def request_deadline(seconds: float) -> float:
+    """Absolute deadline (epoch seconds, so it survives checkpointing) for a request starting now; 0 = none."""
+    return time.time() + seconds if seconds and seconds > 0 else 0.0
+
+
+def remaining_seconds(state: Mapping[str, Any]) -> Optional[float]:
+    """Seconds left before the request deadline, or None when the request has no deadline."""
+    deadline = state.get("deadline") or 0.0
+    if not deadline:
+        return None
+    return deadline - time.time()
+
+
+def node_timeout(state: Mapping[str, Any], budget_seconds: float) -> Optional[float]:
+    """A node's timeout: its own budget, capped by what is left of the request deadline. None = unbounded."""
+    limits = [limit for limit in (budget_seconds if budget_seconds > 0 else None, remaining_seconds(state)) if limit is not None]
+    return min(limits) if limits else None
+
+
+# Monotonic deadline of the budgeted call running in this context (None = unbounded). Model calls read it to stop
+# retrying once it has passed, so an abandoned call winds down instead of retrying on into the next request's time.
+_call_deadline: contextvars.ContextVar[Optional[float]] = contextvars.ContextVar("call_deadline", default=None)
+
+
+def call_time_left() -> Optional[float]:
+    """Seconds left in the budget of the current call (negative once passed), or None when it has no budget."""
+    deadline = _call_deadline.get()
+    return None if deadline is None else deadline - time.monotonic()
+
+
+def _run_within(deadline: float, func: Callable[..., Any], *args, **kwargs) -> Any:
+    token = _call_deadline.set(deadline)
+    try:
+        if time.monotonic() >= deadline:
+            # Waited in the queue past its budget: the caller has given up on it
+            raise DeadlineExceeded("budget spent before the call started")
+        return func(*args, **kwargs)
+    finally:
+        _call_deadline.reset(token)
+
+
+_executor_instance = None
+_executor_lock = threading.Lock()
+_busy_workers = 0
+
+def _get_executor() -> ContextThreadPoolExecutor:
+    global _executor_instance
+    if _executor_instance is None:
+        with _executor_lock:
+            if _executor_instance is None:
+                from config import NODE_CALL_MAX_WORKERS
+                # Context-copying pool: callbacks (token streaming) and the graph config still reach the call
+                _executor_instance = ContextThreadPoolExecutor(max_workers=NODE_CALL_MAX_WORKERS, thread_name_prefix="node-budget")
+    return _executor_instance
+
+
+def _claim_worker() -> bool:
+    """Reserves an idle pool worker; False when all are busy (timed-out calls still finishing included)."""
+    global _busy_workers
+    from config import NODE_CALL_MAX_WORKERS
+    _get_executor()
+    with _executor_lock:
+        if _busy_workers >= NODE_CALL_MAX_WORKERS:
+            return False
+        _busy_workers += 1
+        return True
+
+
+def _release_worker() -> None:
+    global _busy_workers
+    with _executor_lock:
+        _busy_workers -= 1
+
+
+def _run_on_worker(deadline: float, func: Callable[..., Any], *args, **kwargs) -> Any:
+    try:
+        return _run_within(deadline, func, *args, **kwargs)
+    finally:
+        _release_worker()
+
+
+def call_with_timeout(func: Callable[..., Any], timeout: Optional[float], *args, **kwargs) -> Any:
+    """
+    Runs func(*args, **kwargs) and raises DeadlineExceeded if it has not returned after `timeout` seconds.
+    Python threads cannot be killed: a timed-out call finishes in the background and its result is dropped,
+    but its model calls stop retrying at the deadline (call_time_left). Calls never queue behind such leftovers:
+    when every worker is busy, func runs on the caller's thread, bounded only by that retry cutoff.
+    Async callers get real cancellation from acall_with_timeout.
+    """
+    if timeout is None:
+        return func(*args, **kwargs)
+    if timeout <= 0:
+        raise DeadlineExceeded("no time left in the request deadline")
+    deadline = time.monotonic() + timeout
+    if not _claim_worker():
+        print("⚠️ All budget workers busy: running the call inline.")
+        return _run_within(deadline, func, *args, **kwargs)
+    future = _get_executor().submit(_run_on_worker, deadline, func, *args, **kwargs)
+    try:
+        return future.result(timeout=timeout)
+    except concurrent.futures.TimeoutError:
+        if future.done():
+            # func finished after all, or itself raised a TimeoutError (e.g. an HTTP timeout): not our budget
+            return future.result()
+        future.cancel()
+        raise DeadlineExceeded(f"did not finish within {timeout:.1f}s")
+
+
+async def acall_with_timeout(make_awaitable: Callable[[], Awaitable[Any]], timeout: Optional[float]) -> Any:
+    """Awaits make_awaitable(), cancelling it and raising DeadlineExceeded after `timeout` seconds."""
+    if timeout is None:
+        return await make_awaitable()
+    if timeout <= 0:
+        raise DeadlineExceeded("no time left in the request deadline")
+    # The task copies the current context, deadline included
+    token = _call_deadline.set(time.monotonic() + timeout)
+    try:
+        task = asyncio.ensure_future(make_awaitable())
+    finally:
+        _call_deadline.reset(token)
+    try:
+        done, _ = await asyncio.wait({task}, timeout=timeout)
+    except asyncio.CancelledError:
+        task.cancel()
+        raise
+    if not done:
+        task.cancel()
+        raise DeadlineExceeded(f"did not finish within {timeout:.1f}s")
+    # Errors raised by the awaitable itself (including its own timeouts) propagate unchanged
+    return task.result()
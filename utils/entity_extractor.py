@@ -0,0 +1,146 @@
+# utils/entity_extractor.py
+"""
+Finds the CRM customers a query mentions, without an LLM.
+
+Every customer id, email, full name and policy id in the CRM is a key of one Aho-Corasick automaton. The
+automaton works on tokens rather than characters (a word, an email or an id like "AUTO-001" is one token):
+keys then share far fewer nodes than in a character trie, and matches always start and end on word
+boundaries. A query is tokenized once and fed through the automaton in a single pass, so finding every
+known entity costs time linear in the query length (plus the matches reported), however many customers the
+CRM holds. The automaton is rebuilt only when the CRM files change (CRMStore.derived).
+"""
+import re
+from collections import deque
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+from tools.crm_store import get_crm_store
+
+# Emails first so that they stay one token; other tokens are words, possibly joined by - or ' ("AUTO-001", "O'Brien"),
+# with a possessive 's left out ("John Smith's policies" mentions "John Smith")
+_TOKEN_PATTERN = re.compile(r"[a-z0-9._%+-]+@[a-z0-9.-]+\.[a-z]{2,}|[a-z0-9]+(?:-[a-z0-9]+|'(?!s\b)[a-z0-9]+)*", re.IGNORECASE)
+# Identifiers name one customer outright; a name is only as good as the spelling in the query
+ENTITY_PRIORITY = {"id": 0, "email": 0, "policy_id": 0, "name": 1}
+
+
+class EntityMatch(NamedTuple):
+    kind: str           # "id", "email", "policy_id" or "name"
+    customer_id: str
+    text: str           # as written in the query
+    start: int          # character offsets in the query
+    end: int
+
+
+def _tokenize(text: str) -> List[Tuple[str, int, int]]:
+    """(case-folded token, start, end) with offsets into the text as given."""
+    return [(m.group(0).casefold(), m.start(), m.end()) for m in _TOKEN_PATTERN.finditer(text)]
+
+
+class CRMEntityAutomaton:
+    """Aho-Corasick automaton over token sequences, built from the customer records."""
+
+    def __init__(self, customers: List[Dict[str, Any]]):
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        # Per node: the key ending there (tokens in it, kind, customer id), and the nearest proper suffix node with one
+        self._key: List[Any] = [None]
+        self._output_link: List[int] = [0]
+        self.keys = 0
+        for customer in customers:
+            customer_id = customer.get("id", "")
+            if not customer_id:
+                continue
+            self._add(customer_id, "id", customer_id)
+            self._add(customer.get("email", ""), "email", customer_id)
+            self._add(customer.get("name", ""), "name", customer_id)
+            for policy in customer.get("policies", []):
+                self._add(policy.get("policy_id", ""), "policy_id", customer_id)
+        self._link()
+
+    def _add(self, key: str, kind: str, customer_id: str) -> None:
+        tokens = [token for token, _, _ in _tokenize(key or "")]
+        if not tokens:
+            return
+        node = 0
+        for token in tokens:
+            child = self._goto[node].get(token)
+            if child is None:
+                child = len(self._goto)
+                self._goto[node][token] = child
+                self._goto.append({})
+                self._fail.append(0)
+                self._key.append(None)
+                self._output_link.append(0)
+            node = child
+        # The first customer with a key keeps it, as in CRMStore's lookup index
+        if self._key[node] is None:
+            self._key[node] = (len(tokens), kind, customer_id)
+            self.keys += 1
+
+    def _link(self) -> None:
+        """Failure and output links, breadth first from the root."""
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for token, child in self._goto[node].items():
+                fallback = self._fail[node]
+                while fallback and token not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[child] = self._goto[fallback].get(token, 0)
+                suffix = self._fail[child]
+                self._output_link[child] = suffix if self._key[suffix] is not None else self._output_link[suffix]
+                queue.append(child)
+
+    def find(self, text: str) -> List[EntityMatch]:
+        """Every known entity in the text, in order of where it ends (overlapping matches included)."""
+        tokens = _tokenize(text)
+        matches: List[EntityMatch] = []
+        node = 0
+        for position, (token, _, end) in enumerate(tokens):
+            while node and token not in self._goto[node]:
+                node = self._fail[node]
+            node = self._goto[node].get(token, 0)
+            hit = node if self._key[node] is not None else self._output_link[node]
+            while hit:
+                length, kind, customer_id = self._key[hit]
+                start = tokens[position - length + 1][1]
+                matches.append(EntityMatch(kind, customer_id, text[start:end], start, end))
+                hit = self._output_link[hit]
+        return matches
+
+
+def get_entity_automaton() -> CRMEntityAutomaton:
+    """The automaton of the current CRM data (rebuilt only when the CRM files change)."""
+    return get_crm_store().derived("entity_automaton", lambda customers, leads: CRMEntityAutomaton(customers))
+
+
+def find_entities(text: str) -> List[EntityMatch]:
+    return get_entity_automaton().find(text or "")
+
+
+def resolve_customer(text: str, latest: bool = False, matches: Optional[List[EntityMatch]] = None) -> Dict[str, Any]:
+    """
+    The CRM record of the customer the text mentions, or {}. Identifiers (id, email, policy id) win over names,
+    then the longest match, then the first one in the text. With latest=True (a conversation transcript), the
+    last mention wins instead. matches: find_entities(text) when already computed.
+    """
+    matches = find_entities(text) if matches is None else matches
+    if not matches:
+        return {}
+    if latest:
+        best = max(matches, key=lambda m: (m.end, m.end - m.start))
+    else:
+        best = min(matches, key=lambda m: (ENTITY_PRIORITY[m.kind], -(m.end - m.start), m.start))
+    return get_crm_store().find_customer(best.customer_id)
+
+
+if __name__ == "__main__":
+    for query in [
+        "Find customer John Smith and recommend insurance products based on his profile",
+        "Recommend coverage for jane@example.com",
+        "Who owns policy AUTO-001? Is it CUST003?",
+        "Recommend products for non_existent@example.com",
+    ]:
+        print(query)
+        for match in find_entities(query):
+            print(f"  {match.kind:<9} {match.customer_id:<8} '{match.text}'")
+        print(f"  -> {resolve_customer(query).get('name', '(no customer)')}")
@@ -0,0 +1,124 @@
+# utils/errors.py
+import asyncio
+import re
+from typing import Optional
+
+# HTTP statuses worth retrying: request timeout, rate limit, server errors
+_TRANSIENT_STATUS_CODES = {408, 429, 500, 502, 503, 504}
+# gRPC / Google API status names of the same failures
+_TRANSIENT_STATUS_NAMES = {"RESOURCE_EXHAUSTED", "UNAVAILABLE", "DEADLINE_EXCEEDED", "INTERNAL", "ABORTED"}
+# Last resort for errors that only carry a message: an HTTP status next to "status"/"code"/"HTTP", or a
+# status name in its upper-case API spelling ("503 UNAVAILABLE", "status code: 429", "HTTP 502")
+_STATUS_IN_MESSAGE = re.compile(r"(?i:\b(?:status(?:[ _]code)?|code|http(?:/\d(?:\.\d)?)?)\b)\W{0,3}(\d{3})\b|^\s*(\d{3})\s+[A-Z_]{4,}\b",
+                                re.MULTILINE)
+_STATUS_NAME_IN_MESSAGE = re.compile(r"\b(" + "|".join(sorted(_TRANSIENT_STATUS_NAMES)) + r")\b")
+
+
+def _error_chain(error: BaseException):
+    """The error and the errors it was raised from (wrappers such as ChatGoogleGenerativeAIError keep the SDK error there)."""
+    seen = set()
+    while error is not None and id(error) not in seen and len(seen) < 5:
+        seen.add(id(error))
+        yield error
+        error = error.__cause__ or error.__context__
+
+
+def _status_of(error: BaseException) -> Optional[object]:
+    """The HTTP status code (int) or gRPC status name (str) an error carries as attributes, if any."""
+    for attribute in ("status_code", "code", "grpc_status_code", "status"):
+        value = getattr(error, attribute, None)
+        if callable(value) and attribute == "code":
+            # grpc.RpcError.code() -> grpc.StatusCode
+            try:
+                value = value()
+            except Exception:
+                value = None
+        if isinstance(value, bool) or value is None:
+            continue
+        if isinstance(value, int):
+            return value
+        name = getattr(value, "name", value)
+        if isinstance(name, str) and name.upper() == name and name:
+            return name
+    status_code = getattr(getattr(error, "response", None), "status_code", None)
+    return status_code if isinstance(status_code, int) else None
+
+
+def _status_from_message(error: BaseException) -> Optional[object]:
+    message = str(error)
+    match = _STATUS_IN_MESSAGE.search(message)
+    if match:
+        return int(match.group(1) or match.group(2))
+    match = _STATUS_NAME_IN_MESSAGE.search(message)
+    return match.group(1) if match else None
+
+
+def _is_transient_status(status: Optional[object]) -> bool:
+    return status in _TRANSIENT_STATUS_CODES or status in _TRANSIENT_STATUS_NAMES
+
+
+def _is_transient_type(error: BaseException) -> bool:
+    if isinstance(error, (TimeoutError, asyncio.TimeoutError, ConnectionError)):
+        return True
+    try:
+        from langchain_core.exceptions import ModelConnectionError, ModelRateLimitError, ModelTimeoutError
+        if isinstance(error, (ModelConnectionError, ModelRateLimitError, ModelTimeoutError)):
+            return True
+    except ImportError:
+        pass
+    try:
+        import httpx
+        if isinstance(error, (httpx.TimeoutException, httpx.NetworkError, httpx.RemoteProtocolError)):
+            return True
+    except ImportError:
+        pass
+    return False
+
+
+def is_transient_error(error: BaseException) -> bool:
+    """
+    True for failures that may succeed on retry (rate limits, 5xx, timeouts, dropped connections), judged by the
+    exception type or the status code it carries; the message only counts for an explicit HTTP/gRPC status.
+    Application errors that merely contain such numbers or words ("Invalid premium 1500") are not transient.
+    """
+    for cause in _error_chain(error):
+        if _is_transient_type(cause):
+            return True
+        status = _status_of(cause)
+        if status is not None:
+            return _is_transient_status(status)
+    return _is_transient_status(_status_from_message(error))
+
+
+# "Please retry in 37.5s", "retryDelay': '37s'", "retry after 20 seconds"
+_RETRY_AFTER_PATTERN = re.compile(r"retry(?:[ _-]?delay)?['\"]?\s*(?:in|after|:|=)?\s*['\"]?(\d+(?:\.\d+)?)\s*s", re.IGNORECASE)
+
+
+def is_rate_limit_error(error: BaseException) -> bool:
+    """True for quota / rate-limit rejections (HTTP 429, RESOURCE_EXHAUSTED)."""
+    for cause in _error_chain(error):
+        try:
+            from langchain_core.exceptions import ModelRateLimitError
+            if isinstance(cause, ModelRateLimitError):
+                return True
+        except ImportError:
+            pass
+        status = _status_of(cause)
+        if status is not None:
+            return status in (429, "RESOURCE_EXHAUSTED")
+    return _status_from_message(error) in (429, "RESOURCE_EXHAUSTED")
+
+
+def retry_after_seconds(error: BaseException) -> Optional[float]:
+    """The provider's retry-after hint (Retry-After header or RetryInfo delay in the message), if any."""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None)
+    if headers:
+        value = headers.get("retry-after") or headers.get("Retry-After")
+        try:
+            if value is not None:
+                return float(value)
+        except (TypeError, ValueError):
+            pass
+    match = _RETRY_AFTER_PATTERN.search(str(error))
+    return float(match.group(1)) if match else None
@@ -0,0 +1,161 @@
+# utils/fast_router.py
+import re
+from typing import Dict, List, Tuple
+
+# Labels understood by the orchestrator in langgraph_workflow._determine_routing_target
+ROUTER_LABELS = ["customer", "lead", "knowledge", "recommendation_workflow", "general"]
+
+# Minimum score the winning label needs, and how far ahead of the runner-up it must be,
+# before the rules are trusted to decide without the LLM.
+DEFAULT_CONFIDENCE_THRESHOLD = 0.8
+DEFAULT_MIN_MARGIN = 0.25
+
+EMAIL_PATTERN = re.compile(r"[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}")
+CUSTOMER_ID_PATTERN = re.compile(r"\bcust\d{3}\b", re.IGNORECASE)
+POLICY_ID_PATTERN = re.compile(r"\b(?:auto|home|life|health|travel|policy)-\d{3}\b", re.IGNORECASE)
+LEAD_ID_PATTERN = re.compile(r"\blead\d{3}\b", re.IGNORECASE)
+# Two capitalised words in a row, e.g. "John Smith" (a likely person name)
+PERSON_NAME_PATTERN = re.compile(r"\b[A-Z][a-z]+\s+[A-Z][a-z]+\b")
+
+# (label, pattern, weight). Weights for the same label are summed and capped at 1.0.
+# Book-wide statistics ("total premium by policy type"): answered by the customer agent's statistics tool
+_CUSTOMER_AGGREGATE_PATTERN = re.compile(
+    r"\b(total|sum of|average)\s+(annual\s+)?premiums?\b|\bpremiums?\s+(by|per)\b|"
+    r"\bhow many (customers|policies|policyholders)\b|\b(customers|policies)\s+(by|per)\b", re.IGNORECASE)
+
+_KEYWORD_RULES: List[Tuple[str, re.Pattern, float]] = [
+    # Recommendation workflow
+    ("recommendation_workflow", re.compile(r"\b(recommend\w*|suggest\w*)\b", re.IGNORECASE), 0.7),
+    ("recommendation_workflow", re.compile(r"\bcoverage options\b|\bwhat should .+ (buy|get)\b", re.IGNORECASE), 0.6),
+    ("recommendation_workflow", re.compile(r"\b(profile|additional coverage|cross[- ]sell)\b", re.IGNORECASE), 0.2),
+
+    # Leads
+    ("lead", re.compile(r"\bleads?\b", re.IGNORECASE), 0.9),
+    ("lead", re.compile(r"\bprospects?\b", re.IGNORECASE), 0.7),
+    ("lead", re.compile(r"\bscore\s*(above|below|over|under|of|>=|<=|>|<)", re.IGNORECASE), 0.6),
+    ("lead", re.compile(r"\b(qualified|contacted)\b", re.IGNORECASE), 0.2),
+
+    # Customers
+    ("customer", re.compile(r"\bcustomers?\b", re.IGNORECASE), 0.5),
+    ("customer", re.compile(r"\b(find|show|get|lookup|look up|retrieve)\b", re.IGNORECASE), 0.2),
+    ("customer", re.compile(r"\b(policies|history|contact|phone|address)\b", re.IGNORECASE), 0.2),
+
+    # Knowledge base
+    ("knowledge", re.compile(r"^\s*(what|explain|define|describe|how does|how do|why)\b", re.IGNORECASE), 0.4),
+    ("knowledge", re.compile(r"\b(what is|what are|what does|types of|difference between|meaning of)\b", re.IGNORECASE), 0.3),
+    ("knowledge", re.compile(
+        r"\b(deductibles?|premiums?|comprehensive|collision|liability|term life|whole life|universal life|"
+        r"coverage|beneficiar\w*|claims? process|insurance)\b", re.IGNORECASE), 0.3),
+
+    # General conversation
+    ("general", re.compile(r"^\s*(hi|hello|hey|good (morning|afternoon|evening)|thanks|thank you)\b", re.IGNORECASE), 0.9),
+    ("general", re.compile(r"\b(joke|how are you|who are you|how can you help|what can you do)\b", re.IGNORECASE), 0.9),
+]
+
+
+def normalize_router_label(reply: str) -> str:
+    """Maps a free-form classifier reply (e.g. the LLM's answer) onto one of ROUTER_LABELS."""
+    reply = (reply or "").lower()
+    if "recommendation_workflow" in reply:
+        return "recommendation_workflow"
+    for label in ("customer", "lead", "knowledge"):
+        if label in reply:
+            return label
+    return "general"
+
+
+def score_query(query: str) -> Dict[str, float]:
+    """
+    Scores a query against every router label using regex entity detectors and keyword rules.
+    Returns a dictionary of label -> score in [0, 1].
+    """
+    scores = {label: 0.0 for label in ROUTER_LABELS}
+
+    has_email = bool(EMAIL_PATTERN.search(query))
+    has_customer_id = bool(CUSTOMER_ID_PATTERN.search(query))
+    has_policy_id = bool(POLICY_ID_PATTERN.search(query))
+    has_person_name = bool(PERSON_NAME_PATTERN.search(query))
+
+    # Structured customer identifiers are the strongest signal we have for the customer route
+    if has_customer_id:
+        scores["customer"] += 0.9
+    if has_policy_id:
+        scores["customer"] += 0.8
+    if has_email:
+        scores["customer"] += 0.8
+    if has_person_name:
+        scores["customer"] += 0.2
+
+    for label, pattern, weight in _KEYWORD_RULES:
+        if pattern.search(query):
+            scores[label] += weight
+
+    # A recommendation request aimed at an identifiable customer is the recommendation workflow
+    if scores["recommendation_workflow"] >= 0.6 and (has_email or has_customer_id or has_person_name
+                                                     or re.search(r"\b(him|her|them|customer)\b", query, re.IGNORECASE)):
+        scores["recommendation_workflow"] += 0.3
+        # ...and the customer identifier is an input to that workflow, not a separate intent
+        scores["customer"] = max(0.0, scores["customer"] - 0.5)
+
+    # Lead queries often mention a name or an area, which must not pull them to the customer route
+    if scores["lead"] >= 0.9:
+        scores["customer"] = max(0.0, scores["customer"] - 0.4)
+
+    # Statistics over the customer book mention premiums and policy types, but are not definition questions
+    if _CUSTOMER_AGGREGATE_PATTERN.search(query):
+        scores["customer"] += 0.9
+        scores["knowledge"] = max(0.0, scores["knowledge"] - 0.5)
+
+    # Definition-style questions about insurance terms are not customer lookups
+    if scores["knowledge"] >= 0.7 and not (has_email or has_customer_id or has_policy_id):
+        scores["customer"] = max(0.0, scores["customer"] - 0.2)
+
+    return {label: min(score, 1.0) for label, score in scores.items()}
+
+
+def classify_query_rules(
+    query: str,
+    threshold: float = DEFAULT_CONFIDENCE_THRESHOLD,
+    min_margin: float = DEFAULT_MIN_MARGIN,
+) -> Tuple[str, float]:
+    """
+    Deterministic pre-router. Returns (label, confidence) when the rules are confident,
+    otherwise ("", confidence) so that the caller can fall back to the LLM classifier.
+    """
+    if not query or not query.strip():
+        return "", 0.0
+
+    scores = score_query(query)
+    ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+    (best_label, best_score), (_, second_score) = ranked[0], ranked[1]
+
+    if best_score >= threshold and best_score - second_score >= min_margin:
+        return best_label, best_score
+    return "", best_score
+
+
+if __name__ == "__main__":
+    test_queries = [
+        "Find customer with email john@example.com",
+        "Show me qualified leads in Texas",
+        "What is comprehensive auto insurance?",
+        "Who is Alice Williams?",
+        "Are there any new leads interested in life insurance?",
+        "Explain different types of life insurance.",
+        "Tell me about CUST003's policies.",
+        "What is a premium?",
+        "What is the total premium by policy type?",
+        "How many qualified leads do we have per state?",
+        "Find leads with score above 80 interested in auto insurance.",
+        "Find customer John Doe and recommend insurance products based on his profile",
+        "Recommend products for non_existent@example.com",
+        "Can you tell me a joke?",
+        "Show me customer John Doe's current policies and recommend additional coverage options",
+        "Recommend coverage for John Doe",
+        "Suggest insurance for CUST003",
+        "Hello",
+    ]
+
+    for q in test_queries:
+        label, confidence = classify_query_rules(q)
+        print(f"{q!r:95} -> {label or 'LLM FALLBACK'} ({confidence:.2f})")
@@ -0,0 +1,277 @@
+# utils/intent_classifier.py
+import json
+import os
+import re
+import time
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from utils.fast_router import (
+    ROUTER_LABELS,
+    EMAIL_PATTERN,
+    CUSTOMER_ID_PATTERN,
+    POLICY_ID_PATTERN,
+    LEAD_ID_PATTERN,
+    PERSON_NAME_PATTERN,
+    normalize_router_label,
+)
+
+# Define paths (relative to the project root)
+MODEL_PATH = "models/intent_classifier.json"
+ROUTER_LOG_PATH = "data/router_decisions.jsonl"
+SEED_QUERIES_PATH = "data/router_seed_queries.json"
+
+_WORD_PATTERN = re.compile(r"__\w+__|[a-z0-9']+")
+_NUMBER_PATTERN = re.compile(r"\b\d+\b")
+
+
+def _abs_path(path: str) -> str:
+    """Resolves a project-relative path the same way tools/crm_tool.py does."""
+    if os.path.isabs(path):
+        return path
+    project_root = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+    return os.path.join(project_root, path)
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Turns a query into unigram + bigram features.
+    Entity values (emails, ids, numbers) are masked so that the model learns the shape of a query, not its values.
+    """
+    features = []
+    if PERSON_NAME_PATTERN.search(text):
+        features.append("__name__")
+
+    masked = EMAIL_PATTERN.sub(" __email__ ", text)
+    masked = CUSTOMER_ID_PATTERN.sub(" __customer_id__ ", masked)
+    masked = POLICY_ID_PATTERN.sub(" __policy_id__ ", masked)
+    masked = LEAD_ID_PATTERN.sub(" __lead_id__ ", masked)
+    masked = _NUMBER_PATTERN.sub(" __num__ ", masked)
+
+    words = _WORD_PATTERN.findall(masked.lower())
+    features.extend(words)
+    features.extend(f"{a} {b}" for a, b in zip(words, words[1:]))
+    return features
+
+
+class IntentClassifier:
+    """
+    TF-IDF + multinomial logistic regression over the router labels, implemented in plain NumPy.
+    Prediction for a single query only touches the weight rows of the tokens it contains.
+    """
+
+    def __init__(self, labels: Optional[List[str]] = None):
+        self.labels = list(labels or ROUTER_LABELS)
+        self.vocabulary: Dict[str, int] = {}
+        self.idf = np.zeros(0, dtype=np.float64)
+        self.weights = np.zeros((0, len(self.labels)), dtype=np.float64)
+        self.bias = np.zeros(len(self.labels), dtype=np.float64)
+
+    # --- Features ---
+    def _features(self, text: str) -> Tuple[np.ndarray, np.ndarray]:
+        """Returns (vocabulary indices, L2-normalised tf-idf values) for a single text."""
+        counts: Dict[int, int] = {}
+        for token in tokenize(text):
+            idx = self.vocabulary.get(token)
+            if idx is not None:
+                counts[idx] = counts.get(idx, 0) + 1
+        if not counts:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float64)
+
+        indices = np.fromiter(counts.keys(), dtype=np.int64, count=len(counts))
+        values = np.fromiter(counts.values(), dtype=np.float64, count=len(counts)) * self.idf[indices]
+        norm = np.linalg.norm(values)
+        if norm > 0:
+            values /= norm
+        return indices, values
+
+    def _matrix(self, texts: List[str]) -> np.ndarray:
+        X = np.zeros((len(texts), len(self.vocabulary)), dtype=np.float64)
+        for row, text in enumerate(texts):
+            indices, values = self._features(text)
+            X[row, indices] = values
+        return X
+
+    # --- Training ---
+    def fit(self, texts: List[str], labels: List[str], epochs: int = 400, learning_rate: float = 1.0,
+            l2: float = 1e-3, min_df: int = 1) -> "IntentClassifier":
+        """Fits the vocabulary, idf weights and the softmax regression with full-batch gradient descent."""
+        if not texts:
+            raise ValueError("Cannot train the intent classifier without examples.")
+
+        document_frequency: Dict[str, int] = {}
+        for text in texts:
+            for token in set(tokenize(text)):
+                document_frequency[token] = document_frequency.get(token, 0) + 1
+        kept = sorted(token for token, df in document_frequency.items() if df >= min_df)
+        self.vocabulary = {token: i for i, token in enumerate(kept)}
+
+        n_docs = len(texts)
+        df = np.array([document_frequency[token] for token in kept], dtype=np.float64)
+        self.idf = np.log((1.0 + n_docs) / (1.0 + df)) + 1.0
+
+        X = self._matrix(texts)
+        label_index = {label: i for i, label in enumerate(self.labels)}
+        y = np.array([label_index[label] for label in labels], dtype=np.int64)
+        Y = np.zeros((n_docs, len(self.labels)), dtype=np.float64)
+        Y[np.arange(n_docs), y] = 1.0
+
+        self.weights = np.zeros((X.shape[1], len(self.labels)), dtype=np.float64)
+        self.bias = np.zeros(len(self.labels), dtype=np.float64)
+        for _ in range(epochs):
+            probabilities = _softmax(X @ self.weights + self.bias)
+            gradient = (probabilities - Y) / n_docs
+            self.weights -= learning_rate * (X.T @ gradient + l2 * self.weights)
+            self.bias -= learning_rate * gradient.sum(axis=0)
+        return self
+
+    # --- Inference ---
+    def predict_proba(self, text: str) -> Dict[str, float]:
+        indices, values = self._features(text)
+        logits = self.bias + values @ self.weights[indices]
+        probabilities = _softmax(logits[np.newaxis, :])[0]
+        return {label: float(p) for label, p in zip(self.labels, probabilities)}
+
+    def predict(self, text: str, threshold: float = 0.0) -> Tuple[str, float]:
+        """Returns (label, probability); label is "" when the probability is below the threshold."""
+        probabilities = self.predict_proba(text)
+        label = max(probabilities, key=probabilities.get)
+        probability = probabilities[label]
+        return (label if probability >= threshold else ""), probability
+
+    # --- Serialization ---
+    def save(self, path: str = MODEL_PATH) -> None:
+        abs_path = _abs_path(path)
+        os.makedirs(os.path.dirname(abs_path), exist_ok=True)
+        with open(abs_path, "w", encoding="utf-8") as f:
+            json.dump({
+                "labels": self.labels,
+                "vocabulary": self.vocabulary,
+                "idf": self.idf.tolist(),
+                "weights": self.weights.tolist(),
+                "bias": self.bias.tolist(),
+            }, f)
+
+    @classmethod
+    def load(cls, path: str = MODEL_PATH) -> "IntentClassifier":
+        with open(_abs_path(path), "r", encoding="utf-8") as f:
+            data = json.load(f)
+        model = cls(data["labels"])
+        model.vocabulary = {token: int(i) for token, i in data["vocabulary"].items()}
+        model.idf = np.array(data["idf"], dtype=np.float64)
+        model.weights = np.array(data["weights"], dtype=np.float64).reshape(len(model.vocabulary), len(model.labels))
+        model.bias = np.array(data["bias"], dtype=np.float64)
+        return model
+
+
+def _softmax(logits: np.ndarray) -> np.ndarray:
+    shifted = logits - logits.max(axis=1, keepdims=True)
+    exp = np.exp(shifted)
+    return exp / exp.sum(axis=1, keepdims=True)
+
+
+# --- Router decision log (training data) ---
+def log_router_decision(query: str, route: str, path: str, latency_ms: float, log_path: str = ROUTER_LOG_PATH) -> None:
+    """Appends one (query, route) pair to the router decision log. Never raises."""
+    try:
+        abs_path = _abs_path(log_path)
+        os.makedirs(os.path.dirname(abs_path), exist_ok=True)
+        record = {
+            "query": query,
+            "route": normalize_router_label(route),
+            "path": path,
+            "latency_ms": round(latency_ms, 2),
+            "ts": time.time(),
+        }
+        with open(abs_path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+    except Exception as e:
+        print(f"⚠️ Warning: could not write router decision log: {e}")
+
+
+def load_logged_decisions(log_path: str = ROUTER_LOG_PATH, paths: Optional[List[str]] = None) -> List[Dict]:
+    """Reads logged router decisions, optionally keeping only those decided by the given paths."""
+    if not log_path:
+        return []
+    abs_path = _abs_path(log_path)
+    if not os.path.exists(abs_path):
+        return []
+    records = []
+    with open(abs_path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if paths is None or record.get("path") in paths:
+                records.append(record)
+    return records
+
+
+def load_training_examples(log_path: str = ROUTER_LOG_PATH, seed_path: str = SEED_QUERIES_PATH) -> Tuple[List[str], List[str]]:
+    """
+    Builds the training set from the labelled seed queries plus logged router decisions.
+    Logged labels win over seed labels for the same query; the latest log entry wins over older ones.
+    """
+    examples: Dict[str, str] = {}
+
+    abs_seed_path = _abs_path(seed_path)
+    if os.path.exists(abs_seed_path):
+        with open(abs_seed_path, "r", encoding="utf-8") as f:
+            for item in json.load(f):
+                examples[item["query"]] = normalize_router_label(item["route"])
+
+    for record in load_logged_decisions(log_path):
+        examples[record["query"]] = normalize_router_label(record["route"])
+
+    texts = list(examples.keys())
+    return texts, [examples[text] for text in texts]
+
+
+def train_intent_classifier(log_path: str = ROUTER_LOG_PATH, seed_path: str = SEED_QUERIES_PATH,
+                            model_path: str = MODEL_PATH) -> IntentClassifier:
+    texts, labels = load_training_examples(log_path, seed_path)
+    model = IntentClassifier().fit(texts, labels)
+    model.save(model_path)
+    print(f"--- Intent classifier trained on {len(texts)} examples ({len(model.vocabulary)} features), saved to {model_path} ---")
+    return model
+
+
+# --- Lazily loaded singleton used by the router ---
+_classifier_instance = None
+_classifier_load_attempted = False
+
+def get_intent_classifier(model_path: str = MODEL_PATH) -> Optional[IntentClassifier]:
+    """Returns the trained classifier, or None if no model has been trained yet."""
+    global _classifier_instance, _classifier_load_attempted
+    if not _classifier_load_attempted:
+        _classifier_load_attempted = True
+        try:
+            _classifier_instance = IntentClassifier.load(model_path)
+            print(f"Intent classifier loaded from '{model_path}'.")
+        except FileNotFoundError:
+            print(f"Intent classifier not found at '{model_path}'. Run 'python -m utils.intent_classifier' to train it.")
+        except Exception as e:
+            print(f"⚠️ Warning: could not load intent classifier: {e}")
+    return _classifier_instance
+
+
+if __name__ == "__main__":
+    model = train_intent_classifier()
+
+    print("\n--- Sample predictions ---")
+    for q in [
+        "Find customer with email mary@example.com",
+        "Show me qualified leads in Florida",
+        "What is whole life insurance?",
+        "Recommend products for CUST004",
+        "Hi there",
+    ]:
+        start = time.perf_counter()
+        label, probability = model.predict(q)
+        elapsed_us = (time.perf_counter() - start) * 1e6
+        print(f"{q!r:50} -> {label} ({probability:.2f}) in {elapsed_us:.0f}µs")
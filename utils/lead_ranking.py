@@ -0,0 +1,154 @@
+# utils/lead_ranking.py
+"""
+Campaign lead ranking over the whole lead store.
+
+Leads are held as column arrays (score, area, status, source, interest, status age), built once per CRM
+reload through CRMStore.derived. A ranking request filters and scores every lead with NumPy operations and
+selects the top-k with np.argpartition (O(n)), then sorts only those k. The composite score is
+
+    campaign_score = 0.45 * score/100 + 0.30 * interest match + 0.15 * source quality + 0.10 * status recency
+
+where status recency is the status weight, decayed with a 30-day half-life when the lead has a
+"status_updated" (or "last_contacted") ISO date. Lost leads are left out unless asked for.
+"""
+import csv
+import math
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from tools.crm_store import get_crm_store
+
+WEIGHTS = {"score": 0.45, "interest": 0.30, "source": 0.15, "status": 0.10}
+SOURCE_QUALITY = {"referral": 1.0, "partnership": 0.9, "website form": 0.7, "event": 0.6, "cold call": 0.4}
+DEFAULT_SOURCE_QUALITY = 0.5
+STATUS_WEIGHT = {"qualified": 1.0, "new": 0.8, "contacted": 0.6, "lost": 0.0}
+DEFAULT_STATUS_WEIGHT = 0.5
+RECENCY_HALF_LIFE_DAYS = 30.0
+STATUS_DATE_FIELDS = ("status_updated", "last_contacted")
+EXPORT_FIELDS = ["rank", "id", "name", "campaign_score", "score", "interest", "area", "status", "source", "email", "phone"]
+
+
+def _encode(values: Iterable[str], count: int) -> Tuple[np.ndarray, List[str]]:
+    """Dictionary-encodes case-folded strings: (int32 codes, vocabulary)."""
+    vocabulary: Dict[str, int] = {}
+    codes = np.fromiter((vocabulary.setdefault(v, len(vocabulary)) for v in values), dtype=np.int32, count=count)
+    return codes, list(vocabulary)
+
+
+def _status_timestamps(leads: List[Dict[str, Any]]) -> np.ndarray:
+    """Epoch seconds of each lead's last status change, NaN when the lead has no date."""
+    parsed: Dict[str, float] = {}
+
+    def timestamp(lead: Dict[str, Any]) -> float:
+        raw = next((lead[f] for f in STATUS_DATE_FIELDS if lead.get(f)), None)
+        if raw is None:
+            return math.nan
+        raw = str(raw)
+        if raw not in parsed:
+            try:
+                moment = datetime.fromisoformat(raw.replace("Z", "+00:00"))
+                if moment.tzinfo is None:
+                    moment = moment.replace(tzinfo=timezone.utc)
+                parsed[raw] = moment.timestamp()
+            except ValueError:
+                parsed[raw] = math.nan
+        return parsed[raw]
+
+    return np.fromiter((timestamp(lead) for lead in leads), dtype=np.float64, count=len(leads))
+
+
+class LeadColumns:
+    """Column arrays over the lead store (the records themselves are shared, never copied or mutated)."""
+
+    def __init__(self, leads: List[Dict[str, Any]]):
+        n = len(leads)
+        self.leads = leads
+        self.score = np.fromiter((float(lead.get("score") or 0) for lead in leads), dtype=np.float32, count=n)
+        self.area_codes, self.areas = _encode((str(lead.get("area", "")).casefold() for lead in leads), n)
+        self.status_codes, self.statuses = _encode((str(lead.get("status", "")).casefold() for lead in leads), n)
+        self.source_codes, self.sources = _encode((str(lead.get("source", "")).casefold() for lead in leads), n)
+        self.interest_codes, self.interests = _encode((str(lead.get("interest", "")).casefold() for lead in leads), n)
+        self.status_time = _status_timestamps(leads)
+        self.source_quality = np.array([SOURCE_QUALITY.get(s, DEFAULT_SOURCE_QUALITY) for s in self.sources], dtype=np.float32)
+        self.status_weight = np.array([STATUS_WEIGHT.get(s, DEFAULT_STATUS_WEIGHT) for s in self.statuses], dtype=np.float32)
+
+    def codes_of(self, vocabulary: List[str], wanted: Sequence[str]) -> np.ndarray:
+        index = {value: i for i, value in enumerate(vocabulary)}
+        return np.array([index[w.casefold()] for w in wanted if w.casefold() in index], dtype=np.int32)
+
+
+def get_lead_columns() -> LeadColumns:
+    """The column arrays of the current lead data (rebuilt only when the CRM files change)."""
+    return get_crm_store().derived("lead_columns", lambda customers, leads: LeadColumns(leads))
+
+
+def campaign_scores(columns: LeadColumns, interest: Optional[str] = None, now: Optional[float] = None) -> np.ndarray:
+    """(n,) float32 composite scores of every lead for a campaign on `interest` (e.g. "life")."""
+    if interest:
+        keyword = interest.casefold()
+        interest_table = np.array([keyword in value for value in columns.interests], dtype=np.float32)
+    else:
+        interest_table = np.zeros(len(columns.interests), dtype=np.float32)
+    now = datetime.now(timezone.utc).timestamp() if now is None else now
+    age_days = np.maximum(0.0, (now - columns.status_time) / 86400.0)
+    recency = np.where(np.isnan(age_days), 1.0, 0.5 ** (age_days / RECENCY_HALF_LIFE_DAYS)).astype(np.float32)
+
+    return (WEIGHTS["score"] * np.clip(columns.score / 100.0, 0.0, 1.0)
+            + WEIGHTS["interest"] * interest_table[columns.interest_codes]
+            + WEIGHTS["source"] * columns.source_quality[columns.source_codes]
+            + WEIGHTS["status"] * columns.status_weight[columns.status_codes] * recency)
+
+
+def rank_leads(interest: Optional[str] = None, areas: Optional[Sequence[str]] = None,
+               statuses: Optional[Sequence[str]] = None, score_min: Optional[float] = None, top_k: int = 50,
+               include_lost: bool = False, now: Optional[float] = None) -> Tuple[List[Dict[str, Any]], int]:
+    """
+    (top_k leads with their "campaign_score", best first; number of leads that passed the filters).
+    areas / statuses filter case-insensitively; interest only affects the score, it does not filter.
+    """
+    columns = get_lead_columns()
+    mask = np.ones(len(columns.score), dtype=bool)
+    if areas:
+        mask &= np.isin(columns.area_codes, columns.codes_of(columns.areas, areas))
+    if statuses:
+        mask &= np.isin(columns.status_codes, columns.codes_of(columns.statuses, statuses))
+    elif not include_lost:
+        mask &= ~np.isin(columns.status_codes, columns.codes_of(columns.statuses, ["lost"]))
+    if score_min is not None:
+        mask &= columns.score >= score_min
+
+    candidates = np.flatnonzero(mask)
+    scores = campaign_scores(columns, interest, now)
+    candidate_scores = scores[candidates]
+    k = max(0, min(top_k, len(candidates)))
+    if k < len(candidates):
+        # O(n) selection of the k best; only those k get sorted
+        keep = np.argpartition(-candidate_scores, k - 1)[:k] if k else np.array([], dtype=np.int64)
+        candidates, candidate_scores = candidates[keep], candidate_scores[keep]
+    # Best composite first, ties broken by the raw lead score
+    order = np.lexsort((-columns.score[candidates], -candidate_scores))
+
+    ranked = []
+    for i in order:
+        lead = dict(columns.leads[int(candidates[i])])
+        lead["campaign_score"] = round(float(candidate_scores[i]), 4)
+        ranked.append(lead)
+    return ranked, int(mask.sum())
+
+
+def export_ranked_leads(output_path: str, **criteria) -> int:
+    """Writes rank_leads(**criteria) to a CSV file; returns the number of leads written."""
+    ranked, _ = rank_leads(**criteria)
+    with open(output_path, "w", encoding="utf-8", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=EXPORT_FIELDS, extrasaction="ignore")
+        writer.writeheader()
+        for rank, lead in enumerate(ranked, start=1):
+            writer.writerow({**lead, "rank": rank})
+    return len(ranked)
+
+
+if __name__ == "__main__":
+    for lead in rank_leads(interest="life", areas=["Texas", "California"], top_k=5)[0]:
+        print(f"{lead['campaign_score']:.3f}  {lead['id']}  {lead['name']:<15} {lead['interest']:<32} {lead['area']:<12} {lead['status']}")
@@ -0,0 +1,253 @@
+# utils/llm_factory.py
+import asyncio
+import time
+from typing import Any, AsyncIterator, Callable, Iterator, List, Optional
+
+from langchain_core.outputs import ChatGenerationChunk, ChatResult
+from langchain_google_genai import ChatGoogleGenerativeAI, GoogleGenerativeAIEmbeddings
+
+from config import (
+    GOOGLE_API_KEY, GEMINI_MODEL_NAME,
+    LLM_MAX_RETRIES, LLM_BACKOFF_BASE_SECONDS, LLM_BACKOFF_MAX_SECONDS, CIRCUIT_BREAKER_ENABLED,
+)
+from utils.circuit_breaker import get_llm_circuit_breaker
+from utils.conversation_memory import estimate_tokens
+from utils.deadline import DeadlineExceeded, call_time_left
+from utils.errors import is_rate_limit_error, is_transient_error, retry_after_seconds
+from utils.rate_limiter import backoff_delay, get_llm_rate_limiter
+
+# Room for the reply when estimating a call's token cost up front (corrected with the reported usage afterwards)
+_OUTPUT_TOKEN_ESTIMATE = 256
+# Texts per embedding request; each batch is one request against the limiter
+_EMBEDDING_BATCH_SIZE = 100
+
+
+def _estimate_prompt_tokens(messages) -> int:
+    return sum(estimate_tokens(str(message.content)) for message in messages) + _OUTPUT_TOKEN_ESTIMATE
+
+
+def _retry_delay(error: Exception, attempt: int) -> Optional[float]:
+    """
+    Seconds to wait before retry n, or None when the error is permanent, the retries are used up, or the retry
+    would start after the deadline of the calling node (its caller has stopped waiting for the result).
+    """
+    if not is_transient_error(error) or attempt > LLM_MAX_RETRIES:
+        return None
+    retry_after = retry_after_seconds(error)
+    delay = backoff_delay(attempt, LLM_BACKOFF_BASE_SECONDS, LLM_BACKOFF_MAX_SECONDS, retry_after)
+    time_left = call_time_left()
+    if time_left is not None and time_left <= delay:
+        print(f"⚠️ Gemini call failed ({str(error)[:120]}). Not retrying: the call's deadline passes before the retry.")
+        return None
+    if is_rate_limit_error(error):
+        # Quota is shared: hold every caller back, not just this one
+        get_llm_rate_limiter().pause(retry_after if retry_after is not None else delay)
+    print(f"⚠️ Gemini call failed ({str(error)[:120]}). Retry {attempt}/{LLM_MAX_RETRIES} in {delay:.1f}s...")
+    return delay
+
+
+def _usage_tokens(message) -> int:
+    usage = getattr(message, "usage_metadata", None) or {}
+    return int(usage.get("total_tokens") or 0)
+
+
+class _BreakerCall:
+    """
+    One model call as seen by the circuit breaker: admitted on creation (CircuitOpenError while the breaker is
+    open) and recorded exactly once, with its latency measured from started() (after the rate-limiter wait).
+    """
+
+    def __init__(self):
+        self.breaker = get_llm_circuit_breaker() if CIRCUIT_BREAKER_ENABLED else None
+        if self.breaker is not None:
+            self.breaker.before_call()
+        self.start = time.monotonic()
+        self._recorded = False
+
+    def started(self) -> None:
+        self.start = time.monotonic()
+
+    def finish(self, error: Optional[BaseException] = None) -> None:
+        if self._recorded or self.breaker is None:
+            return
+        self._recorded = True
+        latency = time.monotonic() - self.start
+        if error is not None and (not isinstance(error, Exception) or isinstance(error, DeadlineExceeded)):
+            # Cancelled (deadline) or closed (generator abandoned) by the caller
+            self.breaker.record_cancelled(latency)
+        else:
+            # Only provider-side trouble counts against the model; a bad request is the caller's fault
+            self.breaker.record(latency, failed=error is not None and is_transient_error(error))
+
+
+def _governed_call(func: Callable[[], Any], estimated_tokens: int) -> Any:
+    attempt = 0
+    while True:
+        call = _BreakerCall()
+        try:
+            get_llm_rate_limiter().acquire(tokens=estimated_tokens)
+            time_left = call_time_left()
+            if time_left is not None and time_left <= 0:
+                # Abandoned by its caller while waiting for quota: do not spend a request on it
+                raise DeadlineExceeded("call deadline passed before the model call")
+            call.started()
+            result = func()
+        except BaseException as e:
+            call.finish(e)
+            if not isinstance(e, Exception):
+                raise
+            attempt += 1
+            delay = _retry_delay(e, attempt)
+            if delay is None:
+                raise
+            time.sleep(delay)
+            continue
+        call.finish()
+        return result
+
+async def _agoverned_call(func: Callable[[], Any], estimated_tokens: int) -> Any:
+    attempt = 0
+    while True:
+        call = _BreakerCall()
+        try:
+            await get_llm_rate_limiter().aacquire(tokens=estimated_tokens)
+            call.started()
+            result = await func()
+        except BaseException as e:
+            call.finish(e)
+            if not isinstance(e, Exception):
+                raise
+            attempt += 1
+            delay = _retry_delay(e, attempt)
+            if delay is None:
+                raise
+            await asyncio.sleep(delay)
+            continue
+        call.finish()
+        return result
+
+
+class GovernedChatModel(ChatGoogleGenerativeAI):
+    """
+    Gemini chat model whose calls pass the circuit breaker and the process-wide RPM/TPM limiter (in the
+    caller's priority class) and retry transient failures with jittered exponential backoff, honoring the
+    provider's retry-after hints. A stream is only retried if it failed before its first chunk.
+    """
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        estimated = _estimate_prompt_tokens(messages)
+        result = _governed_call(lambda: ChatGoogleGenerativeAI._generate(self, messages, stop, run_manager, **kwargs), estimated)
+        get_llm_rate_limiter().record_usage(estimated, _usage_tokens(result.generations[0].message) if result.generations else 0)
+        return result
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        estimated = _estimate_prompt_tokens(messages)
+        result = await _agoverned_call(lambda: ChatGoogleGenerativeAI._agenerate(self, messages, stop, run_manager, **kwargs), estimated)
+        get_llm_rate_limiter().record_usage(estimated, _usage_tokens(result.generations[0].message) if result.generations else 0)
+        return result
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs) -> Iterator[ChatGenerationChunk]:
+        estimated = _estimate_prompt_tokens(messages)
+        attempt = 0
+        while True:
+            call = _BreakerCall()
+            used_tokens = 0
+            started = False
+            try:
+                get_llm_rate_limiter().acquire(tokens=estimated)
+                call.started()
+                for chunk in ChatGoogleGenerativeAI._stream(self, messages, stop, run_manager, **kwargs):
+                    # For the breaker a stream's latency is its time to first chunk
+                    call.finish()
+                    started = True
+                    used_tokens = max(used_tokens, _usage_tokens(chunk.message))
+                    yield chunk
+                call.finish()
+                get_llm_rate_limiter().record_usage(estimated, used_tokens)
+                return
+            except BaseException as e:
+                call.finish(e)
+                if not isinstance(e, Exception):
+                    raise
+                attempt += 1
+                delay = None if started else _retry_delay(e, attempt)
+                if delay is None:
+                    raise
+                time.sleep(delay)
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs) -> AsyncIterator[ChatGenerationChunk]:
+        estimated = _estimate_prompt_tokens(messages)
+        attempt = 0
+        while True:
+            call = _BreakerCall()
+            used_tokens = 0
+            started = False
+            try:
+                await get_llm_rate_limiter().aacquire(tokens=estimated)
+                call.started()
+                async for chunk in ChatGoogleGenerativeAI._astream(self, messages, stop, run_manager, **kwargs):
+                    call.finish()
+                    started = True
+                    used_tokens = max(used_tokens, _usage_tokens(chunk.message))
+                    yield chunk
+                call.finish()
+                get_llm_rate_limiter().record_usage(estimated, used_tokens)
+                return
+            except BaseException as e:
+                call.finish(e)
+                if not isinstance(e, Exception):
+                    raise
+                attempt += 1
+                delay = None if started else _retry_delay(e, attempt)
+                if delay is None:
+                    raise
+                await asyncio.sleep(delay)
+
+
+class GovernedEmbeddings(GoogleGenerativeAIEmbeddings):
+    """Gemini embeddings under the same breaker, limiter and retry policy; documents are embedded (and limited) per batch."""
+
+    def embed_documents(self, texts: List[str], **kwargs) -> List[List[float]]:
+        vectors: List[List[float]] = []
+        for start in range(0, len(texts), _EMBEDDING_BATCH_SIZE):
+            batch = texts[start:start + _EMBEDDING_BATCH_SIZE]
+            vectors.extend(_governed_call(
+                lambda: GoogleGenerativeAIEmbeddings.embed_documents(self, batch, **kwargs),
+                sum(estimate_tokens(text) for text in batch),
+            ))
+        return vectors
+
+    def embed_query(self, text: str, **kwargs) -> List[float]:
+        return _governed_call(lambda: GoogleGenerativeAIEmbeddings.embed_query(self, text, **kwargs), estimate_tokens(text))
+
+    async def aembed_documents(self, texts: List[str], **kwargs) -> List[List[float]]:
+        vectors: List[List[float]] = []
+        for start in range(0, len(texts), _EMBEDDING_BATCH_SIZE):
+            batch = texts[start:start + _EMBEDDING_BATCH_SIZE]
+            vectors.extend(await _agoverned_call(
+                lambda: GoogleGenerativeAIEmbeddings.aembed_documents(self, batch, **kwargs),
+                sum(estimate_tokens(text) for text in batch),
+            ))
+        return vectors
+
+    async def aembed_query(self, text: str, **kwargs) -> List[float]:
+        return await _agoverned_call(lambda: GoogleGenerativeAIEmbeddings.aembed_query(self, text, **kwargs), estimate_tokens(text))
+
+
+def create_chat_llm(temperature: float = 0.0) -> ChatGoogleGenerativeAI:
+    """
+    Creates the Gemini chat model used by every agent, tool and orchestrator step.
+    All instances share the process-wide LLM rate limiter and retry policy.
+    """
+    return GovernedChatModel(
+        model=GEMINI_MODEL_NAME,
+        google_api_key=GOOGLE_API_KEY,
+        temperature=temperature,
+        # Retries are done by GovernedChatModel, which coordinates them with the shared limiter
+        max_retries=1,
+    )
+
+
+def create_embeddings() -> GoogleGenerativeAIEmbeddings:
+    """Creates the Gemini embedding model used for ingestion and retrieval (shared limiter and retry policy)."""
+    return GovernedEmbeddings(model="models/embedding-001", google_api_key=GOOGLE_API_KEY)
@@ -0,0 +1,158 @@
+# utils/local_fallbacks.py
+"""
+Answers built from local data only, used while the Gemini circuit breaker is open (utils/circuit_breaker.py):
+direct CRM lookups with templated output, a regex parser for lead search criteria, extractive answers from the
+markdown knowledge base, and the product lines the rule-based recommendation tool needs.
+"""
+import json
+import os
+import re
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+from tools.crm_store import get_crm_store
+from utils.entity_extractor import resolve_customer
+from utils.result_renderer import render_customer, render_leads
+
+KB_PATH = "data/insurance_kb.md"
+LOCAL_ANSWER_BANNER = "⚠️ *Answered from local data (the AI service is currently unavailable).*"
+
+_SCORE_PATTERN = re.compile(r"\bscores?\s*(?:of\s*)?(?:above|over|greater than|more than|at least|>=|>)\s*(\d+)", re.IGNORECASE)
+_STATUS_PATTERN = re.compile(r"\b(new|contacted|qualified|lost)\b", re.IGNORECASE)
+_INTEREST_PATTERN = re.compile(r"\b(auto|car|home|house|life|health|travel)\b", re.IGNORECASE)
+_NAMED_PATTERN = re.compile(r"\b(?:named|called)\s+([A-Za-z]+)", re.IGNORECASE)
+_INTEREST_ALIASES = {"car": "auto", "house": "home"}
+_WORD_PATTERN = re.compile(r"[a-z0-9]+")
+# Words too common to tell knowledge base passages apart
+_STOPWORDS = {
+    "a", "an", "the", "is", "are", "what", "which", "how", "do", "does", "i", "my", "me", "you", "your", "of", "to",
+    "in", "on", "for", "and", "or", "it", "can", "about", "tell", "explain", "need", "there", "any", "insurance", "q",
+}
+
+
+def _abs_path(path: str) -> str:
+    project_root = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+    return os.path.join(project_root, path)
+
+
+# --- Customers ---
+def local_customer_answer(query: str, record: Optional[Dict[str, Any]] = None) -> Tuple[str, Dict[str, Any]]:
+    """(templated answer, customer record or {}) for a customer query, without the LLM."""
+    record = record or resolve_customer(query)
+    if not record:
+        return "Customer not found in the CRM. Please give their email, customer id (e.g. CUST001) or full name.", {}
+    return render_customer(record), record
+
+
+# --- Leads ---
+def parse_lead_criteria(query: str, consumed: Optional[List[Tuple[int, int]]] = None) -> Dict[str, Any]:
+    """
+    search_leads criteria read from the query with regexes: score_min, status, interest, area, name.
+    The character spans the criteria were read from are appended to `consumed`, when given.
+    """
+    criteria: Dict[str, Any] = {}
+    spans = consumed if consumed is not None else []
+    score = _SCORE_PATTERN.search(query)
+    if score:
+        criteria["score_min"] = int(score.group(1))
+        spans.append(score.span())
+    status = _STATUS_PATTERN.search(query)
+    if status:
+        criteria["status"] = status.group(1).capitalize()
+        spans.append(status.span())
+    interest = _INTEREST_PATTERN.search(query)
+    if interest:
+        keyword = interest.group(1).lower()
+        criteria["interest"] = _INTEREST_ALIASES.get(keyword, keyword)
+        spans.append(interest.span())
+    lowered = query.lower()
+    # Areas are whatever the lead data uses ("Texas", "California", ...)
+    areas = get_crm_store().derived("lead_areas", lambda customers, leads: sorted(
+        {lead.get("area", "") for lead in leads if lead.get("area")}, key=len, reverse=True))
+    for area in areas:
+        position = lowered.find(area.lower())
+        if position >= 0:
+            criteria["area"] = area
+            spans.append((position, position + len(area)))
+            break
+    named = _NAMED_PATTERN.search(query)
+    if named:
+        criteria["name"] = named.group(1)
+        spans.append(named.span())
+    return criteria
+
+
+def local_lead_answer(query: str) -> str:
+    from tools.crm_tool import search_leads
+    criteria = parse_lead_criteria(query)
+    return render_leads(search_leads.invoke(json.dumps(criteria)), criteria)
+
+
+# --- Knowledge base ---
+_kb_passages: Optional[List[Dict[str, Any]]] = None
+_kb_lock = threading.Lock()
+
+def _terms(text: str) -> set:
+    return {word for word in _WORD_PATTERN.findall(text.lower()) if word not in _STOPWORDS}
+
+def _parse_kb(markdown: str) -> List[Dict[str, Any]]:
+    """Splits the knowledge base into passages: one per FAQ question/answer pair and one per "##" section."""
+    passages = []
+    for question, answer in re.findall(r"\*\*Q:\s*(.+?)\*\*\s*\nA:\s*(.+?)(?=\n\s*\n|\Z)", markdown, re.DOTALL):
+        question = question.strip().strip('"')
+        passages.append({"title": question, "text": answer.strip(), "title_terms": _terms(question), "terms": _terms(answer)})
+    for section in re.split(r"\n(?=## )", markdown):
+        if not section.startswith("## ") or section.startswith("## FAQ"):
+            continue
+        title, _, body = section.partition("\n")
+        title = title.lstrip("# ").strip()
+        passages.append({"title": title, "text": body.strip(), "title_terms": _terms(title), "terms": _terms(body)})
+    return passages
+
+def _kb() -> List[Dict[str, Any]]:
+    global _kb_passages
+    if _kb_passages is None:
+        with _kb_lock:
+            if _kb_passages is None:
+                try:
+                    with open(_abs_path(KB_PATH), "r", encoding="utf-8") as f:
+                        _kb_passages = _parse_kb(f.read())
+                except OSError as e:
+                    print(f"⚠️ Could not read the knowledge base for local answers: {e}")
+                    _kb_passages = []
+    return _kb_passages
+
+
+def extractive_kb_answer(query: str, banner: bool = True) -> str:
+    """The knowledge base passage sharing the most terms with the query (title matches count double)."""
+    query_terms = _terms(query)
+    best, best_score = None, 0.0
+    for passage in _kb():
+        score = 2.0 * len(query_terms & passage["title_terms"]) + len(query_terms & passage["terms"])
+        if score > best_score:
+            best, best_score = passage, score
+    if best is None:
+        answer = f"No matching entry in the local knowledge base. Available topics: {kb_product_lines()}."
+    else:
+        answer = f"**{best['title']}**\n\n{best['text']}"
+    return f"{LOCAL_ANSWER_BANNER}\n\n{answer}" if banner else answer
+
+
+def kb_product_lines() -> str:
+    """Product lines named in the knowledge base section titles, e.g. "Auto Insurance, Health Insurance"."""
+    products = []
+    for passage in _kb():
+        match = re.search(r"\(([^)]*Insurance)\)", passage["title"])
+        if match and match.group(1) not in products:
+            products.append(match.group(1))
+    return ", ".join(products)
+
+
+if __name__ == "__main__":
+    for query in ["Find customer with email john@example.com", "Tell me about CUST003's policies", "Who is Jane Doe?"]:
+        print(f"\n> {query}\n{local_customer_answer(query)[0]}")
+    for query in ["Show me qualified leads in Texas", "Find leads with score above 80 interested in auto insurance"]:
+        print(f"\n> {query}\n{parse_lead_criteria(query)}\n{local_lead_answer(query)}")
+    for query in ["What is a premium?", "Explain comprehensive coverage", "What does health insurance cover?"]:
+        print(f"\n> {query}\n{extractive_kb_answer(query)}")
+    print(f"\nProduct lines: {kb_product_lines()}")
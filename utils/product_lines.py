@@ -0,0 +1,54 @@
+# utils/product_lines.py
+"""
+Product lines of knowledge base chunks and of queries, for partitioned knowledge base search.
+
+At ingestion every "## " section of the knowledge base is tagged with the product line its heading names
+("## Bảo hiểm Ô tô (Auto Insurance)" -> "auto"); sections naming none (introduction, FAQ) are "general".
+At query time the product lines are read from the query with the same keyword table, and the vector search is
+restricted to those partitions plus "general" with a Chroma metadata filter. A query naming no product line, or
+a knowledge base ingested before the tagging, searches everything.
+"""
+import re
+from typing import Any, Dict, List, Optional
+
+GENERAL = "general"
+# Words naming a product line, in the knowledge base headings or in questions (English and Vietnamese)
+PRODUCT_LINE_KEYWORDS = {
+    "auto": ["auto", "car", "cars", "vehicle", "vehicles", "driver", "drivers", "driving", "collision",
+             "comprehensive", "motorist", "ô tô"],
+    "health": ["health", "medical", "hospital", "doctor", "prescription", "hmo", "ppo", "y tế"],
+    "life": ["life", "beneficiary", "beneficiaries", "death benefit", "nhân thọ"],
+    "home": ["home", "house", "homeowner", "homeowners", "renters", "dwelling", "nhà ở"],
+    "travel": ["travel", "trip", "trips", "du lịch"],
+}
+_PATTERNS = {
+    line: re.compile(r"\b(?:" + "|".join(re.escape(keyword) for keyword in keywords) + r")\b", re.IGNORECASE)
+    for line, keywords in PRODUCT_LINE_KEYWORDS.items()
+}
+
+
+def infer_product_lines(text: str) -> List[str]:
+    """The product lines the text names, in PRODUCT_LINE_KEYWORDS order."""
+    return [line for line, pattern in _PATTERNS.items() if pattern.search(text or "")]
+
+
+def product_line_of_heading(heading: str) -> str:
+    """The product line of a knowledge base section: the one its heading names, else GENERAL."""
+    lines = infer_product_lines(heading)
+    return lines[0] if len(lines) == 1 else GENERAL
+
+
+def product_line_filter(query: str) -> Optional[Dict[str, Any]]:
+    """Chroma metadata filter for the partitions the query targets, or None to search everything."""
+    lines = infer_product_lines(query)
+    if not lines:
+        return None
+    return {"product_line": {"$in": lines + [GENERAL]}}
+
+
+if __name__ == "__main__":
+    for heading in ["Bảo hiểm Ô tô (Auto Insurance)", "Bảo hiểm Nhân thọ (Life Insurance)", "FAQ:"]:
+        print(f"{heading!r}: {product_line_of_heading(heading)}")
+    for query in ["Explain comprehensive coverage", "What is term life insurance?", "What is a premium?",
+                  "Car or home insurance first?"]:
+        print(f"{query!r}: {product_line_filter(query)}")
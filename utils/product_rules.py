@@ -0,0 +1,223 @@
+# utils/product_rules.py
+"""
+Product lines and their eligibility rules, declared in data/product_rules.json and compiled once.
+
+Each product has a name, a reason (shown with the recommendation), kb_keywords (the product is only offered when
+the knowledge base text mentions one of them; default: its name) and a "when" object whose conditions must all hold:
+    held_all / held_any / not_held  - lists of policy types the customer holds (any policy status)
+    address_present                 - true/false
+    history_keywords                - the customer history mentions at least one of them (case-insensitive)
+    history_excludes                - the customer history mentions none of them
+    min_total_premium / max_total_premium - bounds on the summed premium of the customer's policies
+
+Policy types become bits of one integer mask, so the held/not-held conditions are mask tests, and a customer
+record is read in a single pass (CustomerFacts). The same rules are available as NumPy vectors for the
+book-wide batch engine (cross_sell_batch.py).
+"""
+import json
+import os
+import re
+import threading
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+PRODUCT_RULES_PATH = "data/product_rules.json"
+
+_CONDITIONS = {
+    "held_all", "held_any", "not_held", "address_present", "history_keywords", "history_excludes",
+    "min_total_premium", "max_total_premium",
+}
+# Policy types share one uint32 mask in the batch engine
+_MAX_POLICY_TYPES = 32
+# KB texts whose product scan is remembered (the workflow passes the same catalog text again and again)
+_KB_SCAN_CACHE_SIZE = 32
+
+
+def _abs_path(path: str) -> str:
+    if os.path.isabs(path):
+        return path
+    project_root = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+    return os.path.join(project_root, path)
+
+
+def _keyword_pattern(keywords: List[str]) -> Optional[re.Pattern]:
+    if not keywords:
+        return None
+    return re.compile("|".join(re.escape(keyword) for keyword in keywords), re.IGNORECASE)
+
+
+class CustomerFacts:
+    """What the rules look at, read from a customer record in one pass."""
+    __slots__ = ("held_mask", "held_types", "total_premium", "has_address", "history")
+
+    def __init__(self, held_mask: int, held_types: List[str], total_premium: float, has_address: bool, history: str):
+        self.held_mask = held_mask
+        self.held_types = held_types
+        self.total_premium = total_premium
+        self.has_address = has_address
+        self.history = history
+
+
+class ProductRule:
+    """One product's compiled conditions."""
+    __slots__ = ("name", "reason", "index", "held_all", "held_any", "not_held", "address_present",
+                 "history_keywords", "history_excludes", "min_total_premium", "max_total_premium")
+
+    def __init__(self, name: str, reason: str, index: int, bits: Dict[str, int], when: Dict[str, Any]):
+        unknown = set(when) - _CONDITIONS
+        if unknown:
+            raise ValueError(f"Unknown condition(s) for product '{name}': {', '.join(sorted(unknown))}")
+        self.name = name
+        self.reason = reason
+        self.index = index
+        self.held_all = sum(bits[t] for t in when.get("held_all", []))
+        self.held_any = sum(bits[t] for t in when.get("held_any", []))
+        self.not_held = sum(bits[t] for t in when.get("not_held", []))
+        self.address_present = when.get("address_present")
+        self.history_keywords = _keyword_pattern(when.get("history_keywords", []))
+        self.history_excludes = _keyword_pattern(when.get("history_excludes", []))
+        self.min_total_premium = when.get("min_total_premium")
+        self.max_total_premium = when.get("max_total_premium")
+
+    def history_ok(self, history: str) -> bool:
+        if self.history_keywords is not None and not self.history_keywords.search(history):
+            return False
+        return self.history_excludes is None or not self.history_excludes.search(history)
+
+    def matches(self, facts: CustomerFacts) -> bool:
+        mask = facts.held_mask
+        if mask & self.held_all != self.held_all or mask & self.not_held:
+            return False
+        if self.held_any and not mask & self.held_any:
+            return False
+        if self.address_present is not None and facts.has_address != self.address_present:
+            return False
+        if self.min_total_premium is not None and facts.total_premium < self.min_total_premium:
+            return False
+        if self.max_total_premium is not None and facts.total_premium > self.max_total_premium:
+            return False
+        return self.history_ok(facts.history)
+
+
+class ProductCatalog:
+    """The compiled rules file: scalar evaluation for one customer, vector evaluation for a whole book."""
+
+    def __init__(self, config: Dict[str, Any]):
+        self.version = str(config.get("version", ""))
+        self.fallback: List[str] = list(config.get("fallback", []))
+        products = config.get("products", [])
+
+        # Bits for the product lines first (bit i = product i), then any other policy type a rule mentions
+        policy_types = [product["name"] for product in products]
+        for product in products:
+            for condition in ("held_all", "held_any", "not_held"):
+                for policy_type in product.get("when", {}).get(condition, []):
+                    if policy_type not in policy_types:
+                        policy_types.append(policy_type)
+        if len(policy_types) > _MAX_POLICY_TYPES:
+            raise ValueError(f"At most {_MAX_POLICY_TYPES} policy types are supported, the rules name {len(policy_types)}")
+        self.policy_types = policy_types
+        self.bits = {policy_type: 1 << i for i, policy_type in enumerate(policy_types)}
+
+        self.rules = [
+            ProductRule(product["name"], product.get("reason", ""), i, self.bits, product.get("when", {}))
+            for i, product in enumerate(products)
+        ]
+        self.product_names = [rule.name for rule in self.rules]
+        self.reasons = {rule.name: rule.reason for rule in self.rules}
+        # One pattern for every product's KB keywords; the group name says which product matched
+        alternatives = [
+            f"(?P<p{rule.index}>{'|'.join(re.escape(k) for k in product.get('kb_keywords', [rule.name]))})"
+            for rule, product in zip(self.rules, products)
+        ]
+        self._kb_pattern = re.compile("|".join(alternatives), re.IGNORECASE) if alternatives else None
+        self._kb_scans: Dict[str, int] = {}
+        self._kb_lock = threading.Lock()
+
+    # --- One customer ---
+    def facts(self, customer: Dict[str, Any]) -> CustomerFacts:
+        held_mask, held_types, total_premium = 0, [], 0.0
+        for policy in customer.get("policies", []):
+            policy_type = policy.get("type", "")
+            held_types.append(policy_type)
+            held_mask |= self.bits.get(policy_type, 0)
+            try:
+                total_premium += float(policy.get("premium") or 0)
+            except (TypeError, ValueError):
+                pass
+        return CustomerFacts(held_mask, held_types, total_premium, bool(customer.get("address")), customer.get("history") or "")
+
+    def products_in_kb(self, kb_text: str) -> int:
+        """Mask of the products the KB text mentions; one scan per distinct text, remembered afterwards."""
+        with self._kb_lock:
+            cached = self._kb_scans.get(kb_text)
+        if cached is not None:
+            return cached
+        mask = 0
+        if self._kb_pattern is not None:
+            for match in self._kb_pattern.finditer(kb_text):
+                mask |= 1 << int(match.lastgroup[1:])
+        with self._kb_lock:
+            if len(self._kb_scans) >= _KB_SCAN_CACHE_SIZE:
+                self._kb_scans.pop(next(iter(self._kb_scans)))
+            self._kb_scans[kb_text] = mask
+        return mask
+
+    def recommend(self, facts: CustomerFacts, kb_text: Optional[str] = None) -> List[ProductRule]:
+        """Eligible products in rules-file order; with kb_text, only those the knowledge base mentions."""
+        available = self.products_in_kb(kb_text) if kb_text is not None else -1
+        return [rule for rule in self.rules if available >> rule.index & 1 and rule.matches(facts)]
+
+    # --- Whole book (NumPy) ---
+    def history_ok_row(self, history: str) -> List[bool]:
+        """Per product: do the history conditions hold for this text (one column of eligibility_matrix's input)."""
+        return [rule.history_ok(history) for rule in self.rules]
+
+    def eligibility_matrix(self, held: np.ndarray, has_address: np.ndarray, total_premium: np.ndarray,
+                           history_ok: np.ndarray) -> np.ndarray:
+        """(n, products) bool: the rules evaluated for n customers at once (held as uint32 masks)."""
+        held = held.astype(np.uint32)
+        n = len(held)
+        eligible = np.ones((n, len(self.rules)), dtype=bool)
+        for rule in self.rules:
+            column = eligible[:, rule.index]
+            if rule.held_all:
+                column &= (held & np.uint32(rule.held_all)) == np.uint32(rule.held_all)
+            if rule.held_any:
+                column &= (held & np.uint32(rule.held_any)) != 0
+            if rule.not_held:
+                column &= (held & np.uint32(rule.not_held)) == 0
+            if rule.address_present is not None:
+                column &= has_address == bool(rule.address_present)
+            if rule.min_total_premium is not None:
+                column &= total_premium >= rule.min_total_premium
+            if rule.max_total_premium is not None:
+                column &= total_premium <= rule.max_total_premium
+        return eligible & history_ok
+
+
+def load_product_catalog(path: str = PRODUCT_RULES_PATH) -> ProductCatalog:
+    with open(_abs_path(path), "r", encoding="utf-8") as f:
+        return ProductCatalog(json.load(f))
+
+
+_product_catalog_instance: Optional[ProductCatalog] = None
+_product_catalog_mtime: Optional[float] = None
+_product_catalog_lock = threading.Lock()
+
+def get_product_catalog() -> ProductCatalog:
+    """The compiled catalog, recompiled when data/product_rules.json changes on disk."""
+    global _product_catalog_instance, _product_catalog_mtime
+    try:
+        mtime = os.path.getmtime(_abs_path(PRODUCT_RULES_PATH))
+    except OSError:
+        mtime = None
+    if _product_catalog_instance is None or mtime != _product_catalog_mtime:
+        with _product_catalog_lock:
+            if _product_catalog_instance is None or mtime != _product_catalog_mtime:
+                _product_catalog_instance = load_product_catalog()
+                _product_catalog_mtime = mtime
+                print(f"✅ Product rules loaded (version {_product_catalog_instance.version}, "
+                      f"{len(_product_catalog_instance.rules)} products)")
+    return _product_catalog_instance
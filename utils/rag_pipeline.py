@@ -1,5 +1,6 @@
 # utils/rag_pipeline.py
 import os
+import re
 import shutil 
 from typing import List, Dict, Any
 from langchain_community.document_loaders import TextLoader, PyPDFLoader
@@ -7,6 +8,7 @@ from langchain_text_splitters import RecursiveCharacterTextSplitter
 from langchain_google_genai import GoogleGenerativeAIEmbeddings
 from langchain_community.vectorstores import Chroma
 from langchain_core.documents import Document
+from utils.product_lines import GENERAL, product_line_of_heading
 
 # Define paths
 KB_PATH = "data/insurance_kb.md"
@@ -25,15 +27,43 @@ def load_documents(file_path: str) -> List[Document]:
         raise ValueError(f"Unsupported file type for {abs_file_path}")
     return loader.load()
 
+def split_sections(documents: List[Document]) -> List[Document]:
+    """
+    Splits markdown documents at their "## " headings; each section is tagged with the product line its heading
+    names (utils/product_lines.py). Other documents are kept whole as GENERAL.
+    """
+    sections = []
+    for document in documents:
+        text = document.page_content
+        if not str(document.metadata.get("source", "")).endswith(".md"):
+            sections.append(Document(page_content=text, metadata={**document.metadata, "product_line": GENERAL}))
+            continue
+        starts = [0] + [m.start() for m in re.finditer(r"^## ", text, re.MULTILINE) if m.start() > 0] + [len(text)]
+        for start, end in zip(starts, starts[1:]):
+            section = text[start:end]
+            if not section.strip():
+                continue
+            heading = section.partition("\n")[0] if section.startswith("## ") else ""
+            sections.append(Document(page_content=section, metadata={
+                **document.metadata, "product_line": product_line_of_heading(heading), "section_start": start,
+            }))
+    return sections
+
 def split_documents(documents: List[Document]) -> List[Document]:
-    """Splits documents into smaller chunks."""
+    """Splits documents into smaller chunks, within their product line sections."""
     text_splitter = RecursiveCharacterTextSplitter(
         chunk_size=1000,
         chunk_overlap=200,
         length_function=len,
         is_separator_regex=False,
+        # Chunk offsets let the RAG context builder put sentences back in document order
+        add_start_index=True,
     )
-    return text_splitter.split_documents(documents)
+    chunks = text_splitter.split_documents(split_sections(documents))
+    for chunk in chunks:
+        # Offsets relative to the whole document, as before the section split
+        chunk.metadata["start_index"] += chunk.metadata.pop("section_start", 0)
+    return chunks
 
 def create_vector_store(documents: List[Document], embeddings: GoogleGenerativeAIEmbeddings) -> Chroma:
     """Creates and persists a Chroma vector store from documents."""
@@ -70,7 +100,8 @@ def ingest_and_get_vector_store(embeddings: GoogleGenerativeAIEmbeddings, kb_pat
     
     db = create_vector_store(chunks, embeddings)
         
-    print(f"--- Document ingestion complete. {len(chunks)} chunks stored. ---")
+    lines = sorted({chunk.metadata["product_line"] for chunk in chunks})
+    print(f"--- Document ingestion complete. {len(chunks)} chunks stored (product lines: {', '.join(lines)}). ---")
     return db
 
 if __name__ == "__main__":
@@ -84,7 +115,8 @@ if __name__ == "__main__":
 
     print("--- Running RAG pipeline ingestion test ---")
     
-    embeddings_test = GoogleGenerativeAIEmbeddings(model="models/embedding-001", google_api_key=GOOGLE_API_KEY)
+    from utils.llm_factory import create_embeddings
+    embeddings_test = create_embeddings()
 
     vector_db = ingest_and_get_vector_store(embeddings_test)
     print(f"Vector store has {vector_db._collection.count()} items.")
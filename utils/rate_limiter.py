@@ -0,0 +1,185 @@
+# utils/rate_limiter.py
+import asyncio
+import contextvars
+import random
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional
+
+from langchain_core.rate_limiters import BaseRateLimiter
+
+# Priority classes: lower value = served first when requests queue for quota
+INTERACTIVE = 0
+BATCH = 1
+_PRIORITY_NAMES = {INTERACTIVE: "interactive", BATCH: "batch"}
+
+_current_priority: contextvars.ContextVar[int] = contextvars.ContextVar("llm_priority", default=INTERACTIVE)
+
+
+@contextmanager
+def priority_class(priority: int) -> Iterator[None]:
+    """Runs the enclosed LLM/embedding calls in a priority class (contextvar: follows threads started with a copied context)."""
+    token = _current_priority.set(priority)
+    try:
+        yield
+    finally:
+        _current_priority.reset(token)
+
+def set_priority_class(priority: int) -> None:
+    """Sets the priority class for the rest of the current context (e.g. one batch worker task)."""
+    _current_priority.set(priority)
+
+def current_priority() -> int:
+    return _current_priority.get()
+
+
+class LLMRateLimiter(BaseRateLimiter):
+    """
+    Process-wide token buckets for requests per minute and tokens per minute, shared by every chat model and
+    embedding model built in utils/llm_factory.py. Either limit can be changed at runtime (e.g. by the batch
+    runner's --rpm/--tpm flags); None means unlimited.
+
+    Requests waiting for quota are served by priority class: a batch request is only admitted when no
+    interactive request is waiting. After a rate-limit error, pause() holds every caller back until the
+    provider's retry-after has passed, so one 429 does not turn into a burst of them.
+    """
+
+    def __init__(self, requests_per_minute: Optional[float] = None, tokens_per_minute: Optional[float] = None,
+                 check_every_n_seconds: float = 0.05):
+        self.check_every_n_seconds = check_every_n_seconds
+        self._lock = threading.Lock()
+        self._requests = 0.0
+        self._tokens = 0.0
+        self._last_refill: Optional[float] = None
+        self._paused_until = 0.0
+        self._waiting: Dict[int, int] = {}
+        self.throttled = {name: 0 for name in _PRIORITY_NAMES.values()}
+        self.configure(requests_per_minute, tokens_per_minute)
+
+    def configure(self, requests_per_minute: Optional[float], tokens_per_minute: Optional[float] = None) -> None:
+        with self._lock:
+            self.requests_per_minute = requests_per_minute if requests_per_minute and requests_per_minute > 0 else None
+            self.tokens_per_minute = tokens_per_minute if tokens_per_minute and tokens_per_minute > 0 else None
+            # Allow a burst of up to one second's worth of requests (at least one)
+            self.max_request_bucket = max(1.0, (self.requests_per_minute or 0) / 60.0)
+            # Prompts are large compared to one second's worth of tokens: allow ten seconds' worth
+            self.max_token_bucket = (self.tokens_per_minute or 0) / 6.0
+            self._requests = min(self._requests, self.max_request_bucket)
+            self._tokens = min(self._tokens, self.max_token_bucket)
+
+    def _refill(self, now: float) -> None:
+        if self._last_refill is None:
+            # First request after start-up goes straight through
+            self._last_refill = now
+            self._requests = self.max_request_bucket
+            self._tokens = self.max_token_bucket
+        elapsed = now - self._last_refill
+        self._last_refill = now
+        if self.requests_per_minute:
+            self._requests = min(self.max_request_bucket, self._requests + elapsed * self.requests_per_minute / 60.0)
+        if self.tokens_per_minute:
+            self._tokens = min(self.max_token_bucket, self._tokens + elapsed * self.tokens_per_minute / 60.0)
+
+    def _consume(self, tokens: int = 0, priority: int = INTERACTIVE) -> bool:
+        with self._lock:
+            now = time.monotonic()
+            if now < self._paused_until:
+                return False
+            if any(count for waiting_priority, count in self._waiting.items() if waiting_priority < priority):
+                return False
+            if self.requests_per_minute is None and self.tokens_per_minute is None:
+                return True
+            self._refill(now)
+            if self.requests_per_minute and self._requests < 1.0:
+                return False
+            # A request larger than the bucket waits for a full bucket rather than forever
+            cost = min(float(tokens), self.max_token_bucket)
+            if self.tokens_per_minute and self._tokens < cost:
+                return False
+            if self.requests_per_minute:
+                self._requests -= 1.0
+            if self.tokens_per_minute:
+                self._tokens -= cost
+            return True
+
+    def _wait_started(self, priority: int) -> None:
+        with self._lock:
+            self._waiting[priority] = self._waiting.get(priority, 0) + 1
+            name = _PRIORITY_NAMES.get(priority, str(priority))
+            self.throttled[name] = self.throttled.get(name, 0) + 1
+
+    def _wait_finished(self, priority: int) -> None:
+        with self._lock:
+            self._waiting[priority] -= 1
+
+    def acquire(self, *, blocking: bool = True, tokens: int = 0, priority: Optional[int] = None) -> bool:
+        priority = current_priority() if priority is None else priority
+        if self._consume(tokens, priority):
+            return True
+        if not blocking:
+            return False
+        self._wait_started(priority)
+        try:
+            while not self._consume(tokens, priority):
+                time.sleep(self.check_every_n_seconds)
+        finally:
+            self._wait_finished(priority)
+        return True
+
+    async def aacquire(self, *, blocking: bool = True, tokens: int = 0, priority: Optional[int] = None) -> bool:
+        priority = current_priority() if priority is None else priority
+        if self._consume(tokens, priority):
+            return True
+        if not blocking:
+            return False
+        self._wait_started(priority)
+        try:
+            while not self._consume(tokens, priority):
+                await asyncio.sleep(self.check_every_n_seconds)
+        finally:
+            self._wait_finished(priority)
+        return True
+
+    def record_usage(self, estimated_tokens: int, actual_tokens: int) -> None:
+        """Corrects the token bucket once the provider reports what a call really used (may go into debt)."""
+        if not self.tokens_per_minute or actual_tokens <= 0:
+            return
+        with self._lock:
+            self._tokens = min(self.max_token_bucket, self._tokens + estimated_tokens - actual_tokens)
+
+    def pause(self, seconds: float) -> None:
+        """Holds back every caller for `seconds` (the provider asked us to slow down)."""
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+    def stats(self) -> Dict[str, object]:
+        with self._lock:
+            return {
+                "requests_per_minute": self.requests_per_minute,
+                "tokens_per_minute": self.tokens_per_minute,
+                "waiting": {_PRIORITY_NAMES.get(p, str(p)): n for p, n in self._waiting.items() if n},
+                "throttled": dict(self.throttled),
+                "paused_for_s": round(max(0.0, self._paused_until - time.monotonic()), 2),
+            }
+
+
+def backoff_delay(attempt: int, base_seconds: float, max_seconds: float, retry_after: Optional[float] = None) -> float:
+    """
+    Delay before retry n (1-based): exponential with full jitter, so callers that failed together do not
+    retry together. A provider retry-after hint is a lower bound.
+    """
+    delay = random.uniform(0, min(max_seconds, base_seconds * (2 ** (attempt - 1))))
+    if retry_after is not None:
+        delay = max(delay, retry_after)
+    return delay
+
+
+_llm_rate_limiter_instance = None
+
+def get_llm_rate_limiter() -> LLMRateLimiter:
+    global _llm_rate_limiter_instance
+    if _llm_rate_limiter_instance is None:
+        from config import LLM_REQUESTS_PER_MINUTE, LLM_TOKENS_PER_MINUTE
+        _llm_rate_limiter_instance = LLMRateLimiter(LLM_REQUESTS_PER_MINUTE, LLM_TOKENS_PER_MINUTE)
+    return _llm_rate_limiter_instance
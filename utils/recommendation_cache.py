@@ -0,0 +1,146 @@
+# utils/recommendation_cache.py
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Set, Tuple
+
+from tools.crm_store import get_crm_store, record_hash
+from utils.local_fallbacks import KB_PATH
+from utils.result_renderer import render_customer
+from utils.product_rules import get_product_catalog
+
+_kb_snapshot: Tuple[Optional[float], str, str] = (None, "", "")
+_kb_snapshot_lock = threading.Lock()
+
+
+def _kb_text_and_digest() -> Tuple[str, str]:
+    """The knowledge base markdown and a short digest of it, re-read only when the file changes."""
+    global _kb_snapshot
+    project_root = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+    path = os.path.join(project_root, KB_PATH)
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        return "", "no-kb"
+    with _kb_snapshot_lock:
+        if _kb_snapshot[0] != mtime:
+            with open(path, "r", encoding="utf-8") as f:
+                text = f.read()
+            _kb_snapshot = (mtime, text, hashlib.sha1(text.encode("utf-8")).hexdigest()[:12])
+        return _kb_snapshot[1], _kb_snapshot[2]
+
+
+def catalog_version() -> str:
+    """Version of everything a recommendation depends on besides the customer: the product rules and the KB."""
+    return f"{get_product_catalog().version}:{_kb_text_and_digest()[1]}"
+
+
+def compute_recommendation(record: Dict[str, Any]) -> str:
+    """A customer's recommendations from the rules alone (no agents): the KB file supplies the available products."""
+    from tools.recommendation_tool import generate_insurance_recommendations
+    return generate_insurance_recommendations.invoke({
+        "customer_profile_json": json.dumps(record),
+        "available_products_kb": _kb_text_and_digest()[0],
+    })
+
+
+class RecommendationCache:
+    """
+    Materialized recommendations per customer, keyed by the content hash of the customer record and the catalog
+    version (product rules + KB). Entries are created by completed recommendation flows and kept up to date
+    incrementally: the CRM change feed recomputes the entries of changed customers (and drops deleted ones),
+    and an entry found with an outdated catalog version is recomputed on read. Recomputing is rule-based, so
+    neither needs the customer or knowledge agents.
+    """
+
+    def __init__(self, max_entries: int = 10000):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.recomputed = 0
+
+    def _store(self, record: Dict[str, Any], customer_answer: str, recommendation: str, version: str) -> None:
+        with self._lock:
+            self._entries[record["id"]] = {
+                "hash": record_hash(record),
+                "catalog_version": version,
+                "record": record,
+                "customer_answer": customer_answer,
+                "recommendation": recommendation,
+                "stored_at": time.time(),
+            }
+            self._entries.move_to_end(record["id"])
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def put(self, record: Dict[str, Any], customer_answer: str, recommendation: str) -> None:
+        if record.get("id"):
+            self._store(record, customer_answer, recommendation, catalog_version())
+
+    def _recompute(self, record: Dict[str, Any], reason: str) -> Dict[str, Any]:
+        print(f"---RECOMMENDATION CACHE: recomputing {record.get('id')} ({reason})---")
+        version = catalog_version()
+        # The customer agent's wording described the old record: answer from the template instead
+        self._store(record, render_customer(record), compute_recommendation(record), version)
+        with self._lock:
+            self.recomputed += 1
+            return dict(self._entries[record["id"]])
+
+    def get(self, record: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """{"customer_answer", "recommendation", ...} for the live CRM record, or None if never materialized."""
+        customer_id = record.get("id", "")
+        with self._lock:
+            entry = self._entries.get(customer_id)
+            if entry is None:
+                self.misses += 1
+                return None
+            entry = dict(entry)
+        if entry["hash"] != record_hash(record):
+            entry = self._recompute(record, "customer record changed")
+        elif entry["catalog_version"] != catalog_version():
+            entry = self._recompute(record, "product catalog changed")
+        with self._lock:
+            self.hits += 1
+            if customer_id in self._entries:
+                self._entries.move_to_end(customer_id)
+        return entry
+
+    def on_customers_changed(self, customer_ids: Set[str]) -> None:
+        """CRM change feed listener: recomputes the materialized customers that changed, drops deleted ones."""
+        with self._lock:
+            affected = [customer_id for customer_id in customer_ids if customer_id in self._entries]
+        store = get_crm_store()
+        for customer_id in affected:
+            record = store.find_customer(customer_id)
+            if record:
+                self._recompute(record, "CRM change feed")
+            else:
+                with self._lock:
+                    self._entries.pop(customer_id, None)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses, "recomputed": self.recomputed}
+
+
+_recommendation_cache_instance = None
+_recommendation_cache_lock = threading.Lock()
+
+def get_recommendation_cache() -> Optional[RecommendationCache]:
+    """The process-wide cache (subscribed to the CRM change feed), or None when disabled."""
+    global _recommendation_cache_instance
+    from config import RECOMMENDATION_CACHE_ENABLED, RECOMMENDATION_CACHE_MAX_ENTRIES
+    if not RECOMMENDATION_CACHE_ENABLED:
+        return None
+    if _recommendation_cache_instance is None:
+        with _recommendation_cache_lock:
+            if _recommendation_cache_instance is None:
+                cache = RecommendationCache(max_entries=RECOMMENDATION_CACHE_MAX_ENTRIES)
+                get_crm_store().add_change_listener(cache.on_customers_changed)
+                _recommendation_cache_instance = cache
+    return _recommendation_cache_instance
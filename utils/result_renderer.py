@@ -0,0 +1,154 @@
+# utils/result_renderer.py
+"""
+Markdown rendering of CRM tool results (get_customer_info, search_leads) from templates, without an LLM.
+
+A customer renders as the "Contact Information / Policies / History" sections the customer agent writes;
+a lead list renders as a table. Large results are truncated: long histories and policy lists are cut, and a
+lead list keeps its highest-scoring rows with a per-status count of everything that matched.
+
+The graph uses these templates for plain lookups, i.e. queries that only name what to look up ("Find customer
+CUST002", "Who is Jane Doe?", "Show me qualified leads in Texas"): the answer is fully determined by the data,
+so the agent and its formatting call are skipped.
+"""
+import re
+from collections import Counter
+from typing import Any, Dict, List, Optional, Tuple
+
+from tools.crm_store import get_crm_store
+from utils.entity_extractor import EntityMatch, find_entities
+
+CUSTOMER_TEMPLATE = """### {name} ({id})
+
+**Contact Information**
+- Email: {email}
+- Phone: {phone}
+- Address: {address}
+
+**Policies**
+{policies}
+
+**History**
+{history}"""
+POLICY_TEMPLATE = "- {policy_id}: {type} ({status}, premium ${premium})"
+LEAD_HEADER = "| ID | Name | Score | Interest | Area | Status | Email | Phone |\n|---|---|---|---|---|---|---|---|"
+LEAD_ROW_TEMPLATE = "| {id} | {name} | {score} | {interest} | {area} | {status} | {email} | {phone} |"
+
+MAX_POLICIES = 20
+MAX_HISTORY_CHARS = 500
+
+_WORD_PATTERN = re.compile(r"[a-z0-9]+(?:['-][a-z0-9]+)*")
+# Words a plain lookup may contain besides what it looks up; anything else (a question about one field,
+# "top", "how many", "compare", ...) is left to the agents
+_LOOKUP_WORDS = {
+    "find", "show", "get", "give", "display", "list", "pull", "look", "up", "lookup", "retrieve", "fetch", "search",
+    "me", "us", "all", "any", "the", "a", "an", "for", "of", "on", "about", "with", "in", "from", "by", "and", "s",
+    "who", "is", "are", "there", "please", "can", "could", "you", "i", "we", "need", "want", "to", "see", "tell",
+    "info", "information", "details", "detail", "record", "records", "profile", "data",
+}
+_CUSTOMER_LOOKUP_WORDS = _LOOKUP_WORDS | {
+    "customer", "customers", "client", "account", "policyholder", "holder", "whose", "owns", "owner", "policy",
+    "email", "id", "named", "called",
+}
+_LEAD_LOOKUP_WORDS = _LOOKUP_WORDS | {
+    "lead", "leads", "prospect", "prospects", "status", "area", "score", "scores", "interested", "interest",
+    "insurance", "named", "called",
+}
+
+
+def _value(record: Dict[str, Any], field: str) -> str:
+    value = record.get(field)
+    return "-" if value is None or value == "" else str(value)
+
+
+def _cell(record: Dict[str, Any], field: str) -> str:
+    return _value(record, field).replace("|", "\\|").replace("\n", " ")
+
+
+def render_customer(record: Dict[str, Any]) -> str:
+    """A customer record in the customer agent's sections."""
+    policies = record.get("policies", [])
+    policy_lines = [
+        POLICY_TEMPLATE.format(**{field: _value(policy, field) for field in ("policy_id", "type", "status", "premium")})
+        for policy in policies[:MAX_POLICIES]
+    ]
+    if len(policies) > MAX_POLICIES:
+        policy_lines.append(f"- ... and {len(policies) - MAX_POLICIES} more policies")
+    history = (record.get("history") or "").strip()
+    if len(history) > MAX_HISTORY_CHARS:
+        history = history[:MAX_HISTORY_CHARS].rsplit(" ", 1)[0] + " …"
+    return CUSTOMER_TEMPLATE.format(
+        name=record.get("name") or "Unknown",
+        id=_value(record, "id"),
+        email=_value(record, "email"),
+        phone=_value(record, "phone"),
+        address=_value(record, "address"),
+        policies="\n".join(policy_lines) or "- No policies on file.",
+        history=history or "No history on file.",
+    )
+
+
+def render_leads(leads: List[Dict[str, Any]], criteria: Dict[str, Any], max_rows: Optional[int] = None) -> str:
+    """A lead list as a table; beyond max_rows (default LEAD_RENDER_MAX_ROWS) only the highest scores are shown."""
+    if max_rows is None:
+        from config import LEAD_RENDER_MAX_ROWS
+        max_rows = LEAD_RENDER_MAX_ROWS
+    described = ", ".join(f"{key}={value}" for key, value in criteria.items()) or "no filters"
+    if not leads:
+        return f"No leads found ({described})."
+
+    shown = leads
+    if len(leads) > max_rows:
+        shown = sorted(leads, key=lambda lead: float(lead.get("score") or 0), reverse=True)[:max_rows]
+    lines = [f"Found {len(leads)} lead(s) ({described}):", "", LEAD_HEADER]
+    lines.extend(
+        LEAD_ROW_TEMPLATE.format(**{field: _cell(lead, field) for field in
+                                    ("id", "name", "score", "interest", "area", "status", "email", "phone")})
+        for lead in shown
+    )
+    if len(shown) < len(leads):
+        by_status = Counter(_value(lead, "status") for lead in leads)
+        statuses = ", ".join(f"{status} {count}" for status, count in by_status.most_common())
+        lines += ["", f"Showing the {len(shown)} highest-scoring of {len(leads)} leads (by status: {statuses}). "
+                      f"Narrow the search by area, status or score, or export the full list with campaign_leads_export.py."]
+    return "\n".join(lines)
+
+
+def _leftover_words(query: str, spans: List[Tuple[int, int]]) -> List[str]:
+    """The query's words outside the given character spans."""
+    text = query
+    for start, end in sorted(spans, reverse=True):
+        text = text[:start] + " " + text[end:]
+    return _WORD_PATTERN.findall(text.lower())
+
+
+def plain_customer_lookup(query: str, matches: Optional[List[EntityMatch]] = None) -> Dict[str, Any]:
+    """
+    The record of the one customer a plain lookup query names ("Find customer CUST002"), else {}.
+    matches: find_entities(query) when already computed.
+    """
+    matches = find_entities(query) if matches is None else matches
+    if not matches or len({match.customer_id for match in matches}) != 1:
+        return {}
+    leftover = _leftover_words(query, [(match.start, match.end) for match in matches])
+    if all(word in _CUSTOMER_LOOKUP_WORDS for word in leftover):
+        return get_crm_store().find_customer(matches[0].customer_id)
+    return {}
+
+
+def plain_lead_lookup(query: str) -> Optional[Dict[str, Any]]:
+    """search_leads criteria when the query is nothing but a lead search ("Show me qualified leads in Texas"), else None."""
+    from utils.local_fallbacks import parse_lead_criteria
+    spans: List[Tuple[int, int]] = []
+    criteria = parse_lead_criteria(query, consumed=spans)
+    leftover = _leftover_words(query, spans)
+    if any(word in ("lead", "leads", "prospect", "prospects") for word in leftover) \
+            and all(word in _LEAD_LOOKUP_WORDS for word in leftover):
+        return criteria
+    return None
+
+
+if __name__ == "__main__":
+    for query in ["Find customer CUST002", "Who is John Smith?", "What is John Smith's phone number?",
+                  "Show me qualified leads in Texas", "Find leads with score above 80 interested in auto insurance",
+                  "Top 10 leads for the life campaign", "How many leads are in Texas?"]:
+        print(f"{query!r}: customer={plain_customer_lookup(query).get('id')} leads={plain_lead_lookup(query)}")
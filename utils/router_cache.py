@@ -0,0 +1,138 @@
+# utils/router_cache.py
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from utils.fast_router import (
+    EMAIL_PATTERN,
+    CUSTOMER_ID_PATTERN,
+    POLICY_ID_PATTERN,
+    LEAD_ID_PATTERN,
+)
+
+_NUMBER_PATTERN = re.compile(r"\b\d+\b")
+_WHITESPACE_PATTERN = re.compile(r"\s+")
+
+
+def _mask_customer_names(query: str) -> str:
+    """
+    Replaces the names of CRM customers with <name>. Only names the entity automaton resolves are masked:
+    any two capitalised words would also catch "Life Insurance", and "Tell me about Life Insurance" must not
+    share a key (and a route) with "Tell me about John Smith".
+    """
+    from utils.entity_extractor import find_entities
+    spans = sorted((match.start, match.end) for match in find_entities(query) if match.kind == "name")
+    pieces, position = [], 0
+    for start, end in spans:
+        if start < position:
+            continue
+        pieces += [query[position:start], "<name>"]
+        position = end
+    return "".join(pieces) + query[position:]
+
+
+def normalize_query(query: str) -> str:
+    """
+    Normalises a query into a cache key for its *shape*: entity values are masked,
+    then the text is case-folded and whitespace-collapsed.
+    "Find customer CUST001" and "find  customer cust002" share the key "find customer <customer_id>".
+    """
+    text = _mask_customer_names(query)
+    text = EMAIL_PATTERN.sub("<email>", text)
+    text = CUSTOMER_ID_PATTERN.sub("<customer_id>", text)
+    text = POLICY_ID_PATTERN.sub("<policy_id>", text)
+    text = LEAD_ID_PATTERN.sub("<lead_id>", text)
+    text = _NUMBER_PATTERN.sub("<num>", text)
+    text = _WHITESPACE_PATTERN.sub(" ", text.casefold()).strip()
+    return text.rstrip("?.! ")
+
+
+class RouterDecisionCache:
+    """
+    Thread-safe, bounded LRU cache of router decisions keyed by normalised query text.
+    Entries expire after ttl_seconds; hit/miss/eviction counters are kept for monitoring.
+    """
+
+    def __init__(self, max_size: int = 1024, ttl_seconds: float = 3600.0):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, query: str) -> Optional[str]:
+        key = normalize_query(query)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            decision, stored_at = entry
+            if now - stored_at > self.ttl_seconds:
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return decision
+
+    def put(self, query: str, decision: str) -> None:
+        key = normalize_query(query)
+        with self._lock:
+            self._entries[key] = (decision, time.monotonic())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits / lookups) if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
+
+
+_router_cache_instance = None
+
+def get_router_cache() -> RouterDecisionCache:
+    global _router_cache_instance
+    if _router_cache_instance is None:
+        from config import ROUTER_CACHE_MAX_SIZE, ROUTER_CACHE_TTL_SECONDS
+        _router_cache_instance = RouterDecisionCache(max_size=ROUTER_CACHE_MAX_SIZE, ttl_seconds=ROUTER_CACHE_TTL_SECONDS)
+    return _router_cache_instance
+
+
+if __name__ == "__main__":
+    cache = RouterDecisionCache(max_size=2, ttl_seconds=60)
+
+    for q in ["Find customer CUST001", "find  customer cust002", "Recommend coverage for John Smith",
+              "Recommend coverage for Jane Doe?", "Find leads with score above 80"]:
+        print(f"{q!r:40} -> key {normalize_query(q)!r}")
+    # Regression: a product line written like a name must not share the cache entry of a customer lookup
+    assert normalize_query("Tell me about Life Insurance") != normalize_query("Tell me about John Smith")
+    assert normalize_query("Tell me about John Smith") == normalize_query("Tell me about Jane Doe")
+
+    cache.put("Find customer CUST001", "customer_agent_node")
+    print(cache.get("Find customer CUST002"))
+    print(cache.get("What is a premium?"))
+    cache.put("What is a premium?", "knowledge_agent_node")
+    cache.put("Show me leads in Texas", "lead_agent_node")
+    print(cache.stats())
@@ -0,0 +1,150 @@
+# utils/session_cache.py
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from tools.crm_store import get_crm_store, record_hash
+
+# Result kinds cached per session besides customers
+LEAD_RESULTS = "leads"
+KB_ANSWERS = "kb"
+
+
+def cache_key(text: str) -> str:
+    """Case- and whitespace-insensitive key for a query (entity values are kept: they change the result)."""
+    return " ".join(text.casefold().split()).rstrip("?.! ")
+
+
+class SessionEntityCache:
+    """
+    Entities resolved during one chat session, so follow-up turns skip repeated lookups.
+
+    - Customers are stored with the content hash of their CRM record. A query hits only when every customer it
+      mentions (id, email, name or policy id, matched on word boundaries by the entity extractor) is the same
+      cached customer. A hit is re-validated against the live CRM store; a changed or deleted record is a miss.
+    - Lead result sets are tied to the CRM store version they were computed from.
+    - KB answers only expire with the TTL (the knowledge base does not change within a session).
+    """
+
+    def __init__(self, ttl_seconds: float = 1800.0):
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._customers: Dict[str, Dict[str, Any]] = {}
+        self._last_customer_id = ""
+        self._results: Dict[Tuple[str, str], Dict[str, Any]] = {}
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def _expired(self, entry: Dict[str, Any]) -> bool:
+        return time.monotonic() - entry["stored_at"] > self.ttl_seconds
+
+    # --- Customers ---
+    def put_customer(self, record: Dict[str, Any], answer: str) -> None:
+        customer_id = record.get("id", "")
+        if not customer_id:
+            return
+        with self._lock:
+            self._customers[customer_id] = {
+                "record": record,
+                "hash": record_hash(record),
+                "answer": answer,
+                "stored_at": time.monotonic(),
+            }
+            self._last_customer_id = customer_id
+
+    def _resolve_customer_id(self, query: str, conversation_context: str, mentioned: List[str]) -> str:
+        if mentioned:
+            # One customer, cached: a hit. Several customers ("Compare John Smith with Jane Doe"): the agent's job
+            return mentioned[0] if len(set(mentioned)) == 1 else ""
+        # "her" / "that customer": the most recent customer, if the conversation still mentions them
+        last = self._customers.get(self._last_customer_id)
+        if last and conversation_context and last["record"].get("name", "").lower() in conversation_context.lower():
+            from utils.conversation_memory import is_follow_up
+            if is_follow_up(query):
+                return self._last_customer_id
+        return ""
+
+    def find_customer(self, query: str, conversation_context: str = "", matches: Optional[List[Any]] = None) -> Optional[Dict[str, Any]]:
+        """
+        Returns {"record", "answer"} for a cached customer the query refers to, or None.
+        matches: find_entities(query) when already computed.
+        """
+        from utils.entity_extractor import find_entities
+        matches = find_entities(query) if matches is None else matches
+        mentioned = [match.customer_id for match in matches]
+        with self._lock:
+            customer_id = self._resolve_customer_id(query, conversation_context, mentioned)
+            entry = self._customers.get(customer_id) if customer_id else None
+        if entry is None:
+            with self._lock:
+                self.misses += 1
+            return None
+
+        current = get_crm_store().find_customer(customer_id)
+        with self._lock:
+            if self._expired(entry) or not current or record_hash(current) != entry["hash"]:
+                # The CRM record changed (or the entry is old): drop it and let the agent look it up again
+                self._customers.pop(customer_id, None)
+                self.invalidations += 1
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._last_customer_id = customer_id
+            return {"record": entry["record"], "answer": entry["answer"]}
+
+    # --- Lead result sets and KB answers ---
+    def put_result(self, kind: str, query: str, output: str) -> None:
+        version = get_crm_store().current_version() if kind == LEAD_RESULTS else None
+        with self._lock:
+            self._results[(kind, cache_key(query))] = {"output": output, "version": version, "stored_at": time.monotonic()}
+
+    def get_result(self, kind: str, query: str) -> Optional[str]:
+        key = (kind, cache_key(query))
+        version = get_crm_store().current_version() if kind == LEAD_RESULTS else None
+        with self._lock:
+            entry = self._results.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            if self._expired(entry) or entry["version"] != version:
+                del self._results[key]
+                self.invalidations += 1
+                self.misses += 1
+                return None
+            self.hits += 1
+            return entry["output"]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "customers": len(self._customers),
+                "results": len(self._results),
+                "hits": self.hits,
+                "misses": self.misses,
+                "invalidations": self.invalidations,
+            }
+
+
+_session_caches: "OrderedDict[str, SessionEntityCache]" = OrderedDict()
+_session_caches_lock = threading.Lock()
+
+def get_session_cache(session_id: str) -> Optional[SessionEntityCache]:
+    """The cache of a chat session (created on first use), or None without a session id or when disabled."""
+    from config import SESSION_CACHE_ENABLED, SESSION_CACHE_TTL_SECONDS, SESSION_CACHE_MAX_SESSIONS
+    if not session_id or not SESSION_CACHE_ENABLED:
+        return None
+    with _session_caches_lock:
+        cache = _session_caches.get(session_id)
+        if cache is None:
+            cache = _session_caches[session_id] = SessionEntityCache(ttl_seconds=SESSION_CACHE_TTL_SECONDS)
+        _session_caches.move_to_end(session_id)
+        # Least recently active sessions are dropped first
+        while len(_session_caches) > SESSION_CACHE_MAX_SESSIONS:
+            _session_caches.popitem(last=False)
+        return cache
+
+def clear_session_cache(session_id: str) -> None:
+    with _session_caches_lock:
+        _session_caches.pop(session_id, None)
@@ -0,0 +1,233 @@
+# utils/single_flight.py
+import asyncio
+import contextvars
+import threading
+import weakref
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+
+class _Call:
+    """One in-flight execution shared by its leader and any followers (sync callers)."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+        self.followers = 0
+        # Progress events published by a stream() execution, replayed to every caller from the start
+        self.events: List[Any] = []
+        self.changed = threading.Condition()
+
+    def publish(self, event: Any) -> None:
+        with self.changed:
+            self.events.append(event)
+            self.changed.notify_all()
+
+    def finish(self) -> None:
+        with self.changed:
+            self.done.set()
+            self.changed.notify_all()
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent identical calls: the first caller for a key (the leader) executes, callers arriving
+    while it is in flight (followers) wait for and share its result or Exception. Nothing is cached once the
+    call completes. max_in_flight (0 = unlimited) caps how many distinct keys execute at the same time.
+    A leader that dies of a BaseException (cancellation, interpreter exit, a Streamlit rerun) is not shared:
+    its followers retry, one of them becoming the new leader.
+
+    do() serves threads (sync graph runs, the RAG tool); ado() serves coroutines on an event loop; stream()
+    serves callers that each render the execution's progress (Streamlit sessions).
+    Each returns (result, shared), where shared is True for followers.
+    """
+
+    def __init__(self, name: str, max_in_flight: int = 0):
+        self.name = name
+        self.max_in_flight = max_in_flight
+        self._lock = threading.Lock()
+        self._calls: Dict[str, _Call] = {}
+        # (loop id, key) -> [future, follower count]
+        self._async_calls: Dict[Tuple[int, str], list] = {}
+        self._semaphore = threading.BoundedSemaphore(max_in_flight) if max_in_flight > 0 else None
+        self._async_semaphores: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore]" = weakref.WeakKeyDictionary()
+        self.executions = 0
+        self.coalesced = 0
+        self.max_followers = 0
+
+    def _count_follower(self, followers: int) -> None:
+        self.coalesced += 1
+        self.max_followers = max(self.max_followers, followers)
+
+    # --- Threads ---
+    def _join(self, key: str) -> Tuple[_Call, bool]:
+        with self._lock:
+            call = self._calls.get(key)
+            is_leader = call is None
+            if is_leader:
+                call = self._calls[key] = _Call()
+                self.executions += 1
+            else:
+                call.followers += 1
+                self._count_follower(call.followers)
+        if not is_leader:
+            print(f"---SINGLE-FLIGHT [{self.name}]: joined in-flight call for '{key}'---")
+        return call, is_leader
+
+    def _execute(self, key: str, call: _Call, func: Callable[[], Any]) -> None:
+        """Runs the leader's func into call.result / call.error, then releases the key and wakes the followers."""
+        try:
+            if self._semaphore is not None:
+                self._semaphore.acquire()
+            try:
+                call.result = func()
+            finally:
+                if self._semaphore is not None:
+                    self._semaphore.release()
+        except BaseException as e:
+            call.error = e
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.finish()
+
+    @staticmethod
+    def _leader_died(call: _Call) -> bool:
+        if call.error is None or isinstance(call.error, Exception):
+            return False
+        print(f"⚠️ Single-flight leader stopped ({type(call.error).__name__}): retrying the call.")
+        return True
+
+    def do(self, key: str, func: Callable[[], Any]) -> Tuple[Any, bool]:
+        while True:
+            call, is_leader = self._join(key)
+            if is_leader:
+                self._execute(key, call, func)
+                if call.error is not None:
+                    raise call.error
+                return call.result, False
+            call.done.wait()
+            if self._leader_died(call):
+                continue
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+    def stream(self, key: str, func: Callable[[Callable[[Any], None]], Any],
+               on_event: Callable[[Any], None]) -> Tuple[Any, bool]:
+        """
+        Like do(), for a func(publish) that reports progress through publish(event). The leader's func runs on a
+        worker thread and every caller, the leader included, gets all events through on_event in its own thread,
+        so an exception raised while rendering (e.g. the session rerunning) leaves the others' execution running.
+        """
+        while True:
+            call, is_leader = self._join(key)
+            if is_leader:
+                context = contextvars.copy_context()
+                threading.Thread(target=context.run, args=(self._execute, key, call, lambda: func(call.publish)),
+                                 name=f"single-flight-{self.name}", daemon=True).start()
+            seen = 0
+            while True:
+                with call.changed:
+                    while seen == len(call.events) and not call.done.is_set():
+                        call.changed.wait()
+                    events = call.events[seen:]
+                    finished = call.done.is_set()
+                seen += len(events)
+                for event in events:
+                    on_event(event)
+                if finished and seen == len(call.events):
+                    break
+            if self._leader_died(call):
+                continue
+            if call.error is not None:
+                raise call.error
+            return call.result, not is_leader
+
+    # --- Event loop ---
+    def _async_semaphore(self) -> Optional[asyncio.Semaphore]:
+        if self.max_in_flight <= 0:
+            return None
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            semaphore = self._async_semaphores.get(loop)
+            if semaphore is None:
+                semaphore = self._async_semaphores[loop] = asyncio.Semaphore(self.max_in_flight)
+            return semaphore
+
+    async def ado(self, key: str, make_awaitable: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+        loop = asyncio.get_running_loop()
+        # Futures belong to one event loop, so coalescing is per loop
+        call_key = (id(loop), key)
+        with self._lock:
+            entry = self._async_calls.get(call_key)
+            is_leader = entry is None
+            if is_leader:
+                entry = self._async_calls[call_key] = [loop.create_future(), 0]
+                self.executions += 1
+            else:
+                entry[1] += 1
+                self._count_follower(entry[1])
+        future = entry[0]
+
+        if not is_leader:
+            print(f"---SINGLE-FLIGHT [{self.name}]: joined in-flight call for '{key}'---")
+            try:
+                # shield: a cancelled follower must not cancel the shared result for everyone else
+                return await asyncio.shield(future), True
+            except asyncio.CancelledError:
+                if not future.cancelled():
+                    raise
+                # The leader was cancelled, not this follower: run it again
+                print("⚠️ Single-flight leader cancelled: retrying the call.")
+                return await self.ado(key, make_awaitable)
+
+        try:
+            semaphore = self._async_semaphore()
+            if semaphore is not None:
+                async with semaphore:
+                    result = await make_awaitable()
+            else:
+                result = await make_awaitable()
+            future.set_result(result)
+            return result, False
+        except BaseException as e:
+            if isinstance(e, Exception):
+                future.set_exception(e)
+                # Mark the exception as retrieved in case no follower was waiting for it
+                future.exception()
+            else:
+                # Cancellation is the leader's own business: its followers retry (see above)
+                future.cancel()
+            raise
+        finally:
+            with self._lock:
+                self._async_calls.pop(call_key, None)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            requests = self.executions + self.coalesced
+            return {
+                "executions": self.executions,
+                "coalesced": self.coalesced,
+                "saved_rate": (self.coalesced / requests) if requests else 0.0,
+                "in_flight": len(self._calls) + len(self._async_calls),
+                "max_followers": self.max_followers,
+            }
+
+
+_single_flight_groups: Dict[str, SingleFlight] = {}
+_single_flight_lock = threading.Lock()
+
+def get_single_flight(name: str, max_in_flight: int = 0) -> SingleFlight:
+    """Process-wide coalescing group (e.g. "workflow", "rag"); max_in_flight applies when the group is created."""
+    with _single_flight_lock:
+        group = _single_flight_groups.get(name)
+        if group is None:
+            group = _single_flight_groups[name] = SingleFlight(name, max_in_flight)
+        return group
+
+def single_flight_stats() -> Dict[str, Dict[str, Any]]:
+    with _single_flight_lock:
+        groups = list(_single_flight_groups.values())
+    return {group.name: group.stats() for group in groups}
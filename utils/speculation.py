@@ -0,0 +1,179 @@
+# utils/speculation.py
+"""
+Speculative retrieval: local work started at request entry, while the router's LLM call is in flight.
+
+When a query needs the LLM router, start_speculation() submits the knowledge base top-k search for the query (embedding +
+vector search) and the CRM entity lookup of the query to a small thread pool. The router node keeps the
+speculation only when the route uses it:
+    knowledge route                  the knowledge node activates it (use_speculation()), and a knowledge base lookup
+                                     whose query is the request's own query takes the prefetched documents
+    customer / recommendation route  the customer and recommendation cache nodes take the CRM matches
+                                     (speculative_entities()) instead of scanning the query again
+Any other route drops it; unstarted work is cancelled. The final response node releases what is left, and
+entries nobody releases are dropped after SPECULATION_TTL_SECONDS. Only ids travel in the graph state, so
+checkpointed runs never serialize a future.
+"""
+import asyncio
+import contextvars
+import threading
+import time
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+from utils.session_cache import cache_key
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+_speculations: Dict[str, "Speculation"] = {}
+_speculations_lock = threading.Lock()
+# The speculation of the node run in progress (set by use_speculation(), read by the knowledge base tool)
+_active: contextvars.ContextVar[Optional["Speculation"]] = contextvars.ContextVar("speculation", default=None)
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                from config import SPECULATION_MAX_WORKERS
+                _executor = ThreadPoolExecutor(max_workers=SPECULATION_MAX_WORKERS, thread_name_prefix="speculation")
+    return _executor
+
+
+class Speculation:
+    """The prefetched work of one request."""
+
+    def __init__(self, query: str, documents: Future, entities: Future):
+        self.query = query
+        self.key = cache_key(query)
+        self.created = time.monotonic()
+        self._documents: Optional[Future] = documents
+        self.entities = entities
+        self._lock = threading.Lock()
+
+    def _take_future(self) -> Optional[Future]:
+        with self._lock:
+            future, self._documents = self._documents, None
+        return future
+
+    def take_documents(self) -> Optional[List[Any]]:
+        """The prefetched documents (waiting for the search still in flight), once; None if failed or taken."""
+        future = self._take_future()
+        if future is None or future.cancelled():
+            return None
+        try:
+            return future.result()
+        except Exception as e:
+            print(f"⚠️ Speculative retrieval failed, searching again: {e}")
+            return None
+
+    async def atake_documents(self) -> Optional[List[Any]]:
+        future = self._take_future()
+        if future is None or future.cancelled():
+            return None
+        try:
+            return await asyncio.wrap_future(future)
+        except Exception as e:
+            print(f"⚠️ Speculative retrieval failed, searching again: {e}")
+            return None
+
+    def cancel(self) -> None:
+        future = self._take_future()
+        for pending in (future, self.entities):
+            if pending is not None:
+                pending.cancel()
+
+
+def _expire(now: float) -> None:
+    from config import SPECULATION_TTL_SECONDS
+    with _speculations_lock:
+        expired = [key for key, spec in _speculations.items() if now - spec.created > SPECULATION_TTL_SECONDS]
+        stale = [_speculations.pop(key) for key in expired]
+    for spec in stale:
+        spec.cancel()
+
+
+def start_speculation(query: str, retrieve: Callable[[str], List[Any]], find_entities: Callable[[str], Any]) -> str:
+    """Submits retrieve(query) and find_entities(query); returns the speculation id to keep or drop."""
+    _expire(time.monotonic())
+    executor = _get_executor()
+    speculation = Speculation(query, executor.submit(retrieve, query), executor.submit(find_entities, query))
+    speculation_id = uuid.uuid4().hex
+    with _speculations_lock:
+        _speculations[speculation_id] = speculation
+    print("---SPECULATIVE RETRIEVAL STARTED (knowledge base top-k + CRM lookup, while the router decides)---")
+    return speculation_id
+
+
+def release_speculation(speculation_id: str) -> Optional[Speculation]:
+    """Forgets the speculation and cancels what has not started (the request is done with it)."""
+    with _speculations_lock:
+        speculation = _speculations.pop(speculation_id, None) if speculation_id else None
+    if speculation is not None:
+        speculation.cancel()
+    return speculation
+
+
+def drop_speculation(speculation_id: str) -> None:
+    """The route does not need the speculation."""
+    if release_speculation(speculation_id) is not None:
+        print("---SPECULATIVE RETRIEVAL DROPPED (route does not use it)---")
+
+
+def _get(speculation_id: str) -> Optional[Speculation]:
+    with _speculations_lock:
+        return _speculations.get(speculation_id) if speculation_id else None
+
+
+@contextmanager
+def use_speculation(speculation_id: str) -> Iterator[Optional[Speculation]]:
+    """Activates the speculation for the code run inside the block (the knowledge agent and its tool calls)."""
+    speculation = _get(speculation_id)
+    token = _active.set(speculation)
+    try:
+        yield speculation
+    finally:
+        _active.reset(token)
+
+
+def speculative_entities(speculation_id: str, query: str) -> Optional[List[Any]]:
+    """The CRM entity matches prefetched for this query (waiting if still running); None when there are none to use."""
+    speculation = _get(speculation_id)
+    if speculation is None or speculation.key != cache_key(query) or speculation.entities.cancelled():
+        return None
+    try:
+        return speculation.entities.result()
+    except Exception as e:
+        print(f"⚠️ Speculative CRM lookup failed, looking up again: {e}")
+        return None
+
+
+def _active_for(query: str) -> Optional[Speculation]:
+    """The active speculation, if it was started for this query: a tool query the agent rephrased searches anew."""
+    speculation = _active.get()
+    if speculation is None or speculation.key != cache_key(query):
+        return None
+    return speculation
+
+
+def take_active_documents(query: str) -> Optional[List[Any]]:
+    """For the knowledge base tool: documents prefetched for this query, if any are left."""
+    speculation = _active_for(query)
+    if speculation is None:
+        return None
+    documents = speculation.take_documents()
+    if documents is not None:
+        print(f"---SPECULATIVE RETRIEVAL USED: {len(documents)} documents prefetched for '{speculation.query}'---")
+    return documents
+
+
+async def atake_active_documents(query: str) -> Optional[List[Any]]:
+    speculation = _active_for(query)
+    if speculation is None:
+        return None
+    documents = await speculation.atake_documents()
+    if documents is not None:
+        print(f"---SPECULATIVE RETRIEVAL USED: {len(documents)} documents prefetched for '{speculation.query}'---")
+    return documents
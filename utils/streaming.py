@@ -0,0 +1,58 @@
+# utils/streaming.py
+from typing import Any, Dict, Optional
+
+from langchain_core.messages import BaseMessage
+
+# Tags attached to the LLM calls whose tokens are (part of) the answer shown to the user.
+# FINAL_ANSWER_TAG: every token is answer text (RAG answer, structured agents' formatting call).
+# REACT_AGENT_TAG: ReAct agent calls; only the text after "Final Answer:" is answer text.
+FINAL_ANSWER_TAG = "final_answer"
+REACT_AGENT_TAG = "react_agent"
+
+REACT_FINAL_ANSWER_MARKER = "Final Answer:"
+
+# Nodes whose answer becomes the final response. Agent calls made elsewhere (e.g. the product
+# knowledge lookup of the recommendation flow) only feed later nodes and are not streamed.
+STREAMING_ANSWER_NODES = ("customer_agent_node", "lead_agent_node", "knowledge_agent_node")
+
+
+class FinalAnswerStream:
+    """
+    Collects answer tokens from a LangGraph `stream_mode="messages"` stream.
+
+    feed() takes each (message chunk, metadata) pair and returns the answer text streamed so far,
+    or None when the chunk is not answer text (router, extraction and ReAct reasoning calls).
+    When a new answer-producing call starts (e.g. the ReAct final answer after the RAG tool's
+    answer), the text restarts with that call.
+    """
+
+    def __init__(self):
+        self._message_id: Optional[str] = None
+        self._raw = ""
+        self.text = ""
+
+    def feed(self, chunk: Any, metadata: Dict[str, Any]) -> Optional[str]:
+        if not isinstance(chunk, BaseMessage) or not isinstance(chunk.content, str):
+            return None
+        if metadata.get("langgraph_node") not in STREAMING_ANSWER_NODES:
+            return None
+        tags = metadata.get("tags") or []
+        if FINAL_ANSWER_TAG not in tags and REACT_AGENT_TAG not in tags:
+            return None
+
+        if chunk.id != self._message_id:
+            self._message_id = chunk.id
+            self._raw = ""
+        self._raw += chunk.content
+
+        if FINAL_ANSWER_TAG in tags:
+            answer = self._raw
+        else:
+            _, marker, answer = self._raw.partition(REACT_FINAL_ANSWER_MARKER)
+            if not marker:
+                return None
+        answer = answer.strip()
+        if not answer:
+            return None
+        self.text = answer
+        return self.text